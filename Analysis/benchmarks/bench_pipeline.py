@@ -0,0 +1,173 @@
+"""Wall time and peak memory of the analysis pipeline entry points.
+
+Run with asv from the `Analysis` directory, e.g. against the working tree:
+
+    asv run --python=same --quick
+
+Data is generated with `tfcrig.synthetic`. Sizes are relative to a small
+data root of two cohorts with two pairs of mice each and one session per
+pair (1x), with 10 and 100 sessions per pair for 10x and 100x. Single file
+benchmarks scale the number of trials in one session instead.
+"""
+
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+try:
+    import tfcrig  # noqa: F401
+except ImportError:
+    # Not installed, e.g. with `--python=same`: use the working tree
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tfcrig.analysis import Analysis, get_data_features_from_data_file
+from tfcrig.classes import Session
+from tfcrig.files import RigFiles
+from tfcrig.synthetic import synthetic_session, write_synthetic_data_root
+
+SIZES = [1, 10, 100]
+"""
+Sessions per pair of mice in a data root
+"""
+
+TRIALS = [20, 200, 2000]
+"""
+Trials in a single session file
+"""
+
+
+@contextlib.contextmanager
+def quiet():
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def _write_data_roots() -> dict:
+    data_roots = {}
+    for size in SIZES:
+        data_roots[size] = os.path.abspath(f"data_root_{size}x")
+        write_synthetic_data_root(data_roots[size], n_sessions=size)
+    return data_roots
+
+
+def _write_session_files() -> dict:
+    import json
+    from datetime import datetime
+
+    session_files = {}
+    for n_trials in TRIALS:
+        start_time = datetime(2025, 1, 6, 9, 0, 0)
+        os.makedirs(f"trials_{n_trials}", exist_ok=True)
+        session_files[n_trials] = os.path.abspath(
+            os.path.join(
+                f"trials_{n_trials}",
+                f"100_1_100_2_{start_time.strftime('%Y-%m-%d_%H-%M-%S')}.json",
+            )
+        )
+        session = synthetic_session(["100_1", "100_2"], start_time, n_trials=n_trials)
+        with open(session_files[n_trials], "w", encoding="utf-8") as f:
+            json.dump(session, f)
+    return session_files
+
+
+class AnalysisSuite:
+    """
+    Constructing an `Analysis` over a whole data root
+    """
+
+    params = SIZES
+    param_names = ["size"]
+    timeout = 3600
+    number = 1
+    repeat = (1, 3, 600)
+
+    def setup_cache(self):
+        return _write_data_roots()
+
+    def time_analysis(self, data_roots, size):
+        with quiet():
+            Analysis(data_root=data_roots[size])
+
+    def peakmem_analysis(self, data_roots, size):
+        with quiet():
+            Analysis(data_root=data_roots[size])
+
+
+class DataFileSuite:
+    """
+    Parsing and extracting features from one base data file
+    """
+
+    params = TRIALS
+    param_names = ["n_trials"]
+    timeout = 1200
+
+    def setup_cache(self):
+        return _write_session_files()
+
+    def time_get_data_features_from_data_file(self, session_files, n_trials):
+        with quiet():
+            get_data_features_from_data_file(session_files[n_trials])
+
+    def peakmem_get_data_features_from_data_file(self, session_files, n_trials):
+        with quiet():
+            get_data_features_from_data_file(session_files[n_trials])
+
+
+class SessionSuite:
+    """
+    Lick metrics of the `Session` class for one base data file
+    """
+
+    params = TRIALS
+    param_names = ["n_trials"]
+    timeout = 1200
+
+    def setup_cache(self):
+        return _write_session_files()
+
+    def time_compute_lick_metrics_all_mice(self, session_files, n_trials):
+        with quiet():
+            Session(session_files[n_trials]).compute_lick_metrics_all_mice()
+
+    def peakmem_compute_lick_metrics_all_mice(self, session_files, n_trials):
+        with quiet():
+            Session(session_files[n_trials]).compute_lick_metrics_all_mice()
+
+
+class RigFilesSuite:
+    """
+    Syncing a data root, which rewrites files, so every run gets a copy
+    """
+
+    params = SIZES
+    param_names = ["size"]
+    timeout = 3600
+    number = 1
+    repeat = (1, 3, 600)
+
+    def setup_cache(self):
+        return _write_data_roots()
+
+    def setup(self, data_roots, size):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.data_root = os.path.join(self.tmp_dir, "data")
+        shutil.copytree(data_roots[size], self.data_root)
+
+    def teardown(self, data_roots, size):
+        shutil.rmtree(self.tmp_dir)
+
+    def time_sync(self, data_roots, size):
+        with quiet():
+            RigFiles(data_root=self.data_root, dry_run=False).sync()
+
+    def peakmem_sync(self, data_roots, size):
+        with quiet():
+            RigFiles(data_root=self.data_root, dry_run=False).sync()
@@ -1,6 +1,10 @@
 # analysis.py
+import calendar
 import json
 import os
+import sys
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from typing import Optional
 
@@ -12,25 +16,298 @@ import pandas as pd
 import scipy.stats as stats
 import seaborn as sns
 from IPython.display import display
-from tfcrig.helpers.numpy import list_scalar_divide, scalar_divide
+from pandas.api.types import union_categoricals
+from tfcrig.cache import SessionCache
+from tfcrig.events import (
+    EVENT_CODES,
+    LICK_MSG,
+    NEGATIVE_SIGNAL_START_MSG,
+    NEGATIVE_SIGNAL_STOP_MSG,
+    POSITIVE_SIGNAL_START_MSG,
+    POSITIVE_SIGNAL_STOP_MSG,
+    PUFF_START_MSG,
+    SESSION_END_MSG,
+    SESSION_START_MSG,
+    TRIAL_END_MSG,
+    TRIAL_START_MSG,
+    UNKNOWN_EVENT,
+    WATER_OFF_MSG,
+    WATER_ON_MSG,
+    codes_containing,
+    encode_events,
+)
+from tfcrig.manifest import MANIFEST_FILE_NAME, DataManifest
+from tfcrig.mirror import DataMirror
+from tfcrig.sidecar import load_sidecar
+from tfcrig.store import EventStore
+from tfcrig.helpers.numpy import (
+    centered_rolling_sum,
+    list_scalar_divide,
+    scalar_divide,
+)
 from tfcrig.helpers.python import (
     datetime_to_day_of_week,
     dict_contains_other_values,
     get_or_default,
 )
 from tfcrig.helpers.tfcrig import (
+    ABSOLUTE_TIME_FORMAT,
+    absolute_times_to_datetime64,
     create_cohort_pattern,
     datetime_to_session_id,
+    extract_cohort,
+    file_signature,
     get_datetime_from_file_path,
     get_mouse_ids,
     get_mouse_ids_from_file_name,
     int_session_id_to_date_string,
     is_base_data_file,
+    is_skipped_data_dir,
     root_contains_cohort_of_interest,
 )
 from tfcrig.notebook import builtin_print
 
 
+MSG_DELIMITER = ": "
+"""
+Delimiter between the parts of a rig message, which are formatted as
+`trial: session time: trial time: message`
+"""
+
+LICK_FREQUENCY_WINDOW_MS = 1000
+"""
+Lick frequency is the number of licks in a window of this many
+milliseconds centered on each event
+"""
+
+DAY_OF_WEEK_DTYPE = pd.CategoricalDtype(list(calendar.day_name))
+"""
+Days of the week in calendar order, shared by every session
+"""
+
+SESSION_DATA_DTYPES = {
+    "mouse_id": "category",
+    "session_id": np.int64,
+    "date": "datetime64[ns]",
+    "day_of_week": DAY_OF_WEEK_DTYPE,
+    "absolute_time": "datetime64[ns]",
+    "trial": np.int16,
+    "session_time": np.int32,
+    "trial_time": np.int32,
+    "message": "category",
+    "is_session": np.int8,
+    "is_trial": np.int8,
+    "is_pre_cs": np.int8,
+    "is_tone": np.int8,
+    "is_trace": np.int8,
+    "is_puff": np.int8,
+    "trial_type": np.int16,
+    "lick": np.int8,
+    "puffed_lick": np.int8,
+    "negative_signal": np.int8,
+    "positive_signal": np.int8,
+    "water": np.int8,
+}
+"""
+Compact column types of the parsed data, see `Analysis.memory_report`.
+Mouse IDs and messages repeat across millions of events, so they are
+stored as categories, and flags fit in a single byte
+"""
+
+
+INT_REGEX = r"\s*[+-]?[0-9]+\s*"
+"""
+Strings that `int` is guaranteed to parse, used as a fast path before
+falling back to `int` itself
+"""
+
+
+def _forward_fill(values: np.ndarray, mask: np.ndarray, initial: int) -> np.ndarray:
+    """
+    Vectorized "last value seen": the value at each position where `mask`
+    is set carries forward until the next position where it is set, and
+    positions before the first one take the `initial` value. This is how
+    the state flags (`is_trial`, `water`, ...) are derived from their
+    marker messages.
+    """
+    idx = np.where(mask, np.arange(len(mask)), -1)
+    np.maximum.accumulate(idx, out=idx)
+    return np.where(idx >= 0, values[np.maximum(idx, 0)], initial)
+
+
+def _compact_int(values: np.ndarray, dtype: type) -> np.ndarray:
+    """
+    Cast integers to a smaller type of `SESSION_DATA_DTYPES`, keeping
+    them as they are if any would not fit
+    """
+    info = np.iinfo(dtype)
+    if len(values) and (values.min() < info.min or values.max() > info.max):
+        return values
+    return values.astype(dtype)
+
+
+def concat_session_data(data_frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenate parsed data frames, keeping their categorical columns
+    categorical. Plain `pd.concat` turns categories that differ between
+    frames, e.g. a different mouse ID in each, back into Python strings
+    """
+    if not data_frames:
+        return pd.concat(data_frames)
+
+    columns = data_frames[0].columns
+    categorical = [
+        column
+        for column in columns
+        if isinstance(data_frames[0][column].dtype, pd.CategoricalDtype)
+        and any(
+            df[column].dtype != data_frames[0][column].dtype for df in data_frames
+        )
+    ]
+    data = pd.concat(
+        [df.drop(columns=categorical) for df in data_frames], ignore_index=True
+    )
+    for column in categorical:
+        data.insert(
+            columns.get_loc(column),
+            column,
+            union_categoricals(
+                [df[column] for df in data_frames], sort_categories=True
+            ),
+        )
+    return data
+
+
+def _select_session(data: pd.DataFrame, mask: Optional[pd.Series]) -> pd.DataFrame:
+    """
+    Select the rows of one session, dropping categories that no longer
+    occur so that a session reads the same whichever data it came from
+    """
+    session = data if mask is None else data[mask].reset_index(drop=True)
+    for column in ("mouse_id", "message"):
+        session[column] = session[column].cat.remove_unused_categories()
+    return session
+
+
+def _parse_int_column(column: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Parse a column of strings as integers, the way `int` would. Returns
+    the integers and a mask of which strings could be parsed at all.
+    """
+    is_int = column.str.fullmatch(INT_REGEX, na=False).to_numpy(dtype=bool)
+    values = np.zeros(len(column), dtype=np.int64)
+    values[is_int] = column[is_int].to_numpy().astype(np.int64)
+
+    # Rare strings outside the fast path, e.g. `1_000`, still go through
+    # `int` so that exactly the same messages are accepted
+    for i in np.flatnonzero(~is_int & column.notna().to_numpy()):
+        try:
+            values[i] = int(column.iat[i])
+            is_int[i] = True
+        except ValueError:
+            pass
+    return values, is_int
+
+
+def _split_raw_session_data(
+    raw_data: list,
+    print_bad_data_blobs: bool = True,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Split every `message` of the raw data into its trial, session time,
+    trial time, and message parts in one pass. Returns the `absolute_time`
+    strings, the three integer columns, the messages, and a mask of the
+    data blobs that could be parsed, for every data blob.
+
+    A message whose leading parts are integers, but that has fewer than
+    three parts, e.g. a serial line cut short as `12: 3400`, raises an
+    `IndexError` as it always has. Bad data blobs before it are printed
+    first.
+    """
+    absolute_times = pd.Series(
+        [data_blob.get("absolute_time") for data_blob in raw_data], dtype=object
+    )
+    messages = pd.Series(
+        [data_blob.get("message") for data_blob in raw_data], dtype=object
+    )
+    parts = messages.str.split(MSG_DELIMITER, n=3, expand=True)
+    parts = parts.reindex(columns=range(4)).astype(object)
+
+    trial, is_trial_int = _parse_int_column(parts[0])
+    is_good = is_trial_int.copy()
+    t_sesh, is_int = _parse_int_column(parts[1])
+    is_good &= is_int
+    is_sesh_int = is_int
+    t_trial, is_int = _parse_int_column(parts[2])
+    is_good &= is_int
+    has_time = absolute_times.notna().to_numpy()
+    is_good &= has_time
+
+    # Parts are read in order, so a message is cut short if every part it
+    # has is an integer
+    is_short = (
+        has_time
+        & is_trial_int
+        & (parts[1].isna().to_numpy() | (is_sesh_int & parts[2].isna().to_numpy()))
+    )
+    n_checked = np.argmax(is_short) if is_short.any() else len(raw_data)
+    if print_bad_data_blobs:
+        for i in np.flatnonzero(~is_good[:n_checked]):
+            print(f"Skipping bad data blob: {raw_data[i]}")
+    if n_checked < len(raw_data):
+        raise IndexError("list index out of range")
+
+    # Messages with only the three integer parts have an empty message
+    msg = parts[3].fillna("").to_numpy(dtype=object)
+    return absolute_times.to_numpy(dtype=object), trial, t_sesh, t_trial, msg, is_good
+
+
+def _parse_raw_session_data(
+    raw_data: list,
+    print_bad_data_blobs: bool = True,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Split the raw data like `_split_raw_session_data`, skipping data blobs
+    that can not be parsed. Returns the `absolute_time` strings, followed
+    by the three integer columns and the messages, of the remaining blobs.
+    """
+    absolute_time, trial, t_sesh, t_trial, msg, is_good = _split_raw_session_data(
+        raw_data, print_bad_data_blobs=print_bad_data_blobs
+    )
+    return (
+        absolute_time[is_good],
+        trial[is_good],
+        t_sesh[is_good],
+        t_trial[is_good],
+        msg[is_good],
+    )
+
+
+def _check_session_markers(count) -> None:
+    """
+    Some data integrity checks, given a function that counts the
+    occurrences of a text in the raw data. We may want to skip data and
+    mark sessions as invalid if these fail.
+    """
+    # Check for session start and end
+    if not count(SESSION_START_MSG) or not count(SESSION_END_MSG):
+        raise ValueError("Session either does not start or does not end!!!")
+
+    # Check trial start and ends (every trial that starts, ends)
+    if count(TRIAL_START_MSG) != count(TRIAL_END_MSG):
+        raise ValueError(f"Trial start, end mismatch!!!")
+
+
+def _check_trial_types_balance(trial_types: str, msg: str) -> None:
+    """
+    This ensures a balanced session, no matter which trial types are
+    included. It assumes we want sessions to be balanced (: Note that if
+    an imbalance is intentional, this will raise false positive errors
+    """
+    if len({trial_types.count(t) for t in set(trial_types)}) > 1:
+        raise ValueError(f"Unbalanced trial types in: '{msg}'!!!")
+
+
 def extract_features_from_session_data(
     raw_data: dict,
     mouse_id: str,
@@ -50,6 +327,12 @@ def extract_features_from_session_data(
     doing a lot of the heavy-lifting in terms of data processing, and it
     contains assumptions about the way the Rig saves data.
 
+    Messages are parsed as whole columns rather than one at a time. The
+    state flags (`is_trial`, `is_tone`, `water`, ...) assume that the
+    messages are ordered by time: each is set by its marker messages and
+    carried forward until the next marker, using `{0, 1}` to represent
+    `False` and `True` respectively.
+
     Parameters:
         raw_data (dict): The raw session data.
         mouse_id (str): The ID of the mouse.
@@ -60,237 +343,448 @@ def extract_features_from_session_data(
     Returns a dataframe with features and string containing trial types
         -
     """
-    parsed_data = []
-    msg_delimiter = ": "
-
     # Include day of week in data
     date_time = get_datetime_from_file_path(file_name)
-    day_of_week = datetime_to_day_of_week(date_time)
 
-    # Parsing these variables (this data) assumes the messages are ordered
-    # by time, and checks for certain markers in the data. It uses `{0, 1}`
-    # to represent `False` and `True` respectively
-    is_session = 0
-    is_pre_cs = 0
-    is_tone = 0
-    is_trace = 0
-    is_puff = 0
-    # Valid trial types: `{0, 1}`, type `-1` represents not known or no
-    # current trial yet
-    trial_type = -1
-    negative_signal = 0
-    positive_signal = 0
-    water = 0
-    previous_time = raw_data[0]["absolute_time"]
-
-    # Some trial parameters we will try to extract
-    auditory_start = -1
-    auditory_stop = -1
-    air_puff_start_time = -1
-    air_puff_stop_time = -1
-    air_puff_total_time = -1
-    first_puff_started = 0
-    trial_types = ""
+    # The raw data is searched as a whole, including blobs that are
+    # skipped below
+    _check_session_markers(json.dumps(raw_data).count)
 
-    # Some data integrity checks, we may want to skip data and mark sessions as
-    # invalid if these fails.
-    #
-    # Check for session start and end:
-    data_str = json.dumps(raw_data)
-    session_start_msg = "Session has started"
-    session_end_msg = "Session has ended"
-    if session_start_msg not in data_str or session_end_msg not in data_str:
-        raise ValueError("Session either does not start or does not end!!!")
+    absolute_time, trial, t_sesh, t_trial, msg = _parse_raw_session_data(
+        raw_data, print_bad_data_blobs=print_bad_data_blobs
+    )
+    return _extract_features_from_columns(
+        absolute_time=absolute_time,
+        absolute_datetime=absolute_times_to_datetime64(absolute_time, errors="coerce"),
+        trial=trial,
+        t_sesh=t_sesh,
+        t_trial=t_trial,
+        msg=msg,
+        mouse_id=mouse_id,
+        session_id=session_id,
+        date_time=date_time,
+    )
 
-    # Check trial start and ends (every trial that starts, ends)
-    is_trial = 0
-    trial_start_msg = "Trial has started"
-    trial_end_msg = "Trial has ended"
-    n_trial_starts = data_str.count(trial_start_msg)
-    n_trial_ends = data_str.count(trial_end_msg)
-    if n_trial_starts != n_trial_ends:
-        raise ValueError(f"Trial start, end mismatch!!!")
 
-    check_next_trial_types_message = False
-    for data_blob in raw_data:
-        # Parse the JSON message
+def extract_features_from_sidecar(
+    sidecar: dict,
+    mouse_id: str,
+    session_id: int,
+    file_name: str,
+    print_bad_data_blobs: bool = True,
+) -> tuple[str, pd.DataFrame]:
+    """
+    Same as `extract_features_from_session_data`, for the data of a mouse
+    read from a sidecar, see `tfcrig.sidecar`. The messages are already
+    split, and only the raw events of the sidecar are parsed here
+    """
+    date_time = get_datetime_from_file_path(file_name)
+    columns = sidecar["data"][mouse_id]
+    texts = sidecar["messages"]
+    codes = columns["message"]
+    raw_rows = np.array(sorted(columns["raw"]), dtype=np.int64)
+    raw_data = [columns["raw"][i] for i in raw_rows]
+
+    # Texts are counted once per distinct message
+    code_counts = np.bincount(codes[codes >= 0], minlength=len(texts))
+    raw_str = json.dumps(raw_data)
+
+    def count(text: str) -> int:
+        in_texts = np.array([t.count(text) for t in texts], dtype=np.int64)
+        return int(code_counts @ in_texts) + raw_str.count(text)
+
+    _check_session_markers(count)
+
+    absolute_time = np.full(len(codes), None, dtype=object)
+    absolute_datetime = columns["absolute_time"].copy()
+    trial = columns["trial"].astype(np.int64)
+    t_sesh = columns["session_ms"].astype(np.int64)
+    t_trial = columns["trial_ms"].astype(np.int64)
+    msg = np.where(codes >= 0, texts[np.maximum(codes, 0)] if len(texts) else "", "")
+    msg = msg.astype(object)
+    is_good = np.ones(len(codes), dtype=bool)
+    if len(raw_rows):
+        (
+            absolute_time[raw_rows],
+            trial[raw_rows],
+            t_sesh[raw_rows],
+            t_trial[raw_rows],
+            msg[raw_rows],
+            is_good[raw_rows],
+        ) = _split_raw_session_data(raw_data, print_bad_data_blobs=print_bad_data_blobs)
+        absolute_datetime[raw_rows] = absolute_times_to_datetime64(
+            absolute_time[raw_rows], errors="coerce"
+        )
+
+    return _extract_features_from_columns(
+        absolute_time=absolute_time[is_good],
+        absolute_datetime=absolute_datetime[is_good],
+        trial=trial[is_good],
+        t_sesh=t_sesh[is_good],
+        t_trial=t_trial[is_good],
+        msg=msg[is_good],
+        mouse_id=mouse_id,
+        session_id=session_id,
+        date_time=date_time,
+    )
+
+
+def _extract_features_from_columns(
+    absolute_time: np.ndarray,
+    absolute_datetime: np.ndarray,
+    trial: np.ndarray,
+    t_sesh: np.ndarray,
+    t_trial: np.ndarray,
+    msg: np.ndarray,
+    mouse_id: str,
+    session_id: int,
+    date_time: datetime,
+) -> tuple[str, pd.DataFrame]:
+    """
+    The part of `extract_features_from_session_data` after the messages
+    are split, shared with data read from a sidecar, see `tfcrig.sidecar`.
+    The `absolute_time` strings are only read where `absolute_datetime`
+    is `NaT`, to raise the error parsing them would raise.
+    """
+    day_of_week = datetime_to_day_of_week(date_time)
+    n = len(msg)
+    if not n:
+        return "", pd.DataFrame()
+
+    # Content checks are run once per distinct message, on its code in
+    # the event vocabulary, then broadcast back to every row
+    codes, unique_msgs = pd.factorize(msg, sort=True)
+    unique_events = encode_events(unique_msgs)
+    is_unknown = unique_events == UNKNOWN_EVENT
+
+    def contains(text: str) -> np.ndarray:
+        found = np.isin(unique_events, codes_containing(text))
+        # Messages outside the vocabulary, e.g. serial lines that were cut
+        # short or run together, are still searched for the text
+        for i in np.flatnonzero(is_unknown):
+            found[i] = text in unique_msgs[i]
+        return found[codes]
+
+    def equals(text: str) -> np.ndarray:
+        return (unique_events == EVENT_CODES[text])[codes]
+
+    # Errors are collected as `(row, step, exception)` so that the first
+    # error in message order is raised, whatever step detects it
+    errors = []
+
+    # Valid trial types: `{0, 1, 2, 3, 4}`, type `-1` represents not known
+    # or no current trial yet
+    has_trial_type = contains("currentTrialType")
+    trial_type_values = np.full(n, -1, dtype=np.int64)
+    for i in np.flatnonzero(has_trial_type):
         try:
-            absolute_time = data_blob["absolute_time"]
-            split_data = data_blob["message"].split(msg_delimiter)
-            trial = int(split_data[0])
-            t_sesh = int(split_data[1])
-            t_trial = int(split_data[2])
-            msg = msg_delimiter.join(split_data[3::])
-        except (KeyError, ValueError):
-            if print_bad_data_blobs:
-                print(f"Skipping bad data blob: {data_blob}")
+            trial_type_values[i] = int(msg[i].split(MSG_DELIMITER)[1])
+            if trial_type_values[i] not in [0, 1, 2, 3, 4]:
+                raise ValueError(f"Invalid trial type in: '{msg[i]}'!!!")
+        except Exception as e:
+            errors.append((i, 1, e))
+
+    # Get all trial types, check for balance. Sometimes we aren't printing
+    # `trialTypes` together with its value, in which case the value is
+    # the next message and the `trialTypes` message itself is dropped
+    trial_types = ""
+    is_dropped = np.zeros(n, dtype=bool)
+    consumed = -1
+    for i in np.flatnonzero(contains("trialTypes")):
+        if i <= consumed:
             continue
-            # raise ValueError(f"Bad data blob found: {data_blob}")
-        # Confirm that absolute time moves forward
-        # TODO: uncomment once we fix syncing second and first mouse data
-        # if absolute_time < previous_time:
-        #     raise ValueError("Time did not move forwards!")
-        # previous_time = absolute_time
-        absolute_datetime = datetime.strptime(
-            absolute_time,
-            "%Y-%m-%d_%H-%M-%S.%f",
-        )
+        split_msg = msg[i].split(MSG_DELIMITER)
+        if len(split_msg) > 1:
+            j = i
+            trial_types = split_msg[1]
+        else:
+            is_dropped[i] = True
+            j = i + 1
+            if j == n:
+                break
+            trial_types = msg[j].split(MSG_DELIMITER)[0]
+            consumed = j
+        try:
+            _check_trial_types_balance(trial_types, msg[j])
+        except ValueError as e:
+            errors.append((j, 2, e))
+
+    # Everything below is skipped for dropped messages
+    is_kept = ~is_dropped
+
+    # Check for some trial parameters, initialized as `-1`
+    def trial_parameter(key: str, step: int) -> tuple[np.ndarray, np.ndarray]:
+        rows = np.flatnonzero(contains(key) & is_kept)
+        values = np.full(n, -1, dtype=np.int64)
+        for i in rows:
+            try:
+                values[i] = int(msg[i].split(MSG_DELIMITER)[1])
+            except Exception as e:
+                errors.append((i, step, e))
+        mask = np.zeros(n, dtype=bool)
+        mask[rows] = True
+        return values, mask
+
+    values, mask = trial_parameter("AIR_PUFF_START_TIME", 3)
+    air_puff_start_time = _forward_fill(values, mask, -1)
+    values, mask = trial_parameter("AIR_PUFF_TOTAL_TIME", 4)
+    air_puff_stop_time = _forward_fill(air_puff_start_time + values, mask, -1)
+    values, mask = trial_parameter("AUDITORY_START", 5)
+    auditory_start = _forward_fill(values, mask, -1)
+    values, mask = trial_parameter("AUDITORY_STOP", 6)
+    auditory_stop = _forward_fill(values, mask, -1)
+
+    for i in np.flatnonzero(np.isnat(absolute_datetime)):
+        # Raises the same error as parsing the time on its own would
+        try:
+            datetime.strptime(absolute_time[i], ABSOLUTE_TIME_FORMAT)
+        except Exception as e:
+            errors.append((i, 0, e))
+            break
+
+    if errors:
+        raise min(errors, key=lambda error: error[0:2])[2]
+
+    # Check for session start, end
+    is_session_start = contains(SESSION_START_MSG)
+    is_session_end = contains(SESSION_END_MSG)
+    is_session = _forward_fill(
+        np.where(is_session_end, 0, 1), is_session_start | is_session_end, 0
+    )
 
-        # Check for session start, end
-        if session_start_msg in msg:
-            is_session = 1
-        if session_end_msg in msg:
-            is_session = 0
-            trial_type = -1
-
-        # Check for trial start, end
-        if trial_start_msg in msg:
-            is_trial = 1
-        if trial_end_msg in msg:
-            is_trial = 0
-
-        # Get trial type
-        if "currentTrialType" in msg:
-            trial_type = int(msg.split(msg_delimiter)[1])
-            if trial_type not in [0, 1, 2, 3, 4]:
-                raise ValueError(f"Invalid trial type in: '{msg}'!!!")
-
-        # Get all trial types, check for balance. Note that if an
-        # imbalance is intentional, this will print false positive
-        # error messages
-        if "trialTypes" in msg or check_next_trial_types_message:
-            if check_next_trial_types_message:
-                trial_types = msg.split(msg_delimiter)[0]
-                check_next_trial_types_message = False
-            else:
-                try:
-                    trial_types = msg.split(msg_delimiter)[1]
-                except IndexError:
-                    # Sometimes we aren't printing `trialTypes` together with
-                    # its value
-                    check_next_trial_types_message = True
-                    continue
+    # Check for trial start, end
+    is_trial_end = contains(TRIAL_END_MSG)
+    is_trial = _forward_fill(
+        np.where(is_trial_end, 0, 1), contains(TRIAL_START_MSG) | is_trial_end, 0
+    )
 
-            # This ensures a balanced session, no matter which trial types are
-            # included. It assumes we want sessions to be balanced (:
-            trial_type_count = None
-            for each_trial_type in set(trial_types):
-                if not trial_type_count:
-                    trial_type_count = trial_types.count(each_trial_type)
-                    continue
-                if trial_types.count(each_trial_type) != trial_type_count:
-                    raise ValueError(f"Unbalanced trial types in: '{msg}'!!!")
-
-        # Check for some trial parameters
-        if "AIR_PUFF_START_TIME" in msg:
-            air_puff_start_time = int(msg.split(msg_delimiter)[1])
-        if "AIR_PUFF_TOTAL_TIME" in msg:
-            air_puff_total_time = int(msg.split(msg_delimiter)[1])
-            air_puff_stop_time = air_puff_start_time + air_puff_total_time
-        if "AUDITORY_START" in msg:
-            auditory_start = int(msg.split(msg_delimiter)[1])
-        if "AUDITORY_STOP" in msg:
-            auditory_stop = int(msg.split(msg_delimiter)[1])
-
-        if auditory_start:
-            if is_trial and t_trial < auditory_start:
-                is_pre_cs = 1
-            else:
-                is_pre_cs = 0
+    # Trial types are reset at the end of the session
+    trial_type = _forward_fill(
+        np.where(has_trial_type, trial_type_values, -1),
+        has_trial_type | is_session_end,
+        -1,
+    )
 
-        # Check if data falls under tone period
-        if auditory_start > 0 and auditory_stop > 0:
-            if t_trial > auditory_start and t_trial < auditory_stop:
-                is_tone = 1
-            else:
-                is_tone = 0
+    # Flags that depend on the trial parameters are only updated once the
+    # parameters they depend on are known, and keep their last value
+    # otherwise
+    has_auditory_start = is_kept & (auditory_start != 0)
+    is_pre_cs = _forward_fill(
+        (is_trial == 1) & (t_trial < auditory_start), has_auditory_start, 0
+    )
 
-        # Check if data falls under trace period (short duration after auditory cues)
-        if air_puff_start_time > 0 and auditory_stop > 0:
-            if t_trial > auditory_stop and t_trial < air_puff_start_time:
-                is_trace = 1
-            else:
-                is_trace = 0
-
-        # Check for lick
-        lick = 0
-        if msg == "Lick":
-            lick = 1
-
-        # Check for puff start
-        if msg == "Puff start":
-            first_puff_started = 1
-
-        # Check for an "air puff lick"
-        # An "air puff lick" is a lick that occurs when air puffing is
-        # occurring, which is determined based on trial time and air
-        # puff parameters
-        puffed_lick = 0
-        if air_puff_start_time > 0 and air_puff_stop_time > 0:
-            # We are in a part of the trial where these parameters have
-            # been determined, given that we initialize them as `-1`
-            if (
-                lick
-                and first_puff_started
-                and t_trial >= air_puff_start_time
-                and t_trial <= air_puff_stop_time
-            ):
-                puffed_lick = 1
-
-            if t_trial > air_puff_stop_time:
-                first_puff_started = 0
-
-            if t_trial >= air_puff_start_time and t_trial <= air_puff_stop_time:
-                is_puff = 1
-            else:
-                is_puff = 0
-
-        # Negative signal
-        if "Negative signal start" in msg:
-            negative_signal = 1
-        if "Negative signal stop" in msg:
-            negative_signal = 0
-
-        # Positive signal
-        if "Positive signal start" in msg:
-            positive_signal = 1
-        if "Positive signal stop" in msg:
-            positive_signal = 0
-
-        # Water reward
-        if "Water on" in msg:
-            water = 1
-        if "Water off" in msg:
-            water = 0
-
-        # Build the parsed/rich dictionary
-        parsed_data.append(
-            {
-                "mouse_id": mouse_id,
-                "session_id": session_id,
-                "date": date_time,
-                "day_of_week": day_of_week,
-                "absolute_time": absolute_datetime,
-                "trial": trial,
-                "session_time": t_sesh,
-                "trial_time": t_trial,
-                "message": msg,
-                "is_session": is_session,
-                "is_trial": is_trial,
-                "is_pre_cs": is_pre_cs,
-                "is_tone": is_tone,
-                "is_trace": is_trace,
-                "is_puff": is_puff,
-                "trial_type": trial_type,
-                "lick": lick,
-                "puffed_lick": puffed_lick,
-                "negative_signal": negative_signal,
-                "positive_signal": positive_signal,
-                "water": water,
-            }
+    # Check if data falls under tone period
+    has_tone = is_kept & (auditory_start > 0) & (auditory_stop > 0)
+    is_tone = _forward_fill(
+        (t_trial > auditory_start) & (t_trial < auditory_stop), has_tone, 0
+    )
+
+    # Check if data falls under trace period (short duration after auditory cues)
+    has_trace = is_kept & (air_puff_start_time > 0) & (auditory_stop > 0)
+    is_trace = _forward_fill(
+        (t_trial > auditory_stop) & (t_trial < air_puff_start_time), has_trace, 0
+    )
+
+    # Check for lick
+    lick = equals(LICK_MSG)
+
+    # Check for an "air puff lick"
+    # An "air puff lick" is a lick that occurs when air puffing is
+    # occurring, which is determined based on trial time and air
+    # puff parameters. A puff has started from a `Puff start` message
+    # until the trial time passes the end of the puff
+    has_puff = is_kept & (air_puff_start_time > 0) & (air_puff_stop_time > 0)
+    in_puff = (t_trial >= air_puff_start_time) & (t_trial <= air_puff_stop_time)
+    puff_started = is_kept & equals(PUFF_START_MSG)
+    puff_ended = has_puff & (t_trial > air_puff_stop_time)
+    first_puff_started = _forward_fill(
+        np.where(puff_ended, 0, 1), puff_started | puff_ended, 0
+    )
+    first_puff_started = puff_started | (
+        np.concatenate(([0], first_puff_started[:-1])) == 1
+    )
+    puffed_lick = lick & first_puff_started & has_puff & in_puff
+    is_puff = _forward_fill(in_puff, has_puff, 0)
+
+    def signal(start_msg: str, stop_msg: str) -> np.ndarray:
+        start = is_kept & contains(start_msg)
+        stop = is_kept & contains(stop_msg)
+        return _forward_fill(np.where(stop, 0, 1), start | stop, 0)
+
+    # Build the parsed/rich data frame, in the compact types of
+    # `SESSION_DATA_DTYPES`
+    n_kept = np.count_nonzero(is_kept)
+
+    def flag(values: np.ndarray) -> np.ndarray:
+        return values[is_kept].astype(np.int8)
+
+    return trial_types, pd.DataFrame(
+        {
+            "mouse_id": pd.Categorical.from_codes(
+                np.zeros(n_kept, dtype=np.int8), categories=[mouse_id]
+            ),
+            "session_id": np.full(n_kept, session_id, dtype=np.int64),
+            "date": np.full(n_kept, np.datetime64(date_time, "ns")),
+            "day_of_week": pd.Categorical(
+                np.full(n_kept, day_of_week, dtype=object), dtype=DAY_OF_WEEK_DTYPE
+            ),
+            "absolute_time": absolute_datetime[is_kept].astype("datetime64[ns]"),
+            "trial": _compact_int(trial[is_kept], np.int16),
+            "session_time": _compact_int(t_sesh[is_kept], np.int32),
+            "trial_time": _compact_int(t_trial[is_kept], np.int32),
+            "message": pd.Categorical.from_codes(
+                codes[is_kept], categories=unique_msgs
+            ).remove_unused_categories(),
+            "is_session": flag(is_session),
+            "is_trial": flag(is_trial),
+            "is_pre_cs": flag(is_pre_cs),
+            "is_tone": flag(is_tone),
+            "is_trace": flag(is_trace),
+            "is_puff": flag(is_puff),
+            "trial_type": _compact_int(trial_type[is_kept], np.int16),
+            "lick": flag(lick),
+            "puffed_lick": flag(puffed_lick),
+            "negative_signal": flag(
+                signal(NEGATIVE_SIGNAL_START_MSG, NEGATIVE_SIGNAL_STOP_MSG)
+            ),
+            "positive_signal": flag(
+                signal(POSITIVE_SIGNAL_START_MSG, POSITIVE_SIGNAL_STOP_MSG)
+            ),
+            "water": flag(signal(WATER_ON_MSG, WATER_OFF_MSG)),
+        }
+    )
+
+
+def load_mouse_data_from_data_file(full_file: str) -> dict[str, list]:
+    """
+    Read a base data file once and return the raw event list of every
+    mouse named in the file name, keyed by mouse ID. A file whose data
+    does not match the mouse IDs in its name raises a `ValueError`.
+    """
+    file_name = full_file.split("/")[-1]
+    mouse_ids = get_mouse_ids_from_file_name(file_name)
+
+    with open(full_file, "r") as f:
+        json_data = json.load(f)
+    try:
+        return {mouse_id: json_data["data"][mouse_id] for mouse_id in mouse_ids}
+    except KeyError:
+        raise ValueError(f"File name does not match its 'mouse_ids': {full_file}")
+
+
+PERIOD_FLAGS = [
+    "is_session",
+    "is_trial",
+    "is_pre_cs",
+    "is_tone",
+    "is_trace",
+    "is_puff",
+    "water",
+]
+"""
+The `{0, 1}` flags that features are split by. Each combination of flags
+is one period, encoded as a bit mask with one bit per flag
+"""
+
+
+class TrialPeriods:
+    """
+    Aggregates the parsed data of one mouse, one session once, grouped by
+    trial, trial type, and period, and answers every feature from those
+    groups. Features combine groups selected with `mask`, e.g. CS+ trace
+    licks are the groups of trial type 1 or 2 that are in the session, in
+    a trial, and in the trace period.
+
+    Lick counts and lick frequencies are whole numbers, so sums over the
+    groups, and means taken as those sums over the number of events, are
+    exactly the values found by filtering the data itself.
+    """
+
+    def __init__(self, df: pd.DataFrame, lick_frequency: np.ndarray):
+        period = np.zeros(len(df), dtype=np.int64)
+        for bit, flag in enumerate(PERIOD_FLAGS):
+            period |= (df[flag].to_numpy() == 1).astype(np.int64) << bit
+
+        self.groups = (
+            pd.DataFrame(
+                {
+                    "trial": df["trial"].to_numpy(dtype=np.int64),
+                    "trial_type": df["trial_type"].to_numpy(dtype=np.int64),
+                    "period": period,
+                    "lick": df["lick"].to_numpy(dtype=np.int64),
+                    "puffed_lick": df["puffed_lick"].to_numpy(dtype=np.int64),
+                    "lick_frequency": lick_frequency,
+                    "trial_time": df["trial_time"].to_numpy(dtype=np.int64),
+                    "session_time": df["session_time"].to_numpy(dtype=np.int64),
+                }
+            )
+            .groupby(["trial", "trial_type", "period"])
+            .agg(
+                lick=("lick", "sum"),
+                puffed_lick=("puffed_lick", "sum"),
+                lick_frequency=("lick_frequency", "sum"),
+                n_lick_frequency=("lick_frequency", "count"),
+                trial_time=("trial_time", "max"),
+                session_time_min=("session_time", "min"),
+                session_time_max=("session_time", "max"),
+            )
+            .reset_index()
         )
 
-    return trial_types, pd.DataFrame(parsed_data)
+    def mask(self, trial_types: Optional[list[int]] = None, **flags) -> np.ndarray:
+        """
+        Select the groups of the given trial types, if any, whose periods
+        have the given value for each flag, e.g. `mask(is_session=1,
+        is_trial=0)` for the inter-trial interval
+        """
+        mask = np.ones(len(self.groups), dtype=bool)
+        period = self.groups["period"].to_numpy()
+        for flag, value in flags.items():
+            mask &= (period >> PERIOD_FLAGS.index(flag)) & 1 == value
+        if trial_types is not None:
+            mask &= self.groups["trial_type"].isin(trial_types).to_numpy()
+        return mask
+
+    def total(self, mask: np.ndarray, column: str = "lick") -> np.int64:
+        return self.groups.loc[mask, column].sum()
+
+    def avg_lick_freq(self, mask: np.ndarray) -> np.float64:
+        n = self.groups.loc[mask, "n_lick_frequency"].sum()
+        if not n:
+            return np.nan
+        return self.groups.loc[mask, "lick_frequency"].sum() / n
+
+    def duration(self, mask: np.ndarray) -> np.int64:
+        return (
+            self.groups.loc[mask, "session_time_max"].max()
+            - self.groups.loc[mask, "session_time_min"].min()
+        )
+
+    def total_per_trial(
+        self, mask: np.ndarray, trials: range, column: str = "lick"
+    ) -> pd.Series:
+        return (
+            self.groups[mask]
+            .groupby("trial")[column]
+            .sum()
+            .reindex(trials, fill_value=0)
+        )
+
+    def max_per_trial(self, mask: np.ndarray, trials: range, column: str) -> pd.Series:
+        return (
+            self.groups[mask]
+            .groupby("trial")[column]
+            .max()
+            .reindex(trials, fill_value=0)
+        )
+
+    def avg_lick_freq_per_trial(self, mask: np.ndarray, trials: range) -> pd.Series:
+        totals = self.groups[mask].groupby("trial")[
+            ["lick_frequency", "n_lick_frequency"]
+        ].sum()
+        return (totals["lick_frequency"] / totals["n_lick_frequency"]).reindex(
+            trials, fill_value=0
+        )
 
 
 def get_data_features_from_data_file(
@@ -307,24 +801,38 @@ def get_data_features_from_data_file(
     processed data to speed up future analyses.
     """
     file_name = full_file.split("/")[-1]
-    mouse_ids = get_mouse_ids_from_file_name(file_name)
     session_id = datetime_to_session_id(get_datetime_from_file_path(file_name))
 
-    data_frames = []
-    for mouse_id in mouse_ids:
-        try:
-            with open(full_file, "r") as f:
-                json_data = json.load(f)
-            raw_data = json_data["data"][mouse_id]
-        except KeyError:
+    # The file is decoded once, for all of the mice it contains. Its
+    # sidecar is read instead when it has one, see `tfcrig.sidecar`
+    sidecar = load_sidecar(full_file)
+    if sidecar is None:
+        mouse_data = load_mouse_data_from_data_file(full_file)
+    else:
+        mouse_data = {
+            mouse_id: None for mouse_id in get_mouse_ids_from_file_name(file_name)
+        }
+        if not all(mouse_id in sidecar["data"] for mouse_id in mouse_data):
             raise ValueError(f"File name does not match its 'mouse_ids': {full_file}")
-        trial_types, df = extract_features_from_session_data(
-            raw_data=raw_data,
-            mouse_id=mouse_id,
-            session_id=session_id,
-            file_name=file_name,
-            print_bad_data_blobs=verbose,
-        )
+
+    data_frames = []
+    for mouse_id, raw_data in mouse_data.items():
+        if sidecar is None:
+            trial_types, df = extract_features_from_session_data(
+                raw_data=raw_data,
+                mouse_id=mouse_id,
+                session_id=session_id,
+                file_name=file_name,
+                print_bad_data_blobs=verbose,
+            )
+        else:
+            trial_types, df = extract_features_from_sidecar(
+                sidecar=sidecar,
+                mouse_id=mouse_id,
+                session_id=session_id,
+                file_name=file_name,
+                print_bad_data_blobs=verbose,
+            )
         if not df.empty:
             data_frames.append(df)
     # Files can contain multiple mouse/session pairs. Extract features
@@ -334,182 +842,137 @@ def get_data_features_from_data_file(
     if not data_frames:
         return (data_features, data_features_trial, pd.DataFrame())
     for df in data_frames:
-        # Lick frequency
-        # Work with another data frame to avoid setting index on 'df'
-        dfl = df[df["is_session"] == 1].copy()
-        dfl.set_index("absolute_time", inplace=True)
-        dfl.sort_index(inplace=True)
-        dfl["lick_frequency"] = dfl["lick"].rolling(window="1s", center=True).sum()
-        avg_lick_freq = dfl["lick_frequency"].mean()
-        df_is_trial = dfl[dfl["is_trial"] == 1]
-        dfl_csplus = df_is_trial[df_is_trial["trial_type"].isin([1, 2])]
-        avg_lick_freq_csplus = dfl_csplus["lick_frequency"].mean()
-        dfl_csminus = df_is_trial[df_is_trial["trial_type"].isin([0, 3])]
-        avg_lick_freq_csminus = dfl_csminus["lick_frequency"].mean()
-        dfl_no_signal = df_is_trial[df_is_trial["trial_type"].isin([4])]
-        avg_lick_freq_no_signal = dfl_no_signal["lick_frequency"].mean()
+        # Lick frequency, only over the session and missing outside of it
+        is_session = df["is_session"].to_numpy() == 1
+        lick_frequency = np.full(len(df), np.nan)
+        lick_frequency[is_session] = centered_rolling_sum(
+            df["absolute_time"].to_numpy()[is_session].astype(np.int64),
+            df["lick"].to_numpy()[is_session],
+            window=LICK_FREQUENCY_WINDOW_MS * 1_000_000,
+        )
+
+        # Every feature below is a sum, mean, or max over some periods of
+        # some trial types, computed from one aggregation of the data
+        periods = TrialPeriods(df, lick_frequency)
+        session = periods.mask(is_session=1)
+        in_trial = periods.mask(is_session=1, is_trial=1)
+        csplus = in_trial & periods.mask(trial_types=[1, 2])
+        csminus = in_trial & periods.mask(trial_types=[0, 3])
+        is_pre_cs = periods.mask(is_session=1, is_pre_cs=1)
+        is_tone = periods.mask(is_session=1, is_tone=1)
+        is_trace = periods.mask(is_session=1, is_trial=1, is_trace=1)
+        is_puff = periods.mask(is_session=1, is_puff=1)
+        iti = periods.mask(is_session=1, is_trial=0)
+        avg_lick_freq = periods.avg_lick_freq(session)
+        avg_lick_freq_csplus = periods.avg_lick_freq(csplus)
+        avg_lick_freq_csminus = periods.avg_lick_freq(csminus)
+        avg_lick_freq_no_signal = periods.avg_lick_freq(
+            in_trial & periods.mask(trial_types=[4])
+        )
 
         # Pre-CS period features
-        df_is_pre_cs = dfl[dfl["is_pre_cs"] == 1]
-        total_licks_is_pre_cs = df_is_pre_cs["lick"].sum()
-        avg_lick_freq_is_pre_cs = df_is_pre_cs["lick_frequency"].mean()
+        total_licks_is_pre_cs = periods.total(is_pre_cs)
+        avg_lick_freq_is_pre_cs = periods.avg_lick_freq(is_pre_cs)
 
         # Tone period features
-        df_is_tone = dfl[dfl["is_tone"] == 1]
-        total_licks_is_tone = df_is_tone["lick"].sum()
-        avg_lick_freq_is_tone = df_is_tone["lick_frequency"].mean()
-        dfl_csplus_is_tone = dfl_csplus[dfl_csplus["is_tone"] == 1]
-        avg_lick_freq_csplus_tone = dfl_csplus_is_tone["lick_frequency"].mean()
-        dfl_csminus_is_tone = dfl_csminus[dfl_csminus["is_tone"] == 1]
-        avg_lick_freq_csminus_tone = dfl_csminus_is_tone["lick_frequency"].mean()
+        total_licks_is_tone = periods.total(is_tone)
+        avg_lick_freq_is_tone = periods.avg_lick_freq(is_tone)
+        avg_lick_freq_csplus_tone = periods.avg_lick_freq(csplus & is_tone)
+        avg_lick_freq_csminus_tone = periods.avg_lick_freq(csminus & is_tone)
 
         # Trace period features
-        df_is_trace = df_is_trial[df_is_trial["is_trace"] == 1]
-        total_licks_is_trace = df_is_trace["lick"].sum()
-        avg_lick_freq_is_trace = df_is_trace["lick_frequency"].mean()
-        dfl_csplus_is_trace = dfl_csplus[dfl_csplus["is_trace"] == 1]
-        total_licks_csplus_trace = dfl_csplus_is_trace["lick"].sum()
-        avg_lick_freq_csplus_trace = dfl_csplus_is_trace["lick_frequency"].mean()
-        dfl_csminus_is_trace = dfl_csminus[dfl_csminus["is_trace"] == 1]
-        total_licks_csminus_trace = dfl_csminus_is_trace["lick"].sum()
-        avg_lick_freq_csminus_trace = dfl_csminus_is_trace["lick_frequency"].mean()
+        total_licks_is_trace = periods.total(is_trace)
+        avg_lick_freq_is_trace = periods.avg_lick_freq(is_trace)
+        total_licks_csplus_trace = periods.total(csplus & is_trace)
+        avg_lick_freq_csplus_trace = periods.avg_lick_freq(csplus & is_trace)
+        total_licks_csminus_trace = periods.total(csminus & is_trace)
+        avg_lick_freq_csminus_trace = periods.avg_lick_freq(csminus & is_trace)
 
         # Puff period features
-        df_is_puff = dfl[dfl["is_puff"] == 1]
-        total_licks_is_puff = df_is_puff["lick"].sum()
-        avg_lick_freq_is_puff = df_is_puff["lick_frequency"].mean()
+        total_licks_is_puff = periods.total(is_puff)
+        avg_lick_freq_is_puff = periods.avg_lick_freq(is_puff)
 
         # ITI features
-        dfl_iti = dfl[dfl["is_trial"] == 0]
-        total_licks_iti = dfl_iti["lick"].sum()
-        avg_lick_freq_iti = dfl_iti["lick_frequency"].mean()
-        dfl_csplus_iti = dfl_iti[dfl_iti["trial_type"].isin([1, 2])]
-        dfl_csminus_iti = dfl_iti[dfl_iti["trial_type"].isin([0, 3])]
-        avg_lick_freq_csplus_iti = dfl_csplus_iti["lick_frequency"].mean()
-        avg_lick_freq_csminus_iti = dfl_csminus_iti["lick_frequency"].mean()
+        total_licks_iti = periods.total(iti)
+        avg_lick_freq_iti = periods.avg_lick_freq(iti)
+        avg_lick_freq_csplus_iti = periods.avg_lick_freq(
+            iti & periods.mask(trial_types=[1, 2])
+        )
+        avg_lick_freq_csminus_iti = periods.avg_lick_freq(
+            iti & periods.mask(trial_types=[0, 3])
+        )
 
         # Trial specific stats
-        trials = range(min(dfl["trial"]), max(dfl["trial"]) + 1)
+        session_trials = periods.groups.loc[session, "trial"]
+        trials = range(min(session_trials), max(session_trials) + 1)
         trial_types = pd.Series(list(trial_types)).reindex(trials, fill_value=-1)
-        trial_durations = (
-            dfl.groupby("trial")["trial_time"].max().reindex(trials, fill_value=0)
-        )
-        avg_lick_freq_trial = (
-            dfl.groupby("trial")["lick_frequency"].mean().reindex(trials, fill_value=0)
-        )
-        avg_lick_freq_csplus_trial = (
-            dfl_csplus.groupby("trial")["lick_frequency"]
-            .mean()
-            .reindex(trials, fill_value=0)
-        )
-        avg_lick_freq_csminus_trial = (
-            dfl_csminus.groupby("trial")["lick_frequency"]
-            .mean()
-            .reindex(trials, fill_value=0)
-        )
-        avg_lick_freq_is_pre_cs_trial = (
-            df_is_pre_cs.groupby("trial")["lick_frequency"]
-            .mean()
-            .reindex(trials, fill_value=0)
-        )
-        avg_lick_freq_is_tone_trial = (
-            df_is_tone.groupby("trial")["lick_frequency"]
-            .mean()
-            .reindex(trials, fill_value=0)
-        )
-        avg_lick_freq_is_trace_trial = (
-            df_is_trace.groupby("trial")["lick_frequency"]
-            .mean()
-            .reindex(trials, fill_value=0)
-        )
-        avg_lick_freq_is_puff_trial = (
-            df_is_puff.groupby("trial")["lick_frequency"]
-            .mean()
-            .reindex(trials, fill_value=0)
-        )
-        avg_lick_freq_iti_trial = (
-            dfl_iti.groupby("trial")["lick_frequency"]
-            .mean()
-            .reindex(trials, fill_value=0)
-        )
-        avg_lick_freq_csplus_trace_trial = (
-            dfl_csplus_is_trace.groupby("trial")["lick_frequency"]
-            .mean()
-            .reindex(trials, fill_value=0)
-        )
-        avg_lick_freq_csminus_trace_trial = (
-            dfl_csminus_is_trace.groupby("trial")["lick_frequency"]
-            .mean()
-            .reindex(trials, fill_value=0)
-        )
-        total_licks_trial = (
-            dfl.groupby("trial")["lick"].sum().reindex(trials, fill_value=0)
-        )
-        total_licks_is_pre_cs_trial = (
-            df_is_pre_cs.groupby("trial")["lick"].sum().reindex(trials, fill_value=0)
+        trial_durations = periods.max_per_trial(session, trials, "trial_time")
+        avg_lick_freq_trial = periods.avg_lick_freq_per_trial(session, trials)
+        avg_lick_freq_csplus_trial = periods.avg_lick_freq_per_trial(csplus, trials)
+        avg_lick_freq_csminus_trial = periods.avg_lick_freq_per_trial(csminus, trials)
+        avg_lick_freq_is_pre_cs_trial = periods.avg_lick_freq_per_trial(
+            is_pre_cs, trials
         )
-        total_licks_is_tone_trial = (
-            df_is_tone.groupby("trial")["lick"].sum().reindex(trials, fill_value=0)
+        avg_lick_freq_is_tone_trial = periods.avg_lick_freq_per_trial(is_tone, trials)
+        avg_lick_freq_is_trace_trial = periods.avg_lick_freq_per_trial(
+            is_trace, trials
         )
-        total_licks_is_trace_trial = (
-            df_is_trace.groupby("trial")["lick"].sum().reindex(trials, fill_value=0)
+        avg_lick_freq_is_puff_trial = periods.avg_lick_freq_per_trial(is_puff, trials)
+        avg_lick_freq_iti_trial = periods.avg_lick_freq_per_trial(iti, trials)
+        avg_lick_freq_csplus_trace_trial = periods.avg_lick_freq_per_trial(
+            csplus & is_trace, trials
         )
-        total_licks_is_puff_trial = (
-            df_is_puff.groupby("trial")["lick"].sum().reindex(trials, fill_value=0)
-        )
-        total_licks_iti_trial = (
-            dfl_iti.groupby("trial")["lick"].sum().reindex(trials, fill_value=0)
+        avg_lick_freq_csminus_trace_trial = periods.avg_lick_freq_per_trial(
+            csminus & is_trace, trials
         )
+        total_licks_trial = periods.total_per_trial(session, trials)
+        total_licks_is_pre_cs_trial = periods.total_per_trial(is_pre_cs, trials)
+        total_licks_is_tone_trial = periods.total_per_trial(is_tone, trials)
+        total_licks_is_trace_trial = periods.total_per_trial(is_trace, trials)
+        total_licks_is_puff_trial = periods.total_per_trial(is_puff, trials)
+        total_licks_iti_trial = periods.total_per_trial(iti, trials)
 
         # Normalize lick frequency to the total licks in the session trials,
         # which will hopefully account for variance in lick sensor sensitivity
         # between sessions and between days. The factor of 1,000 is just for
         # readability of printed output
-        total_session_licks = dfl["lick"].sum()
+        total_session_licks = periods.total(session)
 
-        # Total licks
-        total_licks = df["lick"].sum()
-        total_puffed_licks = df["puffed_lick"].sum()
+        # Total licks, including outside of the session
+        everything = periods.mask()
+        total_licks = periods.total(everything)
+        total_puffed_licks = periods.total(everything, "puffed_lick")
 
         # Total licks by trial type, only during trial
-        dft = df[df["is_trial"] == 1]
-        total_licks_in_trial = dft["lick"].sum()
-        total_puffed_licks_in_trial = dft["puffed_lick"].sum()
-        df0 = df[df["trial_type"] == 0]
-        df0 = df0[df0["is_trial"] == 1]
-        total_licks_type_0 = df0["lick"].sum()
-        total_puffed_licks_type_0 = df0["puffed_lick"].sum()
-        df1 = df[df["trial_type"] == 1]
-        df1 = df1[df1["is_trial"] == 1]
-        total_licks_type_1 = df1["lick"].sum()
-        total_puffed_licks_type_1 = df1["puffed_lick"].sum()
-        df2 = df[df["trial_type"] == 2]
-        df2 = df2[df2["is_trial"] == 1]
-        total_licks_type_2 = df2["lick"].sum()
-        total_puffed_licks_type_2 = df2["puffed_lick"].sum()
-        df3 = df[df["trial_type"] == 3]
-        df3 = df3[df3["is_trial"] == 1]
-        total_licks_type_3 = df3["lick"].sum()
-        total_puffed_licks_type_3 = df3["puffed_lick"].sum()
-        df4 = df[df["trial_type"] == 4]
-        df4 = df4[df4["is_trial"] == 1]
-        total_licks_type_4 = df4["lick"].sum()
-        total_puffed_licks_type_4 = df4["puffed_lick"].sum()
+        dft = periods.mask(is_trial=1)
+        total_licks_in_trial = periods.total(dft)
+        total_puffed_licks_in_trial = periods.total(dft, "puffed_lick")
+        df0 = dft & periods.mask(trial_types=[0])
+        total_licks_type_0 = periods.total(df0)
+        total_puffed_licks_type_0 = periods.total(df0, "puffed_lick")
+        df1 = dft & periods.mask(trial_types=[1])
+        total_licks_type_1 = periods.total(df1)
+        total_puffed_licks_type_1 = periods.total(df1, "puffed_lick")
+        df2 = dft & periods.mask(trial_types=[2])
+        total_licks_type_2 = periods.total(df2)
+        total_puffed_licks_type_2 = periods.total(df2, "puffed_lick")
+        df3 = dft & periods.mask(trial_types=[3])
+        total_licks_type_3 = periods.total(df3)
+        total_puffed_licks_type_3 = periods.total(df3, "puffed_lick")
+        df4 = dft & periods.mask(trial_types=[4])
+        total_licks_type_4 = periods.total(df4)
+        total_puffed_licks_type_4 = periods.total(df4, "puffed_lick")
 
         # Total licks, water is on
-        df_water = df[df["water"] == 1]
-        total_licks_water_on = df_water["lick"].sum()
-        total_puffed_licks_water_on = df_water["puffed_lick"].sum()
-        df_water_t0 = df[df["water"] == 1]
-        df_water_t0 = df_water_t0[df_water_t0["is_trial"] == 1]
-        df_water_t0 = df_water_t0[df_water_t0["trial_type"] == 0]
-        total_licks_water_on_type_0 = df_water_t0["lick"].sum()
-        total_puffed_licks_water_on_type_0 = df_water_t0["puffed_lick"].sum()
-        df_water_t1 = df[df["water"] == 1]
-        df_water_t1 = df_water_t1[df_water_t1["is_trial"] == 1]
-        df_water_t1 = df_water_t1[df_water_t1["trial_type"] == 1]
-        total_licks_water_on_type_1 = df_water_t1["lick"].sum()
-        total_puffed_licks_water_on_type_1 = df_water_t1["puffed_lick"].sum()
+        df_water = periods.mask(water=1)
+        total_licks_water_on = periods.total(df_water)
+        total_puffed_licks_water_on = periods.total(df_water, "puffed_lick")
+        df_water_t0 = df_water & df0
+        total_licks_water_on_type_0 = periods.total(df_water_t0)
+        total_puffed_licks_water_on_type_0 = periods.total(df_water_t0, "puffed_lick")
+        df_water_t1 = df_water & df1
+        total_licks_water_on_type_1 = periods.total(df_water_t1)
+        total_puffed_licks_water_on_type_1 = periods.total(df_water_t1, "puffed_lick")
 
         # Some math
         z_total_licks_in_trial = scalar_divide(
@@ -587,7 +1050,7 @@ def get_data_features_from_data_file(
             "mouse_id": df["mouse_id"].iloc[0],
             "session_id": df["session_id"].iloc[0],
             "day_of_week": df["day_of_week"].iloc[0],
-            "duration": max(dfl["session_time"]) - min(dfl["session_time"]),
+            "duration": periods.duration(session),
             "avg_lick_freq": avg_lick_freq,
             "avg_lick_freq_is_pre_cs": avg_lick_freq_is_pre_cs,
             "avg_lick_freq_is_tone": avg_lick_freq_is_tone,
@@ -679,10 +1142,66 @@ def get_data_features_from_data_file(
     return (
         data_features,
         data_features_trial,
-        pd.concat(data_frames).reset_index(drop=True),
+        concat_session_data(data_frames),
     )
 
 
+def load_data_features(
+    full_file: str,
+    verbose: bool = False,
+    cache: Optional[SessionCache] = None,
+) -> tuple[list, list, pd.DataFrame]:
+    """
+    Return the output of `get_data_features_from_data_file`, reading it
+    from the `cache` when the file has not changed since it was last
+    parsed. Errors are cached as well, and re-raised as `ValueError`
+    just like a fresh parse would raise them.
+    """
+    if cache is None:
+        return get_data_features_from_data_file(full_file=full_file, verbose=verbose)
+
+    entry = cache.load(full_file)
+    if entry is None:
+        # The signature of the file as it was before parsing it
+        signature = cache.signature(full_file)
+        try:
+            features, trial_features, data = get_data_features_from_data_file(
+                full_file=full_file,
+                verbose=verbose,
+            )
+        except ValueError as e:
+            cache.save(full_file, signature=signature, error=str(e))
+            raise
+        cache.save(
+            full_file,
+            signature=signature,
+            features=features,
+            trial_features=trial_features,
+            data=data,
+        )
+        return features, trial_features, data
+
+    if entry["error"] is not None:
+        raise ValueError(entry["error"])
+    return entry["features"], entry["trial_features"], entry["data"]
+
+
+def _load_features_only(
+    full_file: str,
+    verbose: bool = False,
+    cache: Optional[SessionCache] = None,
+) -> tuple[list, list, pd.DataFrame]:
+    """
+    `load_data_features`, with the event data left out. Worker processes
+    that do not need to return event data use this, so that it is not
+    pickled back to the parent process
+    """
+    features, trial_features, data = load_data_features(
+        full_file=full_file, verbose=verbose, cache=cache
+    )
+    return features, trial_features, data.iloc[:0]
+
+
 class Analysis:
     """
     Given a root data directory, extract features for an analysis. The data
@@ -694,12 +1213,12 @@ class Analysis:
 
     """
 
-    # TODO: investigate if performance becomes an issue
-    #
-    #   - Extracting features into data frames, and not concatenating all
-    #     data from all mice/sessions
-    #   - At either point, storing processed data
-    #
+    # Processed data is stored per file when a `cache_dir` is provided.
+    # With `lazy` set, event data is not concatenated for all mice and
+    # sessions, but loaded per session when needed. With a `store_dir`,
+    # event data is appended to a memory-mapped `EventStore` instead.
+    # With a `mirror_root`, base data files are read from a local mirror
+    # of the data root
 
     def __init__(
         self,
@@ -708,25 +1227,116 @@ class Analysis:
         verbose: bool = True,
         cohorts: list[str] = [],
         mice_of_interest: list[str] = [],
+        cache_dir: Optional[str] = None,
+        workers: int = 1,
+        lazy: bool = False,
+        lazy_max_sessions: int = 8,
+        store_dir: Optional[str] = None,
+        mirror_root: Optional[str] = None,
     ) -> None:
+        # Base data files on the Google Drive mount can be copied to a
+        # local mirror first, which is then analyzed, see `tfcrig.mirror`.
+        # It is synced again on every `refresh`
+        self.mirror = (
+            DataMirror(data_root=data_root, mirror_root=mirror_root, cohorts=cohorts)
+            if mirror_root
+            else None
+        )
+        if self.mirror is not None:
+            data_root = self.mirror.sync()
         self.data_root = data_root
         self.verbose = verbose
         self.cohorts = cohorts
         self.mice_of_interest = mice_of_interest
 
+        # Feature extraction is CPU-bound, so files can be spread over a
+        # pool of `workers` processes
+        self.workers = workers
+
+        # Parsed files can be cached between runs, see `tfcrig.cache`
+        self.cache = SessionCache(cache_dir) if cache_dir else None
+
+        # Directory listings are kept alongside the cache, so that only
+        # changed directories are listed again, see `tfcrig.manifest`
+        self.manifest = DataManifest(
+            data_root,
+            os.path.join(cache_dir, MANIFEST_FILE_NAME) if cache_dir else None,
+        )
+
+        # Event data can be left on disk and loaded one session at a time,
+        # keeping the `lazy_max_sessions` most recently used in memory
+        self.lazy = lazy
+        self.lazy_max_sessions = lazy_max_sessions
+        self._session_data = OrderedDict()
+
+        # Event data of every session can be kept in one memory-mapped
+        # store on disk, see `tfcrig.store`. It is rebuilt for each
+        # analysis, sessions are sliced from it without copying
+        self.store = EventStore(store_dir) if store_dir else None
+        if self.store is not None:
+            self.store.clear()
+
+        # The file each mouse ID, session ID pair was parsed from
+        self.session_files = {}
+
         # Keep track of per-file errors
         self.file_errors = {}
 
+        # The size and modification time of each data file when it was
+        # loaded, so that `refresh` can tell which files changed since
+        self.file_signatures = {}
+
+        data_files = self._scan_data_files()
+
+        print("Gathering data...")
+        features, trial_features, data_frames = self._gather_data_files(
+            data_files, keep_data=not self.lazy and self.store is None
+        )
+        self.df = pd.DataFrame(features)
+        self.df = self.df.sort_values(by=["session_id", "mouse_id"])
+        self.trial_df = pd.DataFrame(trial_features)
+        self.trial_df = self.trial_df.sort_values(
+            by=["session_id", "trial", "mouse_id"]
+        )
+        if self.lazy or self.store is not None:
+            self._data = None
+        else:
+            self._data = concat_session_data(data_frames)
+
+        # Print errors we found
+        self._print_file_errors()
+
+        # Session plotting hooks
+        self.mouse_id_widget = widgets.Dropdown(
+            options=sorted({mouse_id for mouse_id, _ in self.session_files}),
+            description="Mouse ID:",
+            disabled=False,
+        )
+        self.session_id_widget = widgets.Dropdown(
+            description="Session ID:",
+            disabled=False,
+        )
+        self.plot_region_widget = widgets.Dropdown(
+            options=["trial_type", "is_trial"],
+            description="Plot Region:",
+            disabled=False,
+        )
+        self.mouse_id_widget.observe(self.update_session_id_options, names="value")
+        self.update_session_id_options()
+
+    def _scan_data_files(self) -> list[str]:
+        """
+        Walk the data root for the directories of the cohorts of interest,
+        and return the base data files of the mice of interest in them
+        """
         # Use a subset of directories for the analysis
         # Need to pre-define the set of directories and files of interest
         self.os_walk = []
         cohort_pattern = create_cohort_pattern(self.data_root)
-        for root, dirs, files in os.walk(self.data_root):
-            if "/test_data/" in root and "/test_data/" not in self.data_root:
-                # There exists a top-level 'test_data' folder that we should skip
-                continue
-            if "/duplicate_data/" in root and "/duplicate_data/" not in self.data_root:
-                # Likewise, skip the 'duplicate_data' folder
+        for root, dirs, files in self.manifest.walk():
+            if is_skipped_data_dir(root, self.data_root):
+                # There exist top-level 'test_data' and 'duplicate_data'
+                # folders that we should skip
                 continue
             if root_contains_cohort_of_interest(root, cohort_pattern, self.cohorts):
                 self.os_walk.append((root, dirs, files))
@@ -734,13 +1344,7 @@ class Analysis:
         # From the entire data root directory, get the set of mouse IDs
         self.mouse_ids = get_mouse_ids(self.os_walk)
 
-        # Likewise, extract features from all of the data
-        features = []
-        trial_features = []
-        data_frames = []
-
-        print("Gathering data...")
-        file_i = 0
+        data_files = []
         for root, _, files in self.os_walk:
             for file in files:
                 if not is_base_data_file(file):
@@ -751,60 +1355,179 @@ class Analysis:
                         [mouse_id in self.mice_of_interest for mouse_id in mouse_ids]
                     ):
                         continue
+                data_files.append(os.path.join(root, file))
+        return data_files
 
-                # Try to extract features.
-                # Keep track of errors we raise above, to be printed later.
-                file_i += 1
-                print(f"file {file_i}: {file}")
-                try:
-                    f_features, f_trial_features, f_data_frames = (
-                        get_data_features_from_data_file(
-                            full_file=os.path.join(root, file),
-                            verbose=self.verbose,
-                        )
-                    )
-                except ValueError as e:
-                    error = str(e)
-                    if error not in self.file_errors:
-                        self.file_errors[error] = [file]
-                    else:
-                        self.file_errors[error].append(file)
-                    continue
-                features += f_features
-                trial_features += f_trial_features
-                if not f_data_frames.empty:
-                    data_frames.append(f_data_frames)
-        self.df = pd.DataFrame(features)
-        self.df = self.df.sort_values(by=["session_id", "mouse_id"])
-        self.trial_df = pd.DataFrame(trial_features)
-        self.trial_df = self.trial_df.sort_values(
-            by=["session_id", "trial", "mouse_id"]
-        )
-        self.data = pd.concat(data_frames).reset_index(drop=True)
+    def _gather_data_files(
+        self,
+        data_files: list[str],
+        keep_data: bool,
+    ) -> tuple[list, list, list[pd.DataFrame]]:
+        """
+        Extract features from all of the given data files, recording the
+        errors, signature, and sessions of each file. Event data is only
+        returned if `keep_data` is set, and appended to the `store` if
+        there is one
+        """
+        features = []
+        trial_features = []
+        data_frames = []
 
-        # Print errors we found
+        # Signatures are taken before parsing, so that a file written to
+        # while it is parsed is picked up again by `refresh`
+        for full_file in data_files:
+            self.file_signatures[full_file] = file_signature(full_file)
+        cohort_pattern = create_cohort_pattern(self.data_root)
+
+        for file_i, (full_file, outcome) in enumerate(
+            self._load_data_files(
+                data_files, keep_data=keep_data or self.store is not None
+            ),
+            start=1,
+        ):
+            file = os.path.basename(full_file)
+            print(f"file {file_i}: {file}")
+
+            # Keep track of errors raised while extracting features, to be
+            # printed later
+            if isinstance(outcome, ValueError):
+                error = str(outcome)
+                if error not in self.file_errors:
+                    self.file_errors[error] = [file]
+                else:
+                    self.file_errors[error].append(file)
+                continue
+            f_features, f_trial_features, f_data_frames = outcome
+            features += f_features
+            trial_features += f_trial_features
+            for f_feature in f_features:
+                key = (f_feature["mouse_id"], f_feature["session_id"])
+                self.session_files[key] = full_file
+            if f_data_frames.empty:
+                continue
+            if self.store is not None:
+                cohort = extract_cohort(os.path.dirname(full_file), cohort_pattern)
+                self.store.append(f_data_frames, cohort, full_file)
+            if keep_data:
+                data_frames.append(f_data_frames)
+        if self.store is not None:
+            self.store.flush()
+        return features, trial_features, data_frames
+
+    def _print_file_errors(self) -> None:
         for error, files in self.file_errors.items():
             print(error)
             for file in sorted(files):
                 builtin_print(f" - {file}")
 
-        # Session plotting hooks
-        self.mouse_id_widget = widgets.Dropdown(
-            options=sorted(list(self.data["mouse_id"].unique())),
-            description="Mouse ID:",
-            disabled=False,
-        )
-        self.session_id_widget = widgets.Dropdown(
-            description="Session ID:",
-            disabled=False,
+    def refresh(self) -> list[str]:
+        """
+        Re-scan the data root and process only the data files that are new
+        or have changed since they were last loaded. Rows of changed and
+        removed files are replaced in `df`, `trial_df`, and `data`, and the
+        session widgets are updated. Returns the files that were processed
+        """
+        if self.mirror is not None:
+            self.mirror.sync()
+        data_files = self._scan_data_files()
+        changed_files = [
+            full_file
+            for full_file in data_files
+            if self.file_signatures.get(full_file) != file_signature(full_file)
+        ]
+        removed_files = set(self.file_signatures) - set(data_files)
+        if not changed_files and not removed_files:
+            print("No new or changed data files")
+            return []
+
+        # Forget everything known about the files being replaced
+        replaced_files = set(changed_files) | removed_files
+        replaced_sessions = [
+            key
+            for key, full_file in self.session_files.items()
+            if full_file in replaced_files
+        ]
+        for key in replaced_sessions:
+            del self.session_files[key]
+            self._session_data.pop(key, None)
+            if self.store is not None:
+                self.store.remove(*key)
+        for full_file in removed_files:
+            del self.file_signatures[full_file]
+        replaced_names = {os.path.basename(full_file) for full_file in replaced_files}
+        for error in list(self.file_errors):
+            files = [f for f in self.file_errors[error] if f not in replaced_names]
+            if files:
+                self.file_errors[error] = files
+            else:
+                del self.file_errors[error]
+
+        def is_replaced(df: pd.DataFrame) -> np.ndarray:
+            return pd.MultiIndex.from_arrays(
+                [df["mouse_id"], df["session_id"]]
+            ).isin(replaced_sessions)
+
+        print("Refreshing data...")
+        features, trial_features, data_frames = self._gather_data_files(
+            changed_files, keep_data=self._data is not None
         )
-        self.plot_region_widget = widgets.Dropdown(
-            options=["trial_type", "is_trial"],
-            description="Plot Region:",
-            disabled=False,
+        self.df = pd.concat(
+            [self.df[~is_replaced(self.df)], pd.DataFrame(features)],
+            ignore_index=True,
+        ).sort_values(by=["session_id", "mouse_id"])
+        self.trial_df = pd.concat(
+            [self.trial_df[~is_replaced(self.trial_df)], pd.DataFrame(trial_features)],
+            ignore_index=True,
+        ).sort_values(by=["session_id", "trial", "mouse_id"])
+        if self._data is not None:
+            self._data = concat_session_data(
+                [self._data[~is_replaced(self._data)]] + data_frames
+            )
+
+        self._print_file_errors()
+
+        self.mouse_id_widget.options = sorted(
+            {mouse_id for mouse_id, _ in self.session_files}
         )
-        self.mouse_id_widget.observe(self.update_session_id_options, names="value")
         self.update_session_id_options()
+        return changed_files
+
+    def _load_data_files(self, data_files: list[str], keep_data: bool = True):
+        """
+        Extract features from each data file, yielding `(full_file,
+        outcome)` pairs in the order of `data_files`. The outcome is
+        either the output of `load_data_features` or the `ValueError`
+        it raised. With more than one worker, files are parsed in a
+        process pool, but results are still yielded in order. Unless
+        `keep_data` is set, workers return empty event data
+        """
+        if self.workers <= 1:
+            for full_file in data_files:
+                try:
+                    yield full_file, load_data_features(
+                        full_file=full_file,
+                        verbose=self.verbose,
+                        cache=self.cache,
+                    )
+                except ValueError as e:
+                    yield full_file, e
+            return
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = [
+                executor.submit(
+                    load_data_features if keep_data else _load_features_only,
+                    full_file=full_file,
+                    verbose=self.verbose,
+                    cache=self.cache,
+                )
+                for full_file in data_files
+            ]
+            for full_file, future in zip(data_files, futures):
+                try:
+                    yield full_file, future.result()
+                except ValueError as e:
+                    yield full_file, e
 
     def info(self, df: pd.DataFrame) -> None:
         """
@@ -839,6 +1562,69 @@ class Analysis:
         builtin_print(f"- positive_signal: {df['positive_signal'].value_counts()}")
         builtin_print(f"- water: {df['water'].value_counts()}")
 
+    def memory_report(self) -> pd.DataFrame:
+        """
+        Print and return the memory used by each column of the event data
+        in memory, that is `self.data` or, for a lazy analysis, the
+        sessions loaded so far. Each column is shown next to an estimate
+        of what it would use with the plain types it had before
+        `SESSION_DATA_DTYPES`: Python strings for text and 64-bit integers
+        for numbers. The estimate is computed from the categories and
+        their counts, so no wide copy is ever built
+        """
+        data = self._data
+        if data is None and self.store is not None:
+            # Numeric columns are memory-mapped rather than held in memory
+            data = self.store.data()
+        if data is None:
+            # A lazy analysis only holds the sessions it has loaded so far
+            loaded = list(self._session_data.values())
+            if loaded:
+                data = concat_session_data(loaded)
+            else:
+                data = pd.DataFrame(columns=list(SESSION_DATA_DTYPES)).astype(
+                    SESSION_DATA_DTYPES
+                )
+
+        rows = []
+        for column in data.columns:
+            series = data[column]
+            n = len(series)
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                # One pointer per event, plus a string object per event
+                codes = series.cat.codes.to_numpy()
+                counts = np.bincount(
+                    codes[codes >= 0], minlength=len(series.cat.categories)
+                )
+                sizes = np.array(
+                    [sys.getsizeof(c) for c in series.cat.categories], dtype=np.int64
+                )
+                before_dtype = "object"
+                before = 8 * n + int(counts @ sizes)
+            else:
+                before_dtype = "datetime64[ns]" if series.dtype.kind == "M" else "int64"
+                before = 8 * n
+            rows.append(
+                {
+                    "column": column,
+                    "dtype": str(series.dtype),
+                    "bytes": series.memory_usage(index=False, deep=True),
+                    "before_dtype": before_dtype,
+                    "before_bytes": before,
+                }
+            )
+        report = pd.DataFrame(rows).set_index("column")
+
+        total = report["bytes"].sum()
+        total_before = report["before_bytes"].sum()
+        builtin_print(report.to_string())
+        print(
+            f"Events: {len(data):,}, memory: {total / 1e6:,.1f} MB, "
+            f"before: {total_before / 1e6:,.1f} MB "
+            f"({scalar_divide(total_before, total):.1f}x)"
+        )
+        return report
+
     def summarize_licks_per_session(
         self,
         mouse_ids: list = [],
@@ -1169,13 +1955,71 @@ class Analysis:
                 f"P-value {round(p, 2)} is greater than alpha {alpha}, x and y are the same."
             )
 
+    @property
+    def data(self) -> pd.DataFrame:
+        """
+        Event data for every mouse and session. With `lazy` set, it is
+        only loaded, and then kept, on first use. Use `session_data` to
+        load a single session instead. With a `store`, it is read from
+        the store on every use, unless `data` was assigned
+        """
+        if self._data is not None:
+            return self._data
+        if self.store is not None:
+            return self.store.data()
+        # In the order the files were first loaded
+        full_files = list(dict.fromkeys(self.session_files.values()))
+        self._data = concat_session_data(
+            [
+                load_data_features(full_file, cache=self.cache)[2]
+                for full_file in full_files
+            ]
+        )
+        return self._data
+
+    @data.setter
+    def data(self, data: pd.DataFrame) -> None:
+        """
+        Replace the event data, e.g. with a filtered copy of it. It is
+        then kept in memory, and used by `session_data` and `refresh`
+        """
+        self._data = data
+
+    def session_data(self, mouse_id: str, session_id: int) -> pd.DataFrame:
+        """
+        Event data for one mouse, one session. With `lazy` set, it is read
+        from the cache, or parsed again, the first time it is needed and
+        kept for the `lazy_max_sessions` most recently used sessions. With
+        a `store`, it is sliced from the store
+        """
+        key = (mouse_id, int(session_id))
+        if self._data is not None:
+            data = self._data
+            return _select_session(
+                data, (data["mouse_id"] == key[0]) & (data["session_id"] == key[1])
+            )
+        if self.store is not None:
+            return _select_session(self.store.session(*key), None)
+
+        if key in self._session_data:
+            self._session_data.move_to_end(key)
+            return self._session_data[key]
+
+        if key not in self.session_files:
+            raise ValueError(f"No data for mouse {key[0]}, session {key[1]}!")
+        _, _, data = load_data_features(self.session_files[key], cache=self.cache)
+        data = _select_session(data, data["mouse_id"] == key[0])
+        self._session_data[key] = data
+        while len(self._session_data) > self.lazy_max_sessions:
+            self._session_data.popitem(last=False)
+        return data
+
     def update_session_id_options(self, *args, **kwargs) -> None:
         selected_mouse_id = self.mouse_id_widget.value
         session_ids = [
-            int_session_id_to_date_string(d)
-            for d in self.data[self.data["mouse_id"] == selected_mouse_id][
-                "session_id"
-            ].unique()
+            int_session_id_to_date_string(session_id)
+            for mouse_id, session_id in self.session_files
+            if mouse_id == selected_mouse_id
         ]
         session_ids = sorted(list(set(session_ids)))
         self.session_id_widget.options = session_ids
@@ -1183,14 +2027,31 @@ class Analysis:
     def interactive(self):
         display(
             widgets.interactive(
-                self.interactive_session_display,
+                self.interactive_session_display_by_id,
                 mouse_id=self.mouse_id_widget,
                 session_id=self.session_id_widget,
                 plot_region=self.plot_region_widget,
-                data=widgets.fixed(self.data),
             ),
         )
 
+    def interactive_session_display_by_id(
+        self,
+        mouse_id: str,
+        session_id: str,
+        plot_region: str,
+    ) -> None:
+        """
+        Plots a session, loading only its data. The `session_id` is the
+        date-time string shown by the session widget
+        """
+        if mouse_id is None or session_id is None:
+            return
+        data = self.session_data(
+            mouse_id,
+            session_id.replace("-", "").replace("T", "").replace(":", ""),
+        )
+        self.interactive_session_display(data, mouse_id, session_id, plot_region)
+
     @staticmethod
     def interactive_session_display(
         data: pd.DataFrame,
@@ -1219,20 +2080,19 @@ class Analysis:
         #
         #   - Only consider once the session has started
         #   - Sort by session time
-        #   - Add a `time` (based on session time) index for calculation
         #
         df = df[df["session_time"] > 0]
-        df["session_time"] = df["session_time"] / 1000 / 60  # [min]
         df = df.sort_values(by="session_time")
         df = df[df["is_session"] == 1]
-        df["time"] = pd.to_datetime(df["session_time"], unit="m")
-        df.set_index("time", inplace=True)
 
         # Lick frequency calculation
         # The `window` is 1000ms (1s) in `session_time`
-        df["lick_rate"] = (
-            df["lick"].rolling(window="1s", min_periods=1, center=True).sum()
+        df["lick_rate"] = centered_rolling_sum(
+            df["session_time"].to_numpy(),
+            df["lick"].to_numpy(),
+            window=LICK_FREQUENCY_WINDOW_MS,
         )
+        df["session_time"] = df["session_time"] / 1000 / 60  # [min]
         plt.figure(figsize=(15, 5))
 
         # Add background colors for whether it is a trial
@@ -0,0 +1,138 @@
+"""Persistent, per-file cache of features extracted from base data files.
+
+Raw session files do not change after collection, yet every `Analysis`
+re-parses all of them. The `SessionCache` stores, for each base data
+file, the parsed event frame together with the session- and trial-level
+feature rows produced by `get_data_features_from_data_file`. Entries are
+keyed by the absolute file path and validated against the file size and
+modification time, so a file rewritten by `RigFiles.clean` or
+`RigFiles.sync` is re-parsed on the next load.
+"""
+
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+import pandas as pd
+
+CACHE_VERSION = 2
+"""
+Bump this whenever the parsed data or features change shape, so that
+stale cache entries are ignored rather than silently reused
+"""
+
+CACHE_FILE_SUFFIX = ".pkl"
+
+
+@dataclass
+class SessionCache:
+    """
+    A directory of cache entries, one per base data file. Each entry is
+    a pickled dictionary holding the features, trial features, and the
+    parsed event data frame (or the error raised while parsing), plus
+    the signature of the file it was built from.
+
+    Pickled data frames keep their columns as contiguous NumPy blocks,
+    so loading an entry is a few large reads rather than a JSON decode.
+    """
+
+    cache_dir: str
+    hash_contents: bool = False
+
+    def __post_init__(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def cache_file(self, full_file: str) -> str:
+        """
+        Return the path of the cache entry for a given data file. The
+        absolute path is hashed so that files with the same name in
+        different cohorts never collide
+        """
+        key = hashlib.sha1(os.path.abspath(full_file).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, key + CACHE_FILE_SUFFIX)
+
+    def signature(self, full_file: str) -> dict:
+        """
+        The values a cache entry is validated against. Size and
+        modification time are cheap to read over the Google Drive
+        mount; a content hash can be added for stricter checks
+        """
+        stat = os.stat(full_file)
+        signature = {
+            "version": CACHE_VERSION,
+            "path": os.path.abspath(full_file),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+        if self.hash_contents:
+            with open(full_file, "rb") as f:
+                signature["sha1"] = hashlib.sha1(f.read()).hexdigest()
+        return signature
+
+    def load(self, full_file: str) -> Optional[dict]:
+        """
+        Return the cache entry for `full_file`, or `None` if there is no
+        entry or if the entry no longer matches the file on disk
+        """
+        cache_file = self.cache_file(full_file)
+        if not os.path.isfile(cache_file):
+            return None
+        try:
+            entry = pd.read_pickle(cache_file)
+        except Exception:
+            # A partially written or otherwise unreadable entry is
+            # treated as a miss, and will be overwritten
+            return None
+        if entry.get("signature") != self.signature(full_file):
+            return None
+        return entry
+
+    def save(
+        self,
+        full_file: str,
+        *,
+        signature: dict = None,
+        features: list = None,
+        trial_features: list = None,
+        data: pd.DataFrame = None,
+        error: str = None,
+    ) -> None:
+        """
+        Store the outcome of parsing `full_file`. Either the parsed
+        outputs or the error message raised while parsing are stored,
+        so known-bad files are not re-parsed either. Pass the `signature`
+        taken before parsing, so that a file rewritten while it is parsed
+        is not stored under its new signature
+        """
+        entry = {
+            "signature": signature or self.signature(full_file),
+            "features": features,
+            "trial_features": trial_features,
+            "data": data,
+            "error": error,
+        }
+
+        # Write to a temporary file first so that a reader never sees a
+        # partially written entry
+        cache_file = self.cache_file(full_file)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        pd.to_pickle(entry, tmp_file)
+        os.replace(tmp_file, cache_file)
+
+    def invalidate(self, full_file: str) -> None:
+        """
+        Remove the cache entry for `full_file`, if any. Used by
+        `RigFiles` whenever it rewrites, renames, or restores a file
+        """
+        cache_file = self.cache_file(full_file)
+        if os.path.isfile(cache_file):
+            os.remove(cache_file)
+
+    def clear(self) -> None:
+        """
+        Remove every cache entry
+        """
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.endswith(CACHE_FILE_SUFFIX):
+                os.remove(os.path.join(self.cache_dir, file_name))
@@ -3,10 +3,39 @@
 import json
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Optional, Union
 
+import numpy as np
 import pandas as pd
 
+from tfcrig.events import (
+    EVENT_CODES,
+    LICK_MSG,
+    NEGATIVE_SIGNAL_START_MSG,
+    NEGATIVE_SIGNAL_STOP_MSG,
+    POSITIVE_SIGNAL_START_MSG,
+    POSITIVE_SIGNAL_STOP_MSG,
+    SESSION_START_MSG,
+    TRIAL_END_MSG,
+    TRIAL_START_MSG,
+    WATER_OFF_MSG,
+    WATER_ON_MSG,
+    encode_events,
+)
+from tfcrig.helpers.tfcrig import datetime64_to_absolute_times
+from tfcrig.sidecar import load_sidecar
+
+
+def _message_ints(parts: List[str]) -> tuple:
+    """
+    The trial number, session time, and trial time of a split message, or
+    NaN if they do not parse as integers
+    """
+    try:
+        return int(parts[0]), int(parts[1]), int(parts[2])
+    except (ValueError, IndexError):
+        return np.nan, np.nan, np.nan
+
 
 @dataclass
 class Session:
@@ -15,16 +44,29 @@ class Session:
     """
 
     session_path: Union[str, Path]
-    _data: Dict[str, Any] = field(init=False, repr=False)
+    _data: Optional[Dict[str, Any]] = field(init=False, repr=False)
+    _sidecar: Optional[Dict[str, Any]] = field(init=False, repr=False)
+    _events: Dict[str, pd.DataFrame] = field(
+        init=False, repr=False, default_factory=dict
+    )
+    _metadata: Dict[str, Dict[str, Any]] = field(
+        init=False, repr=False, default_factory=dict
+    )
+    _trial_events: Dict[str, pd.DataFrame] = field(
+        init=False, repr=False, default_factory=dict
+    )
 
     def __post_init__(self):
         """
         Convert the session path to a Path object (if it's a string)
-        and load JSON data into the _data attribute.
+        and load JSON data into the _data attribute. If the file has a
+        sidecar, see `tfcrig.sidecar`, events are read from the sidecar
+        and the JSON data is only loaded when it is asked for.
         """
         if isinstance(self.session_path, str):
             self.session_path = Path(self.session_path)
-        self._data = self._load_json()
+        self._sidecar = load_sidecar(str(self.session_path))
+        self._data = self._load_json() if self._sidecar is None else None
 
     def _load_json(self):
         """
@@ -34,11 +76,18 @@ class Session:
             data = json.load(f)
         return data
 
+    def _json_data(self) -> Dict[str, Any]:
+        if self._data is None:
+            self._data = self._load_json()
+        return self._data
+
     @property
     def session_header(self) -> Dict[str, Any]:
         """
         Return the header of the session data.
         """
+        if self._sidecar is not None:
+            return self._sidecar["header"]
         return self._data["header"]
 
     @property
@@ -46,14 +95,14 @@ class Session:
         """
         Return the mouse IDs of the session data.
         """
-        return self._data["header"]["mouse_ids"]
+        return self.session_header["mouse_ids"]
 
     @property
     def session_data(self) -> Dict[str, Any]:
         """
         Return the 'data' section of the JSON file.
         """
-        return self._load_json()["data"]
+        return self._json_data()["data"]
 
     def get_mouse_session_data(self, mouse_id: str) -> Dict[str, Any]:
         """
@@ -62,56 +111,172 @@ class Session:
         :param mouse_id: A valid mouse ID found in self.mouse_ids.
         :return: A dictionary of session data for the specified mouse.
         """
-        return self._data["data"][mouse_id]
+        return self._json_data()["data"][mouse_id]
 
-    def get_session_metadata(self, mouse_id: str) -> Dict[str, Any]:
+    def get_events(self, mouse_id: str) -> pd.DataFrame:
         """
-        Collect metadata from the session events for a given mouse.
-        This method will parse messages until it encounters a line that
-        includes 'Session has started', at which point it will stop.
+        Return the session events of a mouse as a table. Each message is
+        split once, and the table is kept for the metadata, post-start
+        events, and trial events of the mouse.
+
+        Messages look like "trial_number: session_ms: trial_ms: event".
+        The table has one row per message, with columns:
+            ["trial_number", "session_ms", "trial_ms", "event",
+            "after_start", "mouse_id", "port", "absolute_time"].
+        The first three are NaN if they do not parse as integers, 'event'
+        is a categorical of everything after the third chunk (missing for
+        messages with fewer than four chunks), and 'after_start' marks
+        the messages after the line 'Session has started'.
 
         :param mouse_id: A valid mouse ID present in self.mouse_ids.
-        :return: A dictionary where keys and values are parsed from each message.
+        :return: A pandas DataFrame with one row per message.
         """
-        session_events = self.get_mouse_session_data(mouse_id)
-        metadata = {}
+        if mouse_id not in self._events:
+            self._tokenize_events(mouse_id)
+        return self._events[mouse_id]
+
+    def _tokenize_events(self, mouse_id: str) -> None:
+        """
+        Split every message of a mouse once, collecting the metadata from
+        the messages before the line 'Session has started' on the way.
+        """
+        if self._sidecar is not None:
+            parts, texts, numbers, is_session_start, columns = self._sidecar_tokens(
+                mouse_id
+            )
+        else:
+            parts, texts, numbers, is_session_start, columns = self._json_tokens(
+                mouse_id
+            )
 
+        started_before = np.cumsum(is_session_start) - is_session_start > 0
+        after_start = started_before & ~is_session_start
+
+        # Metadata is collected until the line 'Session has started'
+        metadata = {}
         always_string_keys = {
             "trialTypesChar"
         }  # this/these will have to stay as string to prevent losing information
-
-        for event in session_events:
-            message = event.get("message", "")
-
-            # If we've reached "Session has started", stop collecting metadata
-            if "Session has started" in message:
+        for p, text, is_start in zip(parts, texts, is_session_start):
+            if is_start:
                 break
+            if text is None:
+                continue
 
-            # Example messages look like: "0: 141840: 0: BAUD_RATE: 9600"
-            # We'll split by ": " and capture the last two parts as key/value.
-            parts = message.split(": ")
-            if len(parts) >= 4:
-                # The second-to-last chunk is the key, and the last chunk is the value
-                key = parts[-2].strip()  # e.g., "BAUD_RATE"
-                value_str = parts[-1].strip()  # e.g., "9600"
-
-                # Try converting the value to int or float if it's numeric
-                value: Any
-                if key in always_string_keys:
-                    value = value_str
-                else:
+            # The second-to-last chunk is the key, and the last chunk is the
+            # value. Try converting the value to int or float
+            key, value_str = (p[2] + ": " + text).split(": ")[-2:]
+            key = key.strip()
+            value_str = value_str.strip()
+            value: Any
+            if key in always_string_keys:
+                value = value_str
+            else:
+                try:
+                    value = int(value_str)
+                except ValueError:
                     try:
-                        value = int(value_str)
+                        value = float(value_str)
                     except ValueError:
-                        try:
-                            value = float(value_str)
-                        except ValueError:
-                            # If it can't be converted to a number, leave as string
-                            value = value_str
+                        value = value_str
+            metadata[key] = value
+
+        self._metadata[mouse_id] = metadata
+        self._events[mouse_id] = pd.DataFrame(
+            {
+                "trial_number": numbers[:, 0],
+                "session_ms": numbers[:, 1],
+                "trial_ms": numbers[:, 2],
+                "event": pd.Categorical(texts),
+                "after_start": after_start,
+                **columns,
+            }
+        )
+
+    def _json_tokens(self, mouse_id: str) -> tuple:
+        """
+        The split messages of a mouse, their texts after the third chunk,
+        the integers of the first three chunks, which messages mark the
+        session start, and the other columns of `get_events`
+        """
+        session_events = self.get_mouse_session_data(mouse_id)
+        messages = [event.get("message", "") for event in session_events]
+
+        # Example messages look like: "0: 141840: 0: BAUD_RATE: 9600". The
+        # fourth chunk keeps any further ": " of the message
+        parts = [message.split(": ", 3) for message in messages]
+        texts = [p[3] if len(p) == 4 else None for p in parts]
+        numbers = np.array([_message_ints(p) for p in parts], dtype=float)
+        is_session_start = np.array(
+            [SESSION_START_MSG in message for message in messages], dtype=bool
+        )
+        columns = {
+            "mouse_id": [event.get("mouse_id") for event in session_events],
+            "port": [event.get("port") for event in session_events],
+            "absolute_time": [event.get("absolute_time") for event in session_events],
+        }
+        return parts, texts, numbers.reshape(-1, 3), is_session_start, columns
+
+    def _sidecar_tokens(self, mouse_id: str) -> tuple:
+        """
+        Same as `_json_tokens`, from the columns of the sidecar. Messages
+        are only split for the raw events of the sidecar, and for the
+        metadata before the line 'Session has started'
+        """
+        sidecar = self._sidecar["data"][mouse_id]
+        dictionary = self._sidecar["messages"]
+        codes = sidecar["message"]
+        is_column = codes >= 0
+        n_events = len(codes)
+
+        texts = np.full(n_events, None, dtype=object)
+        texts[is_column] = dictionary[codes[is_column]]
+        numbers = np.column_stack(
+            [sidecar["trial"], sidecar["session_ms"], sidecar["trial_ms"]]
+        ).astype(float)
+        is_session_start = np.zeros(n_events, dtype=bool)
+        is_session_start[is_column] = np.array(
+            [SESSION_START_MSG in text for text in dictionary], dtype=bool
+        )[codes[is_column]]
+        shared = sidecar["shared"]
+        columns = {
+            "mouse_id": np.where(shared, None, mouse_id).astype(object),
+            "port": np.where(shared, None, sidecar["port"]).astype(object),
+            "absolute_time": datetime64_to_absolute_times(sidecar["absolute_time"]),
+        }
 
-                metadata[key] = value
+        raw_parts = {}
+        for i, event in sidecar["raw"].items():
+            message = event.get("message", "")
+            raw_parts[i] = message.split(": ", 3)
+            texts[i] = raw_parts[i][3] if len(raw_parts[i]) == 4 else None
+            numbers[i] = _message_ints(raw_parts[i])
+            is_session_start[i] = SESSION_START_MSG in message
+            for column in columns:
+                columns[column][i] = event.get(column)
+
+        # Only the messages up to the session start are needed as parts
+        n_parts = (
+            np.argmax(is_session_start) + 1 if is_session_start.any() else n_events
+        )
+        parts = [
+            raw_parts[i] if i in raw_parts else [str(int(x)) for x in numbers[i]]
+            for i in range(n_parts)
+        ]
+        return parts, texts, numbers, is_session_start, columns
 
-        return metadata
+    def get_session_metadata(self, mouse_id: str) -> Dict[str, Any]:
+        """
+        Collect metadata from the session events for a given mouse.
+        This method will parse messages until it encounters a line that
+        includes 'Session has started', at which point it will stop.
+
+        :param mouse_id: A valid mouse ID present in self.mouse_ids.
+        :return: A dictionary where keys and values are parsed from each message.
+        """
+        if mouse_id not in self._metadata:
+            self._tokenize_events(mouse_id)
+        return dict(self._metadata[mouse_id])
 
     def get_post_start_events(
         self, mouse_id: str, events_of_interest: List[str] = None
@@ -128,61 +293,38 @@ class Session:
         # Default events if none provided
         if events_of_interest is None:
             events_of_interest = [
-                "Lick",
-                "Water on",
-                "Water off",
-                "Negative signal start",
-                "Negative signal stop",
-                "Positive signal start",
-                "Positive signal stop",
-                "Trial has started",
-                "Trial has ended",
+                LICK_MSG,
+                WATER_ON_MSG,
+                WATER_OFF_MSG,
+                NEGATIVE_SIGNAL_START_MSG,
+                NEGATIVE_SIGNAL_STOP_MSG,
+                POSITIVE_SIGNAL_START_MSG,
+                POSITIVE_SIGNAL_STOP_MSG,
+                TRIAL_START_MSG,
+                TRIAL_END_MSG,
             ]
 
-        session_events = self.get_mouse_session_data(mouse_id)
-
-        # We'll start collecting once we see the "Session has started" message
-        start_collecting = False
-
-        # This will store our rows before we make a DataFrame
-        records = []
-
-        for event in session_events:
-            message = event.get("message", "")
-
-            # Check if we've reached the "Session has started"
-            if "Session has started" in message:
-                # Once this message is encountered, begin collecting subsequent events
-                start_collecting = True
-                continue
+        events = self.get_events(mouse_id)
+        events = events[events["after_start"] & events["event"].notna()]
 
-            # If we haven't seen "Session has started" yet, skip
-            if not start_collecting:
-                continue
+        # The final colon-separated part is the event description. It only
+        # has to be found once per distinct message text
+        event = events["event"].cat
+        event_names = np.array(
+            [text.split(": ")[-1].strip() for text in event.categories], dtype=object
+        )[event.codes.to_numpy()]
+        is_of_interest = np.isin(event_names, list(events_of_interest))
 
-            # Now parse events after "Session has started"
-            # Messages typically look like "0: 145804: 2418: Lick"
-            # The final colon-separated part is usually the event description
-            parts = message.split(": ")
-
-            # We only care about the events from `events_of_interest`
-            if len(parts) >= 4:
-                event_name = parts[-1].strip()
-
-                if event_name in events_of_interest:
-                    # Build a record with relevant fields
-                    records.append(
-                        {
-                            "mouse_id": event.get("mouse_id"),
-                            "port": event.get("port"),
-                            "absolute_time": event.get("absolute_time"),
-                            "event": event_name,
-                        }
-                    )
-
-        # Convert our collected records into a DataFrame for easy manipulation
         df = pd.DataFrame(
-            records, columns=["mouse_id", "port", "absolute_time", "event"]
+            {
+                "mouse_id": events["mouse_id"].to_numpy(dtype=object)[is_of_interest],
+                "port": events["port"].to_numpy(dtype=object)[is_of_interest],
+                "absolute_time": events["absolute_time"].to_numpy(dtype=object)[
+                    is_of_interest
+                ],
+                "event": event_names[is_of_interest],
+            },
+            columns=["mouse_id", "port", "absolute_time", "event"],
         )
         return df
 
@@ -202,135 +344,83 @@ class Session:
         :param mouse_id: The mouse ID to parse.
         :return: A pandas DataFrame of trial-level events.
         """
-        session_events = self.get_mouse_session_data(mouse_id)
+        if mouse_id not in self._trial_events:
+            self._trial_events[mouse_id] = self._parse_trial_events(mouse_id)
+        return self._trial_events[mouse_id].copy()
 
-        # This will hold our final rows for ALL trials
-        all_records: List[Dict[str, Any]] = []
-
-        # Temporary structure to hold the current trial data
-        # until we see 'Trial has ended'
-        current_trial = (
-            None  # Will be a dict with keys: trial_number, trial_type, events
-        )
-
-        for event in session_events:
-            msg = event.get("message", "")
-            parts = msg.split(": ")
-
-            # We expect something like: "6: 584376: 0: Trial has started"
-            # parts = ["6", "584376", "0", "Trial has started"] (or more if there's a colon in the last chunk)
-            if len(parts) < 4:
-                # Doesn't match the expected "trial_number: session_ms: trial_ms: event"
-                continue
-
-            trial_number_str, session_ms_str, trial_ms_str = (
-                parts[0],
-                parts[1],
-                parts[2],
-            )
-
-            # Join anything beyond the 3rd chunk to form the event string
-            # E.g., "Trial has started" or "currentTrialType: 2"
-            event_text = ": ".join(parts[3:]).strip()
-
-            # Attempt to convert those first three parts to integers
-            try:
-                trial_number = int(trial_number_str)
-                session_ms = int(session_ms_str)
-                trial_ms = int(trial_ms_str)
-            except ValueError:
-                # If they don't parse as integers, skip
-                continue
-
-            # -- Check for "Trial has started" --
-            if event_text == "Trial has started":
-                # If we were already in a trial, we close it out first
-                # (in case the data is malformed; else we can ignore it)
-                if current_trial is not None:
-                    # This would be unusual, but you can decide how to handle
-                    self._finalize_trial(current_trial, all_records, mouse_id)
-
-                # Begin a new trial
-                current_trial = {
-                    "trial_number": trial_number,
-                    "trial_type": None,  # Will fill in later if we see "currentTrialType"
-                    "events": [],
-                }
-
-                # Store the 'Trial has started' event itself
-                current_trial["events"].append(
-                    {
-                        "absolute_time": event["absolute_time"],
-                        "trial_time": trial_ms,
-                        "event": "Trial has started",
-                    }
-                )
-                continue
-
-            # If we're not currently in a trial, ignore events until next "Trial has started"
-            if current_trial is None:
-                continue
-
-            # -- Check for "currentTrialType: X" --
-            if event_text.startswith("currentTrialType: "):
-                # E.g., "currentTrialType: 2"
-                trial_type_str = event_text.split("currentTrialType: ")[1].strip()
+    def _parse_trial_events(self, mouse_id: str) -> pd.DataFrame:
+        columns = [
+            "mouse_id",
+            "trial_number",
+            "absolute_time",
+            "trial_time",
+            "event",
+            "trial_type",
+        ]
+
+        # Only messages like "6: 584376: 0: Trial has started" are considered,
+        # and not e.g. "3: 266487: 4", which has no event
+        events = self.get_events(mouse_id)
+        events = events[
+            events[["trial_number", "session_ms", "trial_ms"]].notna().all(axis=1)
+            & events["event"].notna()
+        ]
+
+        # Event names and trial types, once per distinct message text. The
+        # "currentTrialType: X" lines are kept as events too
+        event_names = []
+        trial_types = []
+        for text in events["event"].cat.categories:
+            text = text.strip()
+            trial_type = None
+            if text.startswith("currentTrialType: "):
+                trial_type_str = text.split("currentTrialType: ")[1].strip()
+                text = f"currentTrialType: {trial_type_str}"
                 try:
-                    current_trial["trial_type"] = int(trial_type_str)
+                    trial_type = int(trial_type_str)
                 except ValueError:
                     # If it can't parse to int, store it as string
-                    current_trial["trial_type"] = trial_type_str
-
-                # Optionally store the "currentTrialType" as an event row, if desired:
-                current_trial["events"].append(
-                    {
-                        "absolute_time": event["absolute_time"],
-                        "trial_time": trial_ms,
-                        "event": f"currentTrialType: {trial_type_str}",
-                    }
-                )
-                continue
-
-            # -- Check for "Trial has ended" --
-            if event_text == "Trial has ended":
-                # Record the 'Trial has ended' event
-                current_trial["events"].append(
-                    {
-                        "absolute_time": event["absolute_time"],
-                        "trial_time": trial_ms,
-                        "event": "Trial has ended",
-                    }
-                )
-                # Finalize this trial: store all events with known trial_number, trial_type, etc.
-                self._finalize_trial(current_trial, all_records, mouse_id)
-                current_trial = None  # reset for the next trial
-                continue
-
-            # -- Otherwise, it's a normal event (Lick, Water on, Water off, etc.) --
-            current_trial["events"].append(
-                {
-                    "absolute_time": event["absolute_time"],
-                    "trial_time": trial_ms,
-                    "event": event_text,
-                }
-            )
-
-        # If the file ends but a trial never ended,
-        # you can decide if you want to finalize it anyway:
-        if current_trial is not None:
-            self._finalize_trial(current_trial, all_records, mouse_id)
-
-        # Build a DataFrame
+                    trial_type = trial_type_str
+            event_names.append(text)
+            trial_types.append(trial_type)
+        codes = events["event"].cat.codes.to_numpy()
+        event_name = np.array(event_names, dtype=object)[codes]
+        event_code = encode_events(event_names + [None])[codes]
+        trial_type = np.array(trial_types + [None], dtype=object)[codes]
+
+        # A trial runs from a 'Trial has started' line up to and including
+        # the next 'Trial has ended' line, or up to the next trial if it
+        # never ended. Events outside of trials are ignored
+        is_trial_start = event_code == EVENT_CODES[TRIAL_START_MSG]
+        is_trial_end = event_code == EVENT_CODES[TRIAL_END_MSG]
+        trial = np.cumsum(is_trial_start)
+        ends_before = (
+            pd.Series(is_trial_end).groupby(trial).cumsum().to_numpy() - is_trial_end
+        )
+        in_trial = (trial > 0) & (ends_before == 0)
+        if not in_trial.any():
+            return pd.DataFrame([], columns=columns)
+
+        # Each trial takes the trial number of its first line, and the last
+        # trial type given in it
+        trial_numbers = events["trial_number"].to_numpy()[is_trial_start]
+        trial_type_of_trial = np.full(len(trial_numbers) + 1, None, dtype=object)
+        for i in np.flatnonzero(in_trial & (trial_type != None)):  # noqa: E711
+            trial_type_of_trial[trial[i]] = trial_type[i]
+
+        trial = trial[in_trial]
         df = pd.DataFrame(
-            all_records,
-            columns=[
-                "mouse_id",
-                "trial_number",
-                "absolute_time",
-                "trial_time",
-                "event",
-                "trial_type",
-            ],
+            {
+                "mouse_id": mouse_id,
+                "trial_number": trial_numbers[trial - 1].astype(np.int64),
+                "absolute_time": events["absolute_time"].to_numpy()[in_trial],
+                "trial_time": events["trial_ms"].to_numpy()[in_trial].astype(np.int64),
+                "event": event_name[in_trial],
+                "trial_type": pd.Series(
+                    trial_type_of_trial[trial], dtype=object
+                ).infer_objects(),
+            },
+            columns=columns,
         )
         return df
 
@@ -361,30 +451,6 @@ class Session:
 
         return pd.concat(all_results, ignore_index=True)
 
-    @staticmethod
-    def _finalize_trial(
-        trial_dict: Dict[str, Any],
-        master_list: List[Dict[str, Any]],
-        mouse_id: str,
-    ) -> None:
-        """
-        Helper function to dump the events of a single trial into the master record list.
-        """
-        trial_number = trial_dict["trial_number"]
-        trial_type = trial_dict["trial_type"]
-
-        for evt in trial_dict["events"]:
-            master_list.append(
-                {
-                    "mouse_id": mouse_id,
-                    "trial_number": trial_number,
-                    "absolute_time": evt["absolute_time"],
-                    "trial_time": evt["trial_time"],
-                    "event": evt["event"],
-                    "trial_type": trial_type,
-                }
-            )
-
 
 @dataclass
 class Trial:
@@ -451,7 +517,7 @@ class Trial:
         Return a DataFrame with the total lick times for each trial.
         """
         return (
-            self.trial_df[self.trial_df["event"] == "Lick"]
+            self.trial_df[self.trial_df["event"] == LICK_MSG]
             .groupby("trial_number")
             .size()
         )
@@ -476,7 +542,7 @@ class Trial:
         Returns the average interlick interval (ms) for each trial.
         Interlick Interval (ILI) = time difference between consecutive "Lick"
         """
-        lick_events = self.trial_df[self.trial_df["event"] == "Lick"].copy()
+        lick_events = self.trial_df[self.trial_df["event"] == LICK_MSG].copy()
         # get trail specific interlick intervals
         lick_events["interlick_interval"] = lick_events.groupby("trial_number")[
             "trial_time"
@@ -490,7 +556,7 @@ class Trial:
         """
         Returns the time of the first lick (ms) in each trial.
         """
-        lick_events = self.trial_df[self.trial_df["event"] == "Lick"].copy()
+        lick_events = self.trial_df[self.trial_df["event"] == LICK_MSG].copy()
 
         return lick_events.groupby("trial_number")["trial_time"].first()
 
@@ -503,6 +569,11 @@ class Trial:
         Normalization method:
         Licks in each period are divided by the licks in the 'pre-tone' period.
 
+        All trials are computed at once: events are assigned a period with
+        `np.digitize`, rewards are paired from shifted "Water on" and
+        "Water off" events, and rewarded licks are found with
+        `np.searchsorted` over the reward intervals.
+
         Duration calculation:
         - 'pre-tone': AUDITORY_START
         - 'tone': AUDITORY_STOP - AUDITORY_START
@@ -523,135 +594,149 @@ class Trial:
         pre_tone_end = pre_tone_duration
         tone_end = pre_tone_end + tone_duration
         trace_end = tone_end + trace_duration
+        period_ends = [pre_tone_end, tone_end, trace_end]
+        n_periods = len(period_ends) + 1
+
+        trial_duration = self._session_metadata.get("TRIAL_DURATION", 0)
+        water_dispense_time = self._session_metadata.get("WATER_DISPENSE_TIME", 0)
 
-        # Store results for each trial
-        trial_results = []
-
-        # Iterate over trials
-        for trial_number, trial_data in self.trial_df.groupby("trial_number"):
-
-            trial_data = trial_data.sort_values("trial_time").reset_index(drop=True)
-
-            trial_type = trial_data["trial_type"].iloc[0]
-
-            # Count licks in each period based on `trial_time`
-            pre_tone_licks = (
-                (trial_data["event"] == "Lick")
-                & (trial_data["trial_time"] < pre_tone_end)
-            ).sum()
-
-            tone_licks = (
-                (trial_data["event"] == "Lick")
-                & (trial_data["trial_time"] >= pre_tone_end)
-                & (trial_data["trial_time"] < tone_end)
-            ).sum()
-
-            trace_licks = (
-                (trial_data["event"] == "Lick")
-                & (trial_data["trial_time"] >= tone_end)
-                & (trial_data["trial_time"] < trace_end)
-            ).sum()
-
-            post_trace_licks = (
-                (trial_data["event"] == "Lick")
-                & (trial_data["trial_time"] >= trace_end)
-            ).sum()
-
-            rewards = []
-            current_reward = None
-            trial_duration = self._session_metadata.get("TRIAL_DURATION", 0)
-            water_dispense_time = self._session_metadata.get("WATER_DISPENSE_TIME", 0)
-
-            # Find all rewards in the trial
-            for _, row in trial_data.iterrows():
-                if row["event"] == "Water on":
-                    current_reward = row["trial_time"]
-                elif row["event"] == "Water off" and current_reward is not None:
-                    rewards.append((current_reward, row["trial_time"]))
-                    current_reward = None
-
-            if current_reward is not None:
-                expected_off = current_reward + water_dispense_time
-                if expected_off > trial_duration:
-                    rewards.append((current_reward, min(expected_off, trial_duration)))
-
-            pre_tone_rewards = sum(1 for start, end in rewards if start < pre_tone_end)
-            tone_rewards = sum(
-                1 for start, end in rewards if pre_tone_end <= start < tone_end
+        if self.trial_df.empty:
+            return pd.DataFrame()
+
+        # Events of all trials at once, ordered by trial and then time. Ties
+        # keep their order in `trial_df`
+        order = np.lexsort(
+            (
+                self.trial_df["trial_time"].to_numpy(),
+                self.trial_df["trial_number"].to_numpy(),
             )
-            trace_rewards = sum(
-                1 for start, end in rewards if tone_end <= start < trace_end
+        )
+        df = self.trial_df.iloc[order]
+        trial_index, trial_numbers = pd.factorize(df["trial_number"], sort=True)
+        n_trials = len(trial_numbers)
+        trial_time = df["trial_time"].to_numpy(dtype=np.int64)
+        event = encode_events(df["event"].to_numpy())
+
+        # Period of each event: 0 pre-tone, 1 tone, 2 trace, 3 post-trace
+        period = np.digitize(trial_time, period_ends)
+
+        def count_per_period(trial: np.ndarray, period: np.ndarray) -> np.ndarray:
+            counts = np.bincount(
+                trial * n_periods + period, minlength=n_trials * n_periods
             )
-            post_trace_rewards = sum(1 for start, end in rewards if trace_end <= start)
-
-            # Count rewarded licks (licks between Water on and Water off, these are raw counts)
-            pre_tone_rewarded_licks = tone_rewarded_licks = 0
-            trace_rewarded_licks = post_trace_rewarded_licks = 0
-
-            for _, row in trial_data.iterrows():
-                if row["event"] == "Lick":
-                    for water_on, water_off in rewards:
-                        if water_on < row["trial_time"] < water_off:
-                            if row["trial_time"] < pre_tone_end:
-                                pre_tone_rewarded_licks += 1
-                            elif row["trial_time"] < tone_end:
-                                tone_rewarded_licks += 1
-                            elif row["trial_time"] < trace_end:
-                                trace_rewarded_licks += 1
-                            else:
-                                post_trace_rewarded_licks += 1
-                            break
-
-            # Normalize licks by pre-tone licks (avoid division by zero)
-            ## Avoid division by zero
-            norm_factor = pre_tone_licks if pre_tone_licks > 0 else 1
-            if pre_tone_licks == 0:
-                print(
-                    f"""
+            return counts.reshape(n_trials, n_periods)
+
+        is_lick = event == EVENT_CODES[LICK_MSG]
+        licks = count_per_period(trial_index[is_lick], period[is_lick])
+
+        # A "Water off" closes a reward if the water event before it, in the
+        # same trial, is a "Water on". A "Water on" left open at the end of
+        # a trial closes at the end of the trial if it would outlast it
+        is_water = np.isin(
+            event, [EVENT_CODES[WATER_ON_MSG], EVENT_CODES[WATER_OFF_MSG]]
+        )
+        water_trial = trial_index[is_water]
+        water_time = trial_time[is_water]
+        water_on = event[is_water] == EVENT_CODES[WATER_ON_MSG]
+        same_trial_as_previous = np.r_[False, water_trial[1:] == water_trial[:-1]]
+        is_closed = ~water_on & np.r_[False, water_on[:-1]] & same_trial_as_previous
+        last_in_trial = np.r_[water_trial[1:] != water_trial[:-1], True]
+        is_left_open = (
+            water_on
+            & last_in_trial
+            & (water_time + water_dispense_time > trial_duration)
+        )
+        closed = np.flatnonzero(is_closed)
+        left_open = np.flatnonzero(is_left_open)
+        reward_trial = np.r_[water_trial[closed - 1], water_trial[left_open]]
+        reward_start = np.r_[water_time[closed - 1], water_time[left_open]]
+        reward_end = np.r_[
+            water_time[closed],
+            np.minimum(water_time[left_open] + water_dispense_time, trial_duration),
+        ]
+        reward_order = np.lexsort((reward_start, reward_trial))
+        reward_trial = reward_trial[reward_order]
+        reward_start = reward_start[reward_order]
+        reward_end = reward_end[reward_order]
+        rewards = count_per_period(reward_trial, np.digitize(reward_start, period_ends))
+
+        # Rewards within a trial do not overlap, so a lick is rewarded if it
+        # falls within the last reward that started before it
+        lick_trial = trial_index[is_lick]
+        lick_time = trial_time[is_lick]
+        lo = min(trial_time.min(), reward_start.min(initial=0))
+        span = max(trial_time.max(), reward_end.max(initial=0)) - lo + 1
+        reward = (
+            np.searchsorted(
+                reward_trial * span + (reward_start - lo),
+                lick_trial * span + (lick_time - lo),
+                side="left",
+            )
+            - 1
+        )
+        has_reward = reward >= 0
+        reward = np.where(has_reward, reward, 0)
+        is_rewarded = np.zeros(len(lick_time), dtype=bool)
+        if len(reward_trial):
+            is_rewarded = (
+                has_reward
+                & (reward_trial[reward] == lick_trial)
+                & (lick_time < reward_end[reward])
+            )
+        rewarded_licks = count_per_period(
+            lick_trial[is_rewarded], period[is_lick][is_rewarded]
+        )
+
+        # Normalize licks by pre-tone licks (avoid division by zero)
+        for trial_number in trial_numbers[licks[:, 0] == 0]:
+            print(
+                f"""
                       Warning: Trial {trial_number} has 0 pre-tone licks! Normalizing with 1 instead.
                       """
-                )
-            normalized_tone_licks = tone_licks / norm_factor
-            normalized_trace_licks = trace_licks / norm_factor
-            normalized_post_trace_licks = post_trace_licks / norm_factor
+            )
+        norm_factor = np.where(licks[:, 0] > 0, licks[:, 0], 1)
 
-            tone = (
+        # The trial type is read from the first event of each trial
+        first_event = np.r_[0, np.flatnonzero(np.diff(trial_index)) + 1]
+        trial_types = df["trial_type"].to_numpy()[first_event]
+        tone = [
+            (
                 "cs+"
                 if trial_type in [1, 2]
                 else "cs-" if trial_type in [0, 3] else "no_signal"
             )
-            puff = "puff" if trial_type in [1, 3] else "no_puff"
-
-            # Append results
-            trial_results.append(
-                {
-                    "trial_number": trial_number,
-                    "tone": tone,
-                    "airpuff": puff,
-                    "pre_tone_licks": pre_tone_licks,
-                    "tone_licks": tone_licks,
-                    "trace_licks": trace_licks,
-                    "post_trace_licks": post_trace_licks,
-                    "norm_tone_licks": normalized_tone_licks,
-                    "norm_trace_licks": normalized_trace_licks,
-                    "norm_post_trace_licks": normalized_post_trace_licks,
-                    "pre_tone_duration": pre_tone_duration / 1000,
-                    "tone_duration": tone_duration / 1000,
-                    "trace_duration": trace_duration / 1000,
-                    "post_trace_duration": post_trace_duration / 1000,
-                    "pre_tone_rewards": pre_tone_rewards,
-                    "tone_rewards": tone_rewards,
-                    "trace_rewards": trace_rewards,
-                    "post_trace_rewards": post_trace_rewards,
-                    "pre_tone_rewarded_licks": pre_tone_rewarded_licks,
-                    "tone_rewarded_licks": tone_rewarded_licks,
-                    "trace_rewarded_licks": trace_rewarded_licks,
-                    "post_trace_rewarded_licks": post_trace_rewarded_licks,
-                }
-            )
-
-        # Convert results into a DataFrame
-        return pd.DataFrame(trial_results)
+            for trial_type in trial_types
+        ]
+        puff = [
+            "puff" if trial_type in [1, 3] else "no_puff" for trial_type in trial_types
+        ]
+
+        return pd.DataFrame(
+            {
+                "trial_number": trial_numbers,
+                "tone": tone,
+                "airpuff": puff,
+                "pre_tone_licks": licks[:, 0],
+                "tone_licks": licks[:, 1],
+                "trace_licks": licks[:, 2],
+                "post_trace_licks": licks[:, 3],
+                "norm_tone_licks": licks[:, 1] / norm_factor,
+                "norm_trace_licks": licks[:, 2] / norm_factor,
+                "norm_post_trace_licks": licks[:, 3] / norm_factor,
+                "pre_tone_duration": pre_tone_duration / 1000,
+                "tone_duration": tone_duration / 1000,
+                "trace_duration": trace_duration / 1000,
+                "post_trace_duration": post_trace_duration / 1000,
+                "pre_tone_rewards": rewards[:, 0],
+                "tone_rewards": rewards[:, 1],
+                "trace_rewards": rewards[:, 2],
+                "post_trace_rewards": rewards[:, 3],
+                "pre_tone_rewarded_licks": rewarded_licks[:, 0],
+                "tone_rewarded_licks": rewarded_licks[:, 1],
+                "trace_rewarded_licks": rewarded_licks[:, 2],
+                "post_trace_rewarded_licks": rewarded_licks[:, 3],
+            }
+        )
 
     def compute_lick_delays(self) -> pd.DataFrame:
         """
@@ -663,6 +748,10 @@ class Trial:
         - 'delay_from_period_start':
                     Time of the first lick relative to the period start.
 
+        All trials are computed at once: licks are assigned a period with
+        `np.digitize`, and the first lick of each trial and period is
+        found with a single `groupby().min()`.
+
         :return: DataFrame where each row represents
                         a trial with lick delays for each period.
         """
@@ -674,86 +763,40 @@ class Trial:
         trace_start = tone_start + tone_duration
         trace_duration = self.trace_duration
         post_trace_start = trace_start + trace_duration
-        post_trace_duration = self.post_trace_duration
-
-        # Store results per trial
-        trial_results = []
-
-        for trial_number, trial_data in self.trial_df.groupby("trial_number"):
-            # Find first lick time in each period
-            pre_tone_first_lick = trial_data.loc[
-                (trial_data["event"] == "Lick")
-                & (trial_data["trial_time"] < pre_tone_duration),
-                "trial_time",
-            ].min()
-
-            tone_first_lick = trial_data.loc[
-                (trial_data["event"] == "Lick")
-                & (trial_data["trial_time"] >= tone_start)
-                & (trial_data["trial_time"] < tone_start + tone_duration),
-                "trial_time",
-            ].min()
-
-            trace_first_lick = trial_data.loc[
-                (trial_data["event"] == "Lick")
-                & (trial_data["trial_time"] >= trace_start)
-                & (trial_data["trial_time"] < trace_start + trace_duration),
-                "trial_time",
-            ].min()
-
-            post_trace_first_lick = trial_data.loc[
-                (trial_data["event"] == "Lick")
-                & (trial_data["trial_time"] >= post_trace_start),
-                "trial_time",
-            ].min()
-
-            # Compute delay from trial start
-            pre_tone_delay_from_trial_start = (
-                pre_tone_first_lick if pd.notna(pre_tone_first_lick) else None
-            )
-
-            tone_delay_from_trial_start = (
-                tone_first_lick if pd.notna(tone_first_lick) else None
-            )
-
-            trace_delay_from_trial_start = (
-                trace_first_lick if pd.notna(trace_first_lick) else None
-            )
-
-            post_trace_delay_from_trial_start = (
-                post_trace_first_lick if pd.notna(post_trace_first_lick) else None
-            )
-
-            # Compute delay from period start
-            pre_tone_delay_from_period_start = pre_tone_delay_from_trial_start
-
-            tone_delay_from_period_start = (
-                (tone_first_lick - tone_start) if pd.notna(tone_first_lick) else None
-            )
-
-            trace_delay_from_period_start = (
-                (trace_first_lick - trace_start) if pd.notna(trace_first_lick) else None
-            )
-
-            post_trace_delay_from_period_start = (
-                (post_trace_first_lick - post_trace_start)
-                if pd.notna(post_trace_first_lick)
-                else None
-            )
+        period_starts = [pre_tone_start, tone_start, trace_start, post_trace_start]
+        periods = ["pre_tone", "tone", "trace", "post_trace"]
+
+        if self.trial_df.empty:
+            return pd.DataFrame()
+
+        # Find the first lick time in each period of each trial. Licks before
+        # the trial start count towards the pre-tone period
+        trial_numbers = np.sort(self.trial_df["trial_number"].unique())
+        licks = self.trial_df.loc[self.trial_df["event"] == LICK_MSG, "trial_time"]
+        period = np.digitize(licks, period_starts[1:])
+        first_lick = (
+            licks.groupby([self.trial_df.loc[licks.index, "trial_number"], period])
+            .min()
+            .unstack()
+            .reindex(index=trial_numbers, columns=range(len(periods)))
+        )
 
-            # Append results
-            trial_results.append(
-                {
-                    "trial_number": trial_number,
-                    "pre_tone_delay_from_trial_start": pre_tone_delay_from_trial_start,
-                    "tone_delay_from_trial_start": tone_delay_from_trial_start,
-                    "trace_delay_from_trial_start": trace_delay_from_trial_start,
-                    "post_trace_delay_from_trial_start": post_trace_delay_from_trial_start,
-                    "pre_tone_delay_from_period_start": pre_tone_delay_from_period_start,
-                    "tone_delay_from_period_start": tone_delay_from_period_start,
-                    "trace_delay_from_period_start": trace_delay_from_period_start,
-                    "post_trace_delay_from_period_start": post_trace_delay_from_period_start,
-                }
+        def delays(first_lick: pd.Series) -> np.ndarray:
+            # Missing delays are `None`, and complete columns keep the type
+            # of the trial times
+            if first_lick.notna().all():
+                return first_lick.astype(licks.dtype).to_numpy()
+            if first_lick.isna().all():
+                return np.full(len(first_lick), None)
+            return first_lick.to_numpy()
+
+        # Compute delays from the trial start and from the period start
+        trial_results = {"trial_number": trial_numbers}
+        for i, name in enumerate(periods):
+            trial_results[f"{name}_delay_from_trial_start"] = delays(first_lick[i])
+        for i, name in enumerate(periods):
+            trial_results[f"{name}_delay_from_period_start"] = delays(
+                first_lick[i] - period_starts[i]
             )
 
         return pd.DataFrame(trial_results)
@@ -0,0 +1,180 @@
+"""Vocabulary of the messages printed by the rig.
+
+Every rig message is formatted as `trial: session time: trial time:
+message`, see `prePrint` in `Rig.ino`. The message is either one of a
+fixed set of texts, e.g. `Lick` or `Trial has started`, or a parameter
+printed with its value by `vprint`, e.g. `AUDITORY_START: 15000`. Each of
+these is given a small integer code, so that messages are matched by
+comparing codes rather than strings. Messages outside the vocabulary,
+e.g. serial lines that were cut short, get `UNKNOWN_EVENT`.
+
+The same texts are used by the acquisition scripts, see
+`Software/Serial_read/constants.py`. Append new messages to the end of
+the lists below, so that existing codes do not change.
+"""
+
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+MSG_DELIMITER = ": "
+
+SESSION_START_MSG = "Session has started"
+SESSION_END_MSG = "Session has ended"
+TRIAL_START_MSG = "Trial has started"
+TRIAL_END_MSG = "Trial has ended"
+LICK_MSG = "Lick"
+WATER_ON_MSG = "Water on"
+WATER_OFF_MSG = "Water off"
+PUFF_START_MSG = "Puff start"
+PUFF_STOP_MSG = "Puff stop"
+POSITIVE_SIGNAL_START_MSG = "Positive signal start"
+POSITIVE_SIGNAL_STOP_MSG = "Positive signal stop"
+NEGATIVE_SIGNAL_START_MSG = "Negative signal start"
+NEGATIVE_SIGNAL_STOP_MSG = "Negative signal stop"
+
+EVENT_MESSAGES = [
+    SESSION_START_MSG,
+    SESSION_END_MSG,
+    TRIAL_START_MSG,
+    TRIAL_END_MSG,
+    LICK_MSG,
+    WATER_ON_MSG,
+    WATER_OFF_MSG,
+    PUFF_START_MSG,
+    PUFF_STOP_MSG,
+    POSITIVE_SIGNAL_START_MSG,
+    POSITIVE_SIGNAL_STOP_MSG,
+    NEGATIVE_SIGNAL_START_MSG,
+    NEGATIVE_SIGNAL_STOP_MSG,
+    "Resetting lick count",
+    "Water off via trial flush",
+    "Puff stop via trial flush",
+    "Puff stop, catch block",
+    "Positive signal stop via trial flush",
+    "Negative signal stop via trial flush",
+    "Cleaning up last trial",
+    "Printing trial parameters",
+    "Printing session parameters",
+    "Printing Arduino or rig parameters",
+    "Starting the inter-trial interval",
+    "The inter-trial interval has ended",
+    "Waiting for session to start...",
+    "Waiting a minute...",
+    "Session consists of:",
+    "Your session has ended, but a sketch cannot stop Arduino.",
+    "WARNING: DEBUGGING is set to true",
+    "This impacts the structure of the trial!!!!",
+    "Testing pins...",
+    "Simulating button press...",
+    "Secondary rig 1",
+    "Pin on",
+    "Pin off",
+    "Water solenoid",
+    "Air puff",
+    "Positive tone",
+    "Negative tone",
+    "Mouse LED",
+    "Camera",
+]
+"""
+Messages printed by the rig as they are
+"""
+
+PARAMETER_KEYS = [
+    "currentTrialType",
+    "trialTypesChar",
+    "trialTypes",
+    "randomInterTrialInterval",
+    "Waiting the inter-trial interval",
+    "Waiting after the last trial",
+    "lickCount",
+    "NUMBER_OF_TRIALS",
+    "BAUD_RATE",
+    "DEBUGGING",
+    "DEBUGGING: Waiting for",
+    "IS_PRIMARY_RIG",
+    "IS_TRAINING",
+    "TRAINING_TRIALS_ARE_REWARDED",
+    "INTER_TRIAL_DEBUG_WAIT_INTERVAL",
+    "TRIAL_DURATION",
+    "LICK_TIMEOUT",
+    "LICK_COUNT_TIMEOUT",
+    "WATER_REWARD_AVAILABLE",
+    "WATER_DISPENSE_TIME",
+    "WATER_DISPENSE_ON_NUMBER_LICKS",
+    "WATER_TIMEOUT",
+    "USING_AUDITORY_CUES",
+    "AIR_PUFF_START_TIME",
+    "AIR_PUFF_DURATION",
+    "INTER_PUFF_PAUSE_TIME",
+    "AIR_PUFF_TOTAL_TIME",
+    "AUDITORY_START",
+    "AUDITORY_STOP",
+    "AUDITORY_BUFFER",
+    "POSITIVE_FREQUENCY",
+    "POSITIVE_DURATION",
+    "NEGATIVE_FREQUENCY",
+    "NEGATIVE_PULSE_DURATION",
+    "NEGATIVE_CYCLE_DURATION",
+    "PIN_AIR_PUFF",
+    "PIN_WATER_SOLENOID",
+    "PIN_TONE_NEGATIVE",
+    "PIN_TONE_POSITIVE",
+    "PIN_BUTTON",
+    "PIN_LICK",
+    "PIN_MOUSE_LED",
+    "PIN_CAMERA",
+    "PIN_SECONDARY",
+]
+"""
+Keys of the messages printed by the rig together with a value, as
+`key: value`
+"""
+
+UNKNOWN_EVENT = 0
+
+EVENT_CODES = {
+    text: code
+    for code, text in enumerate(EVENT_MESSAGES + PARAMETER_KEYS, start=UNKNOWN_EVENT + 1)
+}
+"""
+The code of each message and parameter key of the vocabulary
+"""
+
+EVENT_CODE_DTYPE = np.int8
+
+
+def event_code(message: str) -> int:
+    """
+    The code of a message, that is of the message itself or of its
+    parameter key, or `UNKNOWN_EVENT`
+    """
+    if message in EVENT_CODES:
+        return EVENT_CODES[message]
+    key = message.rsplit(MSG_DELIMITER, 1)[0]
+    if key != message and key in PARAMETER_KEYS:
+        return EVENT_CODES[key]
+    return UNKNOWN_EVENT
+
+
+def encode_events(messages: Iterable) -> np.ndarray:
+    """
+    The codes of many messages, looking each distinct message up once.
+    Missing messages get `UNKNOWN_EVENT`
+    """
+    codes, unique_messages = pd.factorize(np.asarray(messages, dtype=object))
+    unique_codes = [
+        event_code(message) if isinstance(message, str) else UNKNOWN_EVENT
+        for message in unique_messages
+    ]
+    return np.array(unique_codes + [UNKNOWN_EVENT], dtype=EVENT_CODE_DTYPE)[codes]
+
+
+def codes_containing(text: str) -> list[int]:
+    """
+    The codes of the vocabulary entries that contain `text`, e.g. both
+    `Water off` and `Water off via trial flush` for `Water off`
+    """
+    return [code for entry, code in EVENT_CODES.items() if text in entry]
@@ -16,7 +16,6 @@ import shutil
 import warnings
 from copy import deepcopy
 from dataclasses import dataclass
-from datetime import datetime
 from json.decoder import JSONDecodeError
 
 import matplotlib.pyplot as plt
@@ -24,8 +23,14 @@ import numpy as np
 import pandas as pd
 import seaborn as sns
 
+from tfcrig.cache import SessionCache
+from tfcrig.manifest import MANIFEST_FILE_NAME, DataManifest
+from tfcrig.sidecar import remove_sidecar
 from tfcrig.helpers.tfcrig import (
+    absolute_times_to_datetime64,
+    absolute_times_to_seconds,
     create_cohort_pattern,
+    datetime64_to_absolute_times,
     extract_cohort_mouse_pairs,
     is_base_data_file,
     root_contains_cohort_of_interest,
@@ -49,12 +54,17 @@ class RigFiles:
     Given an absolute file path to a set of project data generated by
     a trace fear conditioning rig, provide a set of helper functions to
     clean the data before an analysis.
+
+    If a `cache_dir` is given, it should be the same directory passed to
+    `Analysis`: cached features of every file rewritten here are dropped
+    so that the next analysis re-parses them.
     """
 
     data_root: str = "/gdrive/Shareddrives/Turi_lab/Data/aging_project/"
     dry_run: bool = True
     verbose: bool = False
     cohorts: list[str] = None
+    cache_dir: str = None
 
     def __post_init__(self):
         """
@@ -62,10 +72,19 @@ class RigFiles:
         what you might normally do in init
         """
         self.cohort_pattern = create_cohort_pattern(self.data_root)
+        self.cache = SessionCache(self.cache_dir) if self.cache_dir else None
+        self.manifest = DataManifest(
+            self.data_root,
+            (
+                os.path.join(self.cache_dir, MANIFEST_FILE_NAME)
+                if self.cache_dir
+                else None
+            ),
+        )
 
         # Need to pre-define the set of directories and files of interest
         self.os_walk = []
-        for root, dirs, files in os.walk(self.data_root):
+        for root, dirs, files in self.manifest.walk():
             if root_contains_cohort_of_interest(
                 root, self.cohort_pattern, self.cohorts
             ) or not self.cohorts:
@@ -230,6 +249,7 @@ class RigFiles:
                         # Restores the full file from the raw backup
                         print(f"Restoring {full_file} from backup")
                         shutil.copy(raw_full_file, full_file)
+                        self._invalidate_cache(full_file)
                     continue
                 if restore_raw:
                     warnings.warn(
@@ -317,6 +337,8 @@ class RigFiles:
                 builtin_print(f"    {files[1]}")
             else:
                 os.rename(files[0], files[1])
+                self._invalidate_cache(files[0])
+                self._invalidate_cache(files[1])
 
         # Summarize
         if not full_files_to_fix:
@@ -542,6 +564,7 @@ class RigFiles:
                     if not self.dry_run:
                         with open(file_path, "w") as f:
                             json.dump(data, f, indent=4)
+                        self._invalidate_cache(file_path)
 
         if count == 0:
             print("Did not need to fix any files!")
@@ -732,18 +755,12 @@ class RigFiles:
                 # Get an array of absolute trial start times for the first and
                 # second mouse, and look at their diff (Unix time, which is in
                 # seconds, is used)
-                abs_first_trial_start_times = np.array([
-                    datetime.strptime(
-                        entry["absolute_time"], "%Y-%m-%d_%H-%M-%S.%f"
-                    ).timestamp()
-                    for entry in first_trial_starts
-                ])
-                abs_second_trial_start_times = np.array([
-                    datetime.strptime(
-                        entry["absolute_time"], "%Y-%m-%d_%H-%M-%S.%f"
-                    ).timestamp()
-                    for entry in second_trial_starts
-                ])
+                abs_first_trial_start_times = absolute_times_to_seconds(
+                    entry["absolute_time"] for entry in first_trial_starts
+                )
+                abs_second_trial_start_times = absolute_times_to_seconds(
+                    entry["absolute_time"] for entry in second_trial_starts
+                )
                 abs_trial_start_diff = abs_first_trial_start_times - abs_second_trial_start_times
                 start_time_offsets += abs(abs_trial_start_diff).tolist()
                 mu = round(1000*np.mean(abs_trial_start_diff), 0)
@@ -761,24 +778,26 @@ class RigFiles:
                         if entry["mouse_id"] != mouse_ids[0]:
                             raise ValueError("Bad mouse id!")
                         mouse_one_potential.append(entry)
+                # The second mouse messages and times are parsed once, and
+                # compared against each potentially missing message
+                msgs_two = np.array([
+                    entry["message"].split(":")[-1].strip()
+                    for entry in data["data"][mouse_ids[1]]
+                ])
+                ts_two = absolute_times_to_seconds(
+                    entry["absolute_time"] for entry in data["data"][mouse_ids[1]]
+                )
+                ts_one = absolute_times_to_seconds(
+                    entry["absolute_time"] for entry in mouse_one_potential
+                )
                 add_to_mouse_two_entries = []
-                for mouse_one_entry in mouse_one_potential:
+                for mouse_one_entry, t_one in zip(mouse_one_potential, ts_one):
                     # For each potentially missing mouse message, see if it has
                     # a match in the second mouse data
                     msg_one = mouse_one_entry["message"].split(":")[-1].strip()
-                    t_one = datetime.strptime(
-                        mouse_one_entry["absolute_time"], "%Y-%m-%d_%H-%M-%S.%f"
-                    ).timestamp()
-
-                    found_match = False
-                    for entry in data["data"][mouse_ids[1]]:
-                        msg_two = entry["message"].split(":")[-1].strip()
-                        t_two = datetime.strptime(
-                            entry["absolute_time"], "%Y-%m-%d_%H-%M-%S.%f"
-                        ).timestamp()
-                        if msg_one == msg_two:
-                            if abs(t_one-t_two) < 0.5:
-                                found_match = True
+                    found_match = np.any(
+                        (msgs_two == msg_one) & (np.abs(t_one - ts_two) < 0.5)
+                    )
                     if not found_match:
                         add_to_mouse_two_entries.append(mouse_one_entry)
 
@@ -832,7 +851,7 @@ class RigFiles:
         """
         print("Syncing puffs and signals from first mouse to second mouse")
 
-        missing_messages = [
+        missing_messages = (
             "Puff start",
             "Puff stop",
             "Puff stop, catch block",
@@ -840,7 +859,7 @@ class RigFiles:
             "Negative signal stop",
             "Positive signal start",
             "Positive signal stop",
-        ]
+        )
         missing = False
 
         for root, _, files in self.os_walk:
@@ -866,87 +885,18 @@ class RigFiles:
                     sec_port = data["header"]["secondary_port"]
 
                     has_required_messages = any(
-                        any(
-                            entry["message"].strip().endswith(msg)
-                            for msg in missing_messages
-                        )
+                        entry["message"].strip().endswith(missing_messages)
                         for entry in data["data"][second_mouse_id]
                     )
                     if not has_required_messages:
                         missing = True
-
-                        # Calculate time difference due to delay in second rig
-                        first_mouse_trial_end_times = [
-                            pd.to_datetime(
-                                entry["absolute_time"], format="%Y-%m-%d_%H-%M-%S.%f"
-                            )
-                            for entry in data["data"][first_mouse_id]
-                            if entry["message"].strip().endswith("Trial has ended")
-                        ]
-
-                        second_mouse_trial_end_times = [
-                            pd.to_datetime(
-                                entry["absolute_time"], format="%Y-%m-%d_%H-%M-%S.%f"
-                            )
-                            for entry in data["data"][second_mouse_id]
-                            if entry["message"].strip().endswith("Trial has ended")
-                        ]
-                        first_mouse_trial_end_times = sorted(
-                            first_mouse_trial_end_times
+                        data["data"][second_mouse_id] = self._synced_second_mouse_data(
+                            data["data"][first_mouse_id],
+                            data["data"][second_mouse_id],
+                            second_mouse_id,
+                            sec_port,
+                            missing_messages,
                         )
-                        second_mouse_trial_end_times = sorted(
-                            second_mouse_trial_end_times
-                        )
-
-                        # Ensure trials are synced based on trial starts
-                        combined_data = data["data"][second_mouse_id]
-                        prev_end_time = None
-                        for i, first_end_time in enumerate(first_mouse_trial_end_times):
-                            if i < len(second_mouse_trial_end_times):
-                                second_end_time = second_mouse_trial_end_times[i]
-                                time_diff = first_end_time - second_end_time
-
-                                first_mouse_trial_messages = [
-                                    {
-                                        "message": entry["message"],
-                                        "mouse_id": second_mouse_id,
-                                        "port": sec_port,
-                                        "absolute_time": (
-                                            pd.to_datetime(
-                                                entry["absolute_time"],
-                                                format="%Y-%m-%d_%H-%M-%S.%f",
-                                            )
-                                            - time_diff
-                                        ).strftime("%Y-%m-%d_%H-%M-%S.%f"),
-                                    }
-                                    for entry in data["data"][first_mouse_id]
-                                    if any(
-                                        entry["message"].strip().endswith(msg)
-                                        for msg in missing_messages
-                                    )
-                                    and pd.to_datetime(
-                                        entry["absolute_time"],
-                                        format="%Y-%m-%d_%H-%M-%S.%f",
-                                    )
-                                    <= first_end_time
-                                    and (
-                                        prev_end_time is None
-                                        or pd.to_datetime(
-                                            entry["absolute_time"],
-                                            format="%Y-%m-%d_%H-%M-%S.%f",
-                                        )
-                                        > prev_end_time
-                                    )
-                                ]
-                                # Sync the data with corrected times for the second mouse
-                                combined_data.extend(first_mouse_trial_messages)
-                                prev_end_time = first_end_time
-                        combined_data.sort(
-                            key=lambda entry: pd.to_datetime(
-                                entry["absolute_time"], format="%Y-%m-%d_%H-%M-%S.%f"
-                            )
-                        )
-                        data["data"][second_mouse_id] = combined_data
 
                         # TESTING purposes - write to a new file
                         # dir_name, base_name = os.path.split(full_file)
@@ -957,10 +907,92 @@ class RigFiles:
                         # json.dump(data, f, indent=4)
                         with open(full_file, "w") as f:
                             json.dump(data, f, indent=4)
+                        self._invalidate_cache(full_file)
 
         if missing:
             print("Filled and synced missing data for second mouse!")
 
+    @staticmethod
+    def _synced_second_mouse_data(
+        first_mouse_data: list[dict],
+        second_mouse_data: list[dict],
+        second_mouse_id: str,
+        sec_port: str,
+        missing_messages: tuple[str, ...],
+    ) -> list[dict]:
+        """
+        The data of the second mouse, with the `missing_messages` of the
+        first mouse added to it. Each message is assigned to the trial of
+        the first mouse it occurred in, and shifted by the difference
+        between the ends of that trial on the two rigs. Messages after
+        the last trial both mice finished are left out
+        """
+
+        def trial_end_times(mouse_data: list[dict]) -> np.ndarray:
+            return np.sort(
+                absolute_times_to_datetime64(
+                    entry["absolute_time"]
+                    for entry in mouse_data
+                    if entry["message"].strip().endswith("Trial has ended")
+                )
+            )
+
+        # Calculate time difference due to delay in second rig
+        first_end_times = trial_end_times(first_mouse_data)
+        second_end_times = trial_end_times(second_mouse_data)
+        n_trials = min(len(first_end_times), len(second_end_times))
+        time_diffs = first_end_times[:n_trials] - second_end_times[:n_trials]
+
+        # A message is in the first trial that ends at or after it
+        messages = [
+            entry
+            for entry in first_mouse_data
+            if entry["message"].strip().endswith(missing_messages)
+        ]
+        message_times = absolute_times_to_datetime64(
+            entry["absolute_time"] for entry in messages
+        )
+        trial = np.searchsorted(first_end_times, message_times, side="left")
+        in_trial = np.flatnonzero(trial < n_trials)
+        in_trial = in_trial[np.argsort(trial[in_trial], kind="stable")]
+        synced_times = message_times[in_trial] - time_diffs[trial[in_trial]]
+        synced_messages = [
+            {
+                "message": messages[j]["message"],
+                "mouse_id": second_mouse_id,
+                "port": sec_port,
+                "absolute_time": absolute_time,
+            }
+            for j, absolute_time in zip(
+                in_trial, datetime64_to_absolute_times(synced_times)
+            )
+        ]
+
+        # Merge into the second mouse data by time, keeping the order of
+        # messages at the same time
+        combined_data = second_mouse_data + synced_messages
+        combined_times = np.concatenate(
+            [
+                absolute_times_to_datetime64(
+                    entry["absolute_time"] for entry in second_mouse_data
+                ),
+                synced_times,
+            ]
+        )
+        return [combined_data[j] for j in np.argsort(combined_times, kind="stable")]
+
+    def _invalidate_cache(self, full_file: str) -> None:
+        """
+        Drop the cached features of a file that was just modified. The
+        cache also checks file size and modification time, but those
+        can be coarse on the Google Drive mount. The directory listing
+        of the file is dropped from the manifest as well, and so is the
+        sidecar of the file, see `tfcrig.sidecar`
+        """
+        self.manifest.invalidate(full_file)
+        remove_sidecar(full_file)
+        if self.cache is not None:
+            self.cache.invalidate(full_file)
 
     def _remove_processed_data(
         self,
@@ -994,7 +1026,7 @@ class RigFiles:
                 print(f"Directory does not exist: {directory}")
                 continue
 
-            for root, _, files in os.walk(directory):
+            for root, _, files in self.manifest.walk(directory):
                 # Check if current directory is in the folder exceptions
                 if any(
                     os.path.commonpath([root, exc]) == exc for exc in folder_exceptions
@@ -1,26 +1,115 @@
 import os
 import pandas as pd
-from typing import List
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
 from tfcrig.classes import Session  # adjust import as needed
+from tfcrig.helpers.tfcrig import is_base_data_file, is_skipped_data_dir
+from tfcrig.manifest import DataManifest
 
+ERROR_COLUMNS = ["source_file", "path", "error_type", "error"]
 
-def compute_metrics_from_folder(folder_path: str) -> pd.DataFrame:
+
+def compute_metrics_from_folder(
+    folder_path: str,
+    manifest: Optional[DataManifest] = None,
+    workers: int = 1,
+    chunksize: int = 4,
+) -> pd.DataFrame:
     """
     Loads all .json files from a folder, computes lick metrics for each,
-    and returns a combined DataFrame.
+    and returns a combined DataFrame. The folder listing is taken from the
+    `manifest` when one is given. Files are processed in order of their
+    name, see `compute_metrics_from_files` for `workers` and `chunksize`.
     """
-    all_metrics = []
+    if manifest is not None:
+        _, filenames = manifest.list_dir(folder_path)
+        manifest.save()
+    else:
+        filenames = os.listdir(folder_path)
+
+    full_paths = [
+        os.path.join(folder_path, filename)
+        for filename in sorted(filenames)
+        if filename.endswith(".json") and not filename.endswith("_raw.json")
+    ]
+    metrics, errors = compute_metrics_from_files(full_paths, workers, chunksize)
+    for filename, error in zip(errors["source_file"], errors["error"]):
+        print(f"Skipping {filename} due to error: {error}")
+    return metrics
 
-    for filename in os.listdir(folder_path):
-        if filename.endswith(".json") and not filename.endswith("_raw.json"):
-            full_path = os.path.join(folder_path, filename)
 
-            try:
-                session = Session(full_path)
-                metrics = session.compute_lick_metrics_all_mice()
-                metrics["source_file"] = filename  # Optional
-                all_metrics.append(metrics)
-            except Exception as e:
-                print(f"Skipping {filename} due to error: {e}")
+def compute_metrics_from_root(
+    root_path: str,
+    manifest: Optional[DataManifest] = None,
+    workers: int = 1,
+    chunksize: int = 4,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Computes lick metrics for every base data file under `root_path`,
+    e.g. a cohort folder, skipping the 'test_data' and 'duplicate_data'
+    folders below it, see `is_skipped_data_dir`. The directory listing is taken from the
+    `manifest` when one is given. Returns the combined metrics and a
+    report of the files that could not be processed, see
+    `compute_metrics_from_files`.
+    """
+    os_walk = manifest.walk(root_path) if manifest is not None else os.walk(root_path)
+    full_paths = []
+    for root, _, files in os_walk:
+        if is_skipped_data_dir(root, root_path):
+            continue
+        full_paths += [os.path.join(root, file) for file in files if is_base_data_file(file)]
+    return compute_metrics_from_files(sorted(full_paths), workers, chunksize)
 
-    return pd.concat(all_metrics, ignore_index=True) if all_metrics else pd.DataFrame()
+
+def compute_metrics_from_files(
+    full_paths: List[str],
+    workers: int = 1,
+    chunksize: int = 4,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Computes lick metrics for each of the given session files. With more
+    than one worker, files are spread over a pool of `workers` processes
+    in chunks of `chunksize` files.
+
+    Returns the metrics of all files combined, in the order of
+    `full_paths`, and one row per file that could not be processed with
+    its name, path, and the type and message of the error raised.
+    """
+    if workers <= 1:
+        results = map(_compute_session_metrics, full_paths)
+        return _combine_results(full_paths, results)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(_compute_session_metrics, full_paths, chunksize=chunksize)
+        return _combine_results(full_paths, results)
+
+
+def _compute_session_metrics(
+    full_path: str,
+) -> tuple[Optional[pd.DataFrame], Optional[tuple[str, str]]]:
+    """
+    The metrics of one session file, or the type and message of the error
+    raised while computing them. Errors are returned rather than raised
+    so that they never need to be pickled
+    """
+    try:
+        session = Session(full_path)
+        metrics = session.compute_lick_metrics_all_mice()
+    except Exception as e:
+        return None, (type(e).__name__, str(e))
+    metrics["source_file"] = os.path.basename(full_path)  # Optional
+    return metrics, None
+
+
+def _combine_results(full_paths, results) -> tuple[pd.DataFrame, pd.DataFrame]:
+    all_metrics = []
+    errors = []
+    for full_path, (metrics, error) in zip(full_paths, results):
+        if error is not None:
+            errors.append((os.path.basename(full_path), full_path, *error))
+        else:
+            all_metrics.append(metrics)
+    metrics = (
+        pd.concat(all_metrics, ignore_index=True) if all_metrics else pd.DataFrame()
+    )
+    return metrics, pd.DataFrame(errors, columns=ERROR_COLUMNS)
@@ -50,3 +50,36 @@ def list_scalar_divide(l1: list[np.int64], l2: list[np.int64], c: np.int64=1):
             raise Exception(warning.message)
 
     return out
+
+
+def centered_rolling_sum(
+    times: np.ndarray,
+    values: np.ndarray,
+    window: int,
+) -> np.ndarray:
+    """
+    For each time `t`, sum the `values` whose times fall in the window
+    `(t - window/2, t + window/2]`. This is what Pandas computes with
+    `rolling(window, center=True).sum()` over a time index, e.g. the lick
+    frequency over a one second window. Times are integers in any unit,
+    such as milliseconds, with the `window` in the same unit. They need
+    not be sorted, and the sums are returned in their original order
+    """
+    times = np.asarray(times, dtype=np.int64)
+    values = np.asarray(values)
+    if times.size and np.any(times[1:] < times[:-1]):
+        order = np.argsort(times, kind="stable")
+        sorted_times = times[order]
+        values = values[order]
+    else:
+        sorted_times = times
+
+    # Integer bounds, so that nanosecond times do not lose precision. An
+    # odd window excludes times up to `t - window // 2 - 1`
+    half_window = window // 2
+    cumulative = np.concatenate(([0], np.cumsum(values, dtype=np.float64)))
+    start = np.searchsorted(
+        sorted_times, times - half_window - window % 2, side="right"
+    )
+    stop = np.searchsorted(sorted_times, times + half_window, side="right")
+    return cumulative[stop] - cumulative[start]
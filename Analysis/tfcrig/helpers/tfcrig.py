@@ -1,10 +1,13 @@
 """
 Helper functions with custom, tFC-rig-specific logic
 """
+import os
 import re
-from typing import Optional
+from typing import Iterable, Optional
 from datetime import datetime
 
+import numpy as np
+
 DATETIME_REGEX = r"\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}"
 """
 Regex matching for a datetime of the format `YYYY-MM-DD_HH-MM-SS` which
@@ -16,6 +19,16 @@ FILENAME_REGEX = DATETIME_REGEX + r".json"
 Base data files end in the datetime and are of type JSON
 """
 
+ABSOLUTE_TIME_FORMAT = "%Y-%m-%d_%H-%M-%S.%f"
+"""
+Format of the `absolute_time` the serial reader adds to each message
+"""
+
+ABSOLUTE_TIME_TEMPLATE = b"0000-00-00_00-00-00.000000"
+"""
+Layout of a fully padded `absolute_time`, with zeros marking the digits
+"""
+
 
 def create_cohort_pattern(root_path: str) -> re.Pattern:
     """
@@ -186,6 +199,32 @@ def is_base_data_file(file_name: str) -> bool:
     return False
 
 
+SKIPPED_DATA_DIRS = ("test_data", "duplicate_data")
+"""
+Folders of a data root whose files are left out of an analysis
+"""
+
+
+def is_skipped_data_dir(root: str, data_root: str) -> bool:
+    """
+    Given a directory found walking `data_root`, determine whether it is
+    in one of the `SKIPPED_DATA_DIRS`. Only the part of the path below
+    the data root is checked, so that, like `Analysis`, these folders are
+    not skipped when the data root is itself inside of one
+    """
+    relative_path = os.path.relpath(root, data_root)
+    return any(part in SKIPPED_DATA_DIRS for part in relative_path.split(os.sep))
+
+
+def file_signature(full_file: str) -> tuple[int, int]:
+    """
+    The size and modification time of a file, which change whenever a
+    session file is uploaded again or rewritten by `RigFiles`
+    """
+    stat = os.stat(full_file)
+    return stat.st_size, stat.st_mtime_ns
+
+
 def get_datetime_from_file_path(file_path: str) -> datetime:
     date_match = re.search(DATETIME_REGEX, file_path)
     if date_match:
@@ -210,3 +249,103 @@ def int_session_id_to_date_string(session_id: int) -> str:
     minute = session_id[10:12]
     second = session_id[12:14]
     return f"{year}-{month}-{day}T{hour}:{minute}:{second}"
+
+
+def absolute_times_to_datetime64(
+    absolute_times: Iterable[str],
+    errors: str = "raise",
+) -> np.ndarray:
+    """
+    Convert `absolute_time` strings to a `datetime64[us]` array in one
+    pass. Times are nearly always fully padded, e.g.
+    `2025-03-23_21-26-51.201737`, so the digits are read from fixed
+    positions of one byte buffer. Anything else, including invalid
+    dates, is left to `datetime.strptime`, which raises the usual error.
+    Pass `errors="coerce"` to get `NaT` for invalid times instead
+    """
+    if errors not in ("raise", "coerce"):
+        raise ValueError(f"Unknown value '{errors}' for `errors`!")
+
+    absolute_times = list(absolute_times)
+    n = len(absolute_times)
+    width = len(ABSOLUTE_TIME_TEMPLATE)
+    result = np.full(n, np.datetime64("NaT", "us"))
+
+    is_fixed = np.array(
+        [
+            isinstance(t, str) and len(t) == width and t.isascii()
+            for t in absolute_times
+        ],
+        dtype=bool,
+    )
+    fixed = [t for t, f in zip(absolute_times, is_fixed) if f]
+    if fixed:
+        buffer = np.frombuffer("".join(fixed).encode("ascii"), dtype=np.uint8)
+        buffer = buffer.reshape(-1, width)
+        template = np.frombuffer(ABSOLUTE_TIME_TEMPLATE, dtype=np.uint8)
+        is_digit = template == ord("0")
+        digits = buffer.astype(np.int64) - ord("0")
+
+        # Every digit is a digit and every separator is in its place
+        is_valid = np.all(
+            (digits[:, is_digit] >= 0) & (digits[:, is_digit] <= 9), axis=1
+        )
+        is_valid &= np.all(buffer[:, ~is_digit] == template[~is_digit], axis=1)
+
+        def field(start: int, stop: int) -> np.ndarray:
+            value = np.zeros(len(buffer), dtype=np.int64)
+            for i in range(start, stop):
+                value = 10 * value + digits[:, i]
+            return value
+
+        year, month, day = field(0, 4), field(5, 7), field(8, 10)
+        hour, minute, second = field(11, 13), field(14, 16), field(17, 19)
+        microsecond = field(20, 26)
+
+        is_valid &= (year >= 1) & (month >= 1) & (month <= 12) & (day >= 1)
+        is_valid &= (hour < 24) & (minute < 60) & (second < 60)
+
+        # Days since the epoch, and whether the day exists in its month
+        months = (year - 1970) * 12 + np.clip(month, 1, 12) - 1
+        month_start = months.astype("datetime64[M]").astype("datetime64[D]")
+        next_month_start = (months + 1).astype("datetime64[M]").astype("datetime64[D]")
+        is_valid &= day <= (next_month_start - month_start).astype(np.int64)
+
+        us = (
+            (month_start.astype(np.int64) + day - 1) * 86400
+            + hour * 3600
+            + minute * 60
+            + second
+        ) * 1_000_000 + microsecond
+        fixed_result = np.where(is_valid, us, np.iinfo(np.int64).min)
+        result[is_fixed] = fixed_result.astype("datetime64[us]")
+        is_fixed[np.flatnonzero(is_fixed)[~is_valid]] = False
+
+    # Irregular times: unpadded fields, fewer fractional digits, or errors
+    for i in np.flatnonzero(~is_fixed):
+        try:
+            result[i] = datetime.strptime(absolute_times[i], ABSOLUTE_TIME_FORMAT)
+        except (TypeError, ValueError):
+            if errors == "raise":
+                raise
+    return result
+
+
+def datetime64_to_absolute_times(values: np.ndarray) -> np.ndarray:
+    """
+    The inverse of `absolute_times_to_datetime64`: format `datetime64`
+    values as fully padded `absolute_time` strings, e.g.
+    `2025-03-23_21-26-51.201737`, in one pass. Returns an object array of
+    strings
+    """
+    iso = np.datetime_as_string(np.asarray(values).astype("datetime64[us]"), unit="us")
+    return np.char.replace(np.char.replace(iso, "T", "_"), ":", "-").astype(object)
+
+
+def absolute_times_to_seconds(absolute_times: Iterable[str]) -> np.ndarray:
+    """
+    Convert `absolute_time` strings to seconds since the epoch, as floats.
+    Used where only differences between times matter, e.g. when comparing
+    the primary and secondary rigs
+    """
+    return absolute_times_to_datetime64(absolute_times).astype(np.int64) / 1e6
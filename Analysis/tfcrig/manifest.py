@@ -0,0 +1,211 @@
+"""Incrementally refreshed listing of the data directories.
+
+Walking `data_root` on the Google Drive mount costs tens of seconds,
+and `Analysis`, `RigFiles`, and `helpers.batch` each walk it. The
+`DataManifest` keeps the listing of every directory under the root,
+together with the size and modification time of every base data file,
+in a small index file. A directory is only listed again when its own
+modification time has changed, which happens whenever an entry in it
+is added, removed, or renamed, so a walk costs one `stat` per directory
+plus one listing per changed directory.
+"""
+
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import pandas as pd
+
+from tfcrig.helpers.tfcrig import (
+    create_cohort_pattern,
+    datetime_to_session_id,
+    extract_cohort,
+    get_datetime_from_file_path,
+    get_mouse_ids_from_file_name,
+    is_base_data_file,
+)
+
+MANIFEST_VERSION = 1
+"""
+Bump this whenever the layout of the index file changes
+"""
+
+MANIFEST_FILE_NAME = "manifest.json"
+
+MTIME_SETTLE_NS = 2_000_000_000
+"""
+Directories modified this recently are listed again on the next walk,
+as another change within the same modification time tick would not
+be noticed
+"""
+
+
+@dataclass
+class DataManifest:
+    """
+    The listing of every directory under `data_root`. If a
+    `manifest_file` is given, the listing is loaded from and saved to it,
+    so that it is shared across sessions and across the classes that
+    walk the data; otherwise it only lives as long as this object.
+    """
+
+    data_root: str
+    manifest_file: Optional[str] = None
+
+    def __post_init__(self):
+        self.directories = {}
+        if self.manifest_file and os.path.isfile(self.manifest_file):
+            try:
+                with open(self.manifest_file, "r") as f:
+                    index = json.load(f)
+            except (OSError, ValueError):
+                # An unreadable index is rebuilt by the next walk
+                index = {}
+            if (
+                index.get("version") == MANIFEST_VERSION
+                and index.get("data_root") == os.path.abspath(self.data_root)
+            ):
+                self.directories = index["directories"]
+        self._changed = False
+
+    def list_dir(self, directory: str) -> tuple[list[str], list[str]]:
+        """
+        Return the sub-directories and files of a directory, listing it
+        only if it changed since it was last listed
+        """
+        directory = os.path.abspath(directory)
+        mtime_ns = os.stat(directory).st_mtime_ns
+        entry = self.directories.get(directory)
+        if entry is None or entry["mtime_ns"] != mtime_ns:
+            entry = self._list_dir(directory, mtime_ns)
+            self.directories[directory] = entry
+            self._changed = True
+        # Copies, so that callers may prune them like those of `os.walk`
+        return list(entry["dirs"]), list(entry["files"])
+
+    def walk(self, top: str = None) -> list[tuple[str, list[str], list[str]]]:
+        """
+        The same `(root, dirs, files)` tuples as `os.walk(top)`, which
+        defaults to the data root. The index file is saved if anything
+        changed
+        """
+        top = top or self.data_root
+        os_walk = []
+        visited = set()
+        stack = [top]
+        while stack:
+            root = stack.pop()
+            try:
+                dirs, files = self.list_dir(root)
+            except OSError:
+                # Like `os.walk`, skip directories that cannot be listed
+                continue
+            visited.add(os.path.abspath(root))
+            os_walk.append((root, dirs, files))
+            links = self.directories[os.path.abspath(root)]["links"]
+            stack += [os.path.join(root, d) for d in reversed(dirs) if d not in links]
+
+        # Forget directories under `top` that no longer exist
+        top = os.path.abspath(top)
+        prefix = os.path.join(top, "")
+        for directory in list(self.directories):
+            if directory not in visited and (
+                directory == top or directory.startswith(prefix)
+            ):
+                del self.directories[directory]
+                self._changed = True
+
+        self.save()
+        return os_walk
+
+    def records(self, top: str = None) -> pd.DataFrame:
+        """
+        One row per base data file under `top`: its path, cohort, mouse
+        IDs, session ID, size, and modification time
+        """
+        cohort_pattern = create_cohort_pattern(self.data_root)
+        records = []
+        for root, _, files in self.walk(top):
+            data_files = self.directories[os.path.abspath(root)]["data_files"]
+            for file in files:
+                if not is_base_data_file(file):
+                    continue
+                size, mtime_ns = data_files[file]
+                records.append(
+                    {
+                        "path": os.path.join(root, file),
+                        "cohort": extract_cohort(root, cohort_pattern),
+                        "mouse_ids": get_mouse_ids_from_file_name(file),
+                        "session_id": datetime_to_session_id(
+                            get_datetime_from_file_path(file)
+                        ),
+                        "size": size,
+                        "mtime_ns": mtime_ns,
+                    }
+                )
+        return pd.DataFrame(
+            records,
+            columns=["path", "cohort", "mouse_ids", "session_id", "size", "mtime_ns"],
+        )
+
+    def invalidate(self, full_file: str) -> None:
+        """
+        Forget the listing of the directory containing `full_file`.
+        Rewriting a file in place does not change the modification time
+        of its directory, so `RigFiles` calls this whenever it does
+        """
+        directory = os.path.dirname(os.path.abspath(full_file))
+        if self.directories.pop(directory, None) is not None:
+            self._changed = True
+
+    def save(self) -> None:
+        if not self.manifest_file or not self._changed:
+            return
+        index = {
+            "version": MANIFEST_VERSION,
+            "data_root": os.path.abspath(self.data_root),
+            "directories": self.directories,
+        }
+
+        # Write to a temporary file first so that a reader never sees a
+        # partially written index
+        tmp_file = f"{self.manifest_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_file, self.manifest_file)
+        self._changed = False
+
+    @staticmethod
+    def _list_dir(directory: str, mtime_ns: int) -> dict:
+        dirs = []
+        files = []
+        links = []
+        data_files = {}
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    dirs.append(entry.name)
+                    # Like `os.walk`, do not descend into linked directories
+                    if entry.is_symlink():
+                        links.append(entry.name)
+                    continue
+                files.append(entry.name)
+                if is_base_data_file(entry.name):
+                    stat = entry.stat()
+                    data_files[entry.name] = [stat.st_size, stat.st_mtime_ns]
+
+        if time.time_ns() - mtime_ns < MTIME_SETTLE_NS:
+            mtime_ns = None
+        return {
+            "mtime_ns": mtime_ns,
+            "dirs": dirs,
+            "files": files,
+            "links": links,
+            "data_files": data_files,
+        }
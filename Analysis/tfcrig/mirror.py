@@ -0,0 +1,185 @@
+"""Local mirror of the base data files on the Google Drive mount.
+
+Every open on the Google Drive mount is a slow round trip, and an
+`Analysis` opens base data files one at a time. The `DataMirror` copies
+the base data files under a data root to local disk with a pool of
+threads, so that many round trips are in flight at once, and keeps the
+directory layout so the mirror can be used as the `data_root` of an
+`Analysis`. Copies keep the modification time of their source, and a
+file is only copied again when its size or modification time changed.
+The sidecars of base data files, see `tfcrig.sidecar`, are mirrored
+along with them.
+
+Pass a `mirror_root` to `Analysis` to sync a mirror and analyze it, or
+sync one by hand and use it as the data root:
+
+    Analysis(data_root=DataMirror(data_root, mirror_root).sync())
+
+`RigFiles` is not pointed at a mirror, as it rewrites files in place.
+"""
+
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+from tfcrig.helpers.tfcrig import (
+    create_cohort_pattern,
+    file_signature,
+    is_base_data_file,
+    root_contains_cohort_of_interest,
+)
+from tfcrig.manifest import MANIFEST_FILE_NAME, DataManifest
+from tfcrig.notebook import builtin_print
+from tfcrig.sidecar import SIDECAR_SUFFIX
+
+
+def is_mirrored_file(file_name: str) -> bool:
+    """
+    Base data files and their sidecars are mirrored
+    """
+    if file_name.endswith(SIDECAR_SUFFIX):
+        file_name = file_name[: -len(SIDECAR_SUFFIX)] + ".json"
+    return is_base_data_file(file_name)
+
+
+@dataclass
+class DataMirror:
+    """
+    Mirror the base data files under `data_root` to `mirror_root`. The
+    directory listing of `data_root` is kept in a manifest in the
+    mirror, see `tfcrig.manifest`.
+
+    The mirror is meant to be read from. `RigFiles` can check a mirror,
+    but files it cleans or syncs there are not written back to
+    `data_root`, so it should be run against `data_root` itself when
+    `dry_run` is `False`.
+    """
+
+    data_root: str = "/gdrive/Shareddrives/Turi_lab/Data/aging_project/"
+    mirror_root: str = "/content/tfcrig_mirror"
+    workers: int = 16
+    cohorts: list[str] = None
+    verbose: bool = False
+
+    def __post_init__(self):
+        os.makedirs(self.mirror_root, exist_ok=True)
+        self.manifest = DataManifest(
+            self.data_root, os.path.join(self.mirror_root, MANIFEST_FILE_NAME)
+        )
+
+    def mirror_file(self, full_file: str) -> str:
+        """
+        The path in the mirror of a file under the data root
+        """
+        return os.path.join(
+            self.mirror_root, os.path.relpath(full_file, self.data_root)
+        )
+
+    def sync(self) -> str:
+        """
+        Copy base data files that are missing or out of date in the
+        mirror, and remove mirrored files that no longer exist in the
+        data root. Returns the root of the mirror, to be used as the
+        `data_root` of an `Analysis`
+        """
+        cohort_pattern = create_cohort_pattern(self.data_root)
+        full_files = []
+        for root, _, files in self.manifest.walk():
+            if self.cohorts and not root_contains_cohort_of_interest(
+                root, cohort_pattern, self.cohorts
+            ):
+                continue
+            full_files += [os.path.join(root, file) for file in files if is_mirrored_file(file)]
+
+        errors = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            # Every source file is looked at again, rather than trusting
+            # the listing: files rewritten in place, e.g. by
+            # `RigFiles.sync`, do not change their directory
+            wanted = {
+                self.mirror_file(full_file): (full_file, *signature)
+                for full_file, signature in zip(
+                    full_files, executor.map(_file_signature, full_files)
+                )
+                if signature is not None
+            }
+            to_copy = [
+                (full_file, mirror_file, size, mtime_ns)
+                for mirror_file, (full_file, size, mtime_ns) in wanted.items()
+                if _file_signature(mirror_file) != (size, mtime_ns)
+            ]
+            print(f"Mirroring {len(to_copy)} of {len(wanted)} data files...")
+            for (full_file, *_), error in zip(
+                to_copy, executor.map(lambda args: _copy_file(*args), to_copy)
+            ):
+                if error:
+                    errors.append(f"{full_file}: {error}")
+                    # The file may have been rewritten in place, so its
+                    # directory is listed again on the next sync
+                    self.manifest.invalidate(full_file)
+                elif self.verbose:
+                    builtin_print(f" - {full_file}")
+
+        self.manifest.save()
+
+        removed = self._remove_stale_files(set(wanted))
+        if removed:
+            print(f"Removed {removed} data files no longer in the data root")
+        if errors:
+            print(f"Could not mirror {len(errors)} data files:")
+            for error in errors:
+                builtin_print(f" - {error}")
+        return self.mirror_root
+
+    def _remove_stale_files(self, wanted: set[str]) -> int:
+        removed = 0
+        for root, _, files in os.walk(self.mirror_root):
+            for file in files:
+                mirror_file = os.path.join(root, file)
+                if is_mirrored_file(file) and mirror_file not in wanted:
+                    os.remove(mirror_file)
+                    removed += 1
+        return removed
+
+
+def _file_signature(full_file: str) -> Optional[tuple[int, int]]:
+    """
+    The `file_signature` of a file, or `None` if it no longer exists
+    """
+    try:
+        return file_signature(full_file)
+    except FileNotFoundError:
+        return None
+
+
+def _copy_file(
+    full_file: str,
+    mirror_file: str,
+    size: int,
+    mtime_ns: int,
+) -> Optional[str]:
+    """
+    Copy one file into the mirror, through a temporary file so that a
+    partial copy is never mistaken for a complete one. Returns an error
+    message if the copy does not match the source as listed
+    """
+    directory, file = os.path.split(mirror_file)
+    os.makedirs(directory, exist_ok=True)
+    # The temporary name must not look like a mirrored file
+    tmp_file = os.path.join(
+        directory,
+        "." + file.replace(".json", ".partial").replace(SIDECAR_SUFFIX, ".npz.partial"),
+    )
+    try:
+        shutil.copy2(full_file, tmp_file)
+    except OSError as e:
+        return str(e)
+    if _file_signature(tmp_file) != (size, mtime_ns):
+        # The source changed since it was listed; the next sync copies
+        # it again
+        os.remove(tmp_file)
+        return "changed while being copied"
+    os.replace(tmp_file, mirror_file)
+    return None
@@ -0,0 +1,249 @@
+"""Compact columnar sidecars of base data files.
+
+Base data files are pretty-printed JSON, and every reader decodes the
+whole file and splits each `trial: session_ms: trial_ms: message` string
+again. A sidecar keeps the same events as columns, in an uncompressed
+`.npz` file next to the base data file, e.g.
+`106_3_106_4_2025-01-17_13-44-11.npz`:
+
+    - `trial`, `session_ms`, `trial_ms`: int32 columns for each mouse
+    - `message`: int32 codes into one dictionary of message texts
+    - `absolute_time`: int64 microseconds since the epoch
+
+Events a column can not hold exactly, e.g. messages that do not parse
+or times that are not fully padded, are kept as their JSON text instead.
+The JSON file stays the archival format: a sidecar is only read while
+its base data file has the size and modification time it was written
+for, and `RigFiles` removes the sidecar of every file it rewrites. The
+acquisition scripts write a sidecar when a session is saved, see
+`Software/Serial_read/session_writer.py`, and `write_sidecar` writes one
+for existing data. Both must write the same sidecar for the same session,
+which `tests/sidecar/test_acquisition_sidecar.py` checks.
+
+Sidecars are loaded eagerly: `np.load` reads each member of an `.npz`
+into memory rather than memory-mapping it. The columns are a fraction of
+the size of the JSON file, and are copied into data frames right after
+loading anyway.
+"""
+
+import json
+import os
+import zipfile
+from typing import Optional
+
+import numpy as np
+
+from tfcrig.helpers.tfcrig import (
+    absolute_times_to_datetime64,
+    datetime64_to_absolute_times,
+)
+
+SIDECAR_VERSION = 2
+"""
+Bump this whenever the layout of sidecars changes, here and in
+`Software/Serial_read/session_writer.py`
+"""
+
+SIDECAR_SUFFIX = ".npz"
+
+MSG_DELIMITER = ": "
+
+INT32 = np.iinfo(np.int32)
+
+
+def sidecar_file(full_file: str) -> str:
+    """
+    The path of the sidecar of a base data file
+    """
+    return os.path.splitext(full_file)[0] + SIDECAR_SUFFIX
+
+
+def _int32(text: str) -> Optional[int]:
+    """
+    The integer a string is the canonical form of, if it fits an int32
+    """
+    try:
+        value = int(text)
+    except ValueError:
+        return None
+    if str(value) != text or not INT32.min <= value <= INT32.max:
+        return None
+    return value
+
+
+def _mouse_arrays(events: list, mouse_id: str, messages: dict) -> dict:
+    """
+    The columns of the events of one mouse. Events are written to every
+    mouse by the acquisition scripts without a `mouse_id` and `port`,
+    e.g. the end of the session, and are marked as `shared`
+    """
+    n = len(events)
+    numbers = np.zeros((n, 3), dtype=np.int32)
+    codes = np.full(n, -1, dtype=np.int32)
+    shared = np.zeros(n, dtype=bool)
+    is_raw = np.ones(n, dtype=bool)
+    absolute_times = [None] * n
+
+    port = next(
+        (
+            event["port"]
+            for event in events
+            if isinstance(event, dict)
+            and event.get("mouse_id") == mouse_id
+            and isinstance(event.get("port"), str)
+        ),
+        None,
+    )
+    for i, event in enumerate(events):
+        if not isinstance(event, dict):
+            continue
+        message = event.get("message")
+        absolute_time = event.get("absolute_time")
+        if not isinstance(message, str) or not isinstance(absolute_time, str):
+            continue
+        if "mouse_id" in event or "port" in event:
+            if event.get("mouse_id") != mouse_id or event.get("port") != port:
+                continue
+        else:
+            shared[i] = True
+        parts = message.split(MSG_DELIMITER, 3)
+        if len(parts) != 4:
+            continue
+        values = [_int32(part) for part in parts[:3]]
+        if None in values:
+            continue
+        numbers[i] = values
+        codes[i] = messages.setdefault(parts[3], len(messages))
+        absolute_times[i] = absolute_time
+        is_raw[i] = False
+
+    # Only times that are written back exactly as they were read are kept
+    # as integers
+    times = np.full(n, np.datetime64("NaT", "us"))
+    columnar = np.flatnonzero(~is_raw)
+    times[columnar] = absolute_times_to_datetime64(
+        [absolute_times[i] for i in columnar], errors="coerce"
+    )
+    is_exact = datetime64_to_absolute_times(times[columnar]) == np.array(
+        [absolute_times[i] for i in columnar], dtype=object
+    )
+    is_raw[columnar[~is_exact]] = True
+    numbers[is_raw] = 0
+    codes[is_raw] = -1
+    shared[is_raw] = False
+
+    raw_rows = np.flatnonzero(is_raw).astype(np.int32)
+    return {
+        "port": port or "",
+        "trial": numbers[:, 0],
+        "session_ms": numbers[:, 1],
+        "trial_ms": numbers[:, 2],
+        "message": codes,
+        "absolute_time": np.where(is_raw, 0, times.astype(np.int64)),
+        "shared": shared,
+        "raw_rows": raw_rows,
+        "raw": np.array([json.dumps(events[i]) for i in raw_rows], dtype=str),
+    }
+
+
+def write_sidecar(full_file: str) -> Optional[str]:
+    """
+    Write the sidecar of a base data file, returning its path, or `None`
+    if the file does not hold session data
+    """
+    # Taken before reading, so that a file written to while it is read
+    # does not match its sidecar
+    json_stat = os.stat(full_file)
+    with open(full_file, "r") as f:
+        json_data = json.load(f)
+    if not isinstance(json_data, dict) or not isinstance(json_data.get("data"), dict):
+        return None
+
+    messages = {}
+    arrays = {}
+    mouse_ids = []
+    ports = []
+    for k, (mouse_id, events) in enumerate(json_data["data"].items()):
+        if not isinstance(events, list):
+            return None
+        mouse = _mouse_arrays(events, mouse_id, messages)
+        mouse_ids.append(mouse_id)
+        ports.append(mouse.pop("port"))
+        for key, values in mouse.items():
+            arrays[f"mouse_{k}_{key}"] = values
+
+    path = sidecar_file(full_file)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(
+            f,
+            version=SIDECAR_VERSION,
+            json_size=json_stat.st_size,
+            json_mtime_ns=json_stat.st_mtime_ns,
+            header=json.dumps(json_data.get("header")),
+            mouse_ids=np.array(mouse_ids, dtype=str),
+            ports=np.array(ports, dtype=str),
+            messages=np.array(list(messages), dtype=str),
+            **arrays,
+        )
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_sidecar(full_file: str) -> Optional[dict]:
+    """
+    Read the sidecar of a base data file. Returns `None` if there is no
+    sidecar, or if the file changed since the sidecar was written, going
+    by its size and modification time. Otherwise returns the
+    `header` of the file, the dictionary of `messages`, and the columns
+    of each mouse under `data`: `trial`, `session_ms`, `trial_ms`,
+    `message` codes (`-1` for raw events), `absolute_time` as
+    `datetime64[us]`, `shared`, the `port` of the mouse, and the `raw`
+    events keyed by their position
+    """
+    path = sidecar_file(full_file)
+    if not os.path.isfile(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as npz:
+            json_stat = os.stat(full_file)
+            if (
+                int(npz["version"]) != SIDECAR_VERSION
+                or int(npz["json_size"]) != json_stat.st_size
+                or int(npz["json_mtime_ns"]) != json_stat.st_mtime_ns
+            ):
+                return None
+            data = {}
+            for k, (mouse_id, port) in enumerate(zip(npz["mouse_ids"], npz["ports"])):
+                mouse = {"port": str(port) or None}
+                for key in ("trial", "session_ms", "trial_ms", "message", "shared"):
+                    mouse[key] = npz[f"mouse_{k}_{key}"]
+                mouse["absolute_time"] = npz[f"mouse_{k}_absolute_time"].astype(
+                    "datetime64[us]"
+                )
+                mouse["raw"] = {
+                    int(i): json.loads(str(event))
+                    for i, event in zip(
+                        npz[f"mouse_{k}_raw_rows"], npz[f"mouse_{k}_raw"]
+                    )
+                }
+                data[str(mouse_id)] = mouse
+            return {
+                "header": json.loads(str(npz["header"])),
+                "messages": npz["messages"].astype(object),
+                "data": data,
+            }
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        # A sidecar that can not be read is ignored, the base data file is
+        # read instead
+        return None
+
+
+def remove_sidecar(full_file: str) -> None:
+    """
+    Remove the sidecar of a base data file, if it has one
+    """
+    try:
+        os.remove(sidecar_file(full_file))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,294 @@
+"""Memory-mapped event store of the parsed data of many sessions.
+
+An `Analysis` of a whole project holds the parsed events of thousands of
+sessions. Rather than concatenating one data frame per file, the
+`EventStore` appends the columns of each file to one flat binary file
+per column, and keeps an index of the rows of each `(mouse_id,
+session_id)` pair, together with its cohort and the file it was parsed
+from. Columns are read back as memory maps, so a session is a slice of
+the maps found through the index: numeric columns are views of the
+files on disk, and categorical columns are stored as `int32` codes into
+one list of categories per column.
+
+Rows are never rewritten: a session that is appended again, e.g. after
+`Analysis.refresh`, points the index at its new rows, and the old rows
+are left unused until the store is cleared.
+"""
+
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+STORE_VERSION = 1
+"""
+Bump this whenever the layout of the store changes, so that an old
+store is cleared rather than misread
+"""
+
+INDEX_FILE_NAME = "index.json"
+
+COLUMN_FILE_SUFFIX = ".bin"
+
+INDEX_COLUMNS = ["cohort", "mouse_id", "session_id", "start", "stop", "full_file"]
+
+
+@dataclass
+class EventStore:
+    """
+    A directory holding one binary file per column of the parsed data,
+    and an `index.json` with the type of each column, the categories of
+    categorical columns, and the rows of each session.
+    """
+
+    store_dir: str
+    _n_rows: int = field(init=False, repr=False, default=0)
+    _columns: dict = field(init=False, repr=False, default_factory=dict)
+    _sessions: dict = field(init=False, repr=False, default_factory=dict)
+    _category_codes: dict = field(init=False, repr=False, default_factory=dict)
+    _maps: Optional[dict] = field(init=False, repr=False, default=None)
+
+    def __post_init__(self):
+        os.makedirs(self.store_dir, exist_ok=True)
+        self._read_index()
+
+    def column_file(self, column: str) -> str:
+        return os.path.join(self.store_dir, column + COLUMN_FILE_SUFFIX)
+
+    def _read_index(self) -> None:
+        index_file = os.path.join(self.store_dir, INDEX_FILE_NAME)
+        if not os.path.isfile(index_file):
+            return
+        with open(index_file, "r") as f:
+            index = json.load(f)
+        if index.get("version") != STORE_VERSION:
+            self.clear()
+            return
+        self._n_rows = index["n_rows"]
+        self._columns = index["columns"]
+        self._sessions = {
+            (mouse_id, session_id): (cohort, start, stop, full_file)
+            for cohort, mouse_id, session_id, start, stop, full_file in index["sessions"]
+        }
+        self._category_codes = {
+            column: {category: code for code, category in enumerate(meta["categories"])}
+            for column, meta in self._columns.items()
+            if meta["categories"] is not None
+        }
+
+    def flush(self) -> None:
+        """
+        Write the index, making every row appended so far visible to
+        readers of the store
+        """
+        index_file = os.path.join(self.store_dir, INDEX_FILE_NAME)
+        tmp_file = f"{index_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(
+                {
+                    "version": STORE_VERSION,
+                    "n_rows": self._n_rows,
+                    "columns": self._columns,
+                    "sessions": [
+                        [cohort, mouse_id, session_id, start, stop, full_file]
+                        for (mouse_id, session_id), (
+                            cohort,
+                            start,
+                            stop,
+                            full_file,
+                        ) in self._sessions.items()
+                    ],
+                },
+                f,
+            )
+        os.replace(tmp_file, index_file)
+
+    def clear(self) -> None:
+        """
+        Remove every row and session from the store
+        """
+        for file in os.listdir(self.store_dir):
+            if file.endswith(COLUMN_FILE_SUFFIX):
+                os.remove(os.path.join(self.store_dir, file))
+        self._n_rows = 0
+        self._columns = {}
+        self._sessions = {}
+        self._category_codes = {}
+        self._maps = None
+        self.flush()
+
+    def append(self, data: pd.DataFrame, cohort: Optional[str], full_file: str) -> None:
+        """
+        Append the parsed data of one file, which may hold several mice,
+        and index the rows of each of its sessions. Call `flush` once
+        done appending
+        """
+        if data.empty:
+            return
+        # The rows of each session are kept together
+        keys, sessions = pd.factorize(
+            pd.MultiIndex.from_arrays([data["mouse_id"], data["session_id"]])
+        )
+        if np.any(np.diff(keys) < 0):
+            data = data.iloc[np.argsort(keys, kind="stable")]
+            keys = np.sort(keys, kind="stable")
+
+        if not self._columns:
+            self._columns = {
+                column: self._column_meta(data[column]) for column in data.columns
+            }
+        elif list(data.columns) != list(self._columns):
+            raise ValueError(f"Columns do not match the event store: {full_file}")
+
+        self._maps = None
+        for column in data.columns:
+            values = self._column_values(column, data[column])
+            with open(self.column_file(column), "ab") as f:
+                f.write(np.ascontiguousarray(values).tobytes())
+
+        starts = self._n_rows + np.searchsorted(keys, np.arange(len(sessions)))
+        stops = np.append(starts[1:], self._n_rows + len(data))
+        for (mouse_id, session_id), start, stop in zip(sessions, starts, stops):
+            self._sessions[(str(mouse_id), int(session_id))] = (
+                cohort,
+                int(start),
+                int(stop),
+                full_file,
+            )
+        self._n_rows += len(data)
+
+    def remove(self, mouse_id: str, session_id: int) -> None:
+        """
+        Drop a session from the index, its rows are left unused
+        """
+        self._sessions.pop((mouse_id, int(session_id)), None)
+
+    def _column_meta(self, series: pd.Series) -> dict:
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            categories = [str(category) for category in series.cat.categories]
+            self._category_codes[series.name] = {
+                category: code for code, category in enumerate(categories)
+            }
+            return {
+                "dtype": np.dtype(np.int32).str,
+                "categories": categories,
+                "ordered": bool(series.cat.ordered),
+                "merged": False,
+            }
+        return {"dtype": series.dtype.str, "categories": None}
+
+    def _column_values(self, column: str, series: pd.Series) -> np.ndarray:
+        """
+        The values of a column as they are written to its file. Codes of
+        categorical columns are mapped to the categories of the store,
+        and integers that do not fit the type of the store widen it
+        """
+        meta = self._columns[column]
+        if meta["categories"] is not None:
+            category_codes = self._category_codes[column]
+            lookup = np.empty(len(series.cat.categories) + 1, dtype=np.int32)
+            lookup[-1] = -1
+            for i, category in enumerate(series.cat.categories):
+                if category not in category_codes:
+                    category_codes[category] = len(meta["categories"])
+                    meta["categories"].append(category)
+                    meta["merged"] = True
+                lookup[i] = category_codes[category]
+            return lookup[series.cat.codes.to_numpy()]
+
+        values = series.to_numpy()
+        dtype = np.dtype(meta["dtype"])
+        if values.dtype != dtype:
+            wider = np.result_type(dtype, values.dtype)
+            if wider != dtype:
+                # Frames read before keep the maps of the old file
+                column_file = self.column_file(column)
+                tmp_file = f"{column_file}.{os.getpid()}.tmp"
+                np.fromfile(column_file, dtype=dtype).astype(wider).tofile(tmp_file)
+                os.replace(tmp_file, column_file)
+                meta["dtype"] = wider.str
+            values = values.astype(wider)
+        return values
+
+    def _memory_maps(self) -> dict:
+        if self._maps is None:
+            self._maps = {}
+            for column, meta in self._columns.items():
+                dtype = np.dtype(meta["dtype"])
+                if self._n_rows:
+                    # Plain arrays over the maps, which frames keep open
+                    self._maps[column] = np.memmap(
+                        self.column_file(column),
+                        dtype=dtype,
+                        mode="r",
+                        shape=(self._n_rows,),
+                    ).view(np.ndarray)
+                else:
+                    self._maps[column] = np.empty(0, dtype=dtype)
+        return self._maps
+
+    def _frame(self, rows) -> pd.DataFrame:
+        """
+        The data frame of some rows of the store. Categories are kept in
+        the order of the first file appended, and sorted once more files
+        added to them, as `concat_session_data` does
+        """
+        columns = {}
+        for column, values in self._memory_maps().items():
+            values = values[rows]
+            meta = self._columns[column]
+            if meta["categories"] is not None:
+                values = pd.Categorical.from_codes(
+                    values, categories=meta["categories"], ordered=meta["ordered"]
+                )
+                if meta["merged"]:
+                    values = values.reorder_categories(sorted(meta["categories"]))
+            columns[column] = values
+        return pd.DataFrame(columns, copy=False)
+
+    @property
+    def index(self) -> pd.DataFrame:
+        """
+        The cohort, rows, and file of each session in the store
+        """
+        return pd.DataFrame(
+            [
+                (cohort, mouse_id, session_id, start, stop, full_file)
+                for (mouse_id, session_id), (
+                    cohort,
+                    start,
+                    stop,
+                    full_file,
+                ) in self._sessions.items()
+            ],
+            columns=INDEX_COLUMNS,
+        )
+
+    def __contains__(self, key: tuple[str, int]) -> bool:
+        return (key[0], int(key[1])) in self._sessions
+
+    def session(self, mouse_id: str, session_id: int) -> pd.DataFrame:
+        """
+        The data of one session, without reading any other session
+        """
+        key = (mouse_id, int(session_id))
+        if key not in self._sessions:
+            raise ValueError(f"No data for mouse {key[0]}, session {key[1]}!")
+        _, start, stop, _ = self._sessions[key]
+        return self._frame(slice(start, stop))
+
+    def data(self) -> pd.DataFrame:
+        """
+        The data of every session in the store, in the order they were
+        appended
+        """
+        ranges = sorted((start, stop) for _, start, stop, _ in self._sessions.values())
+        if ranges and sum(stop - start for start, stop in ranges) == self._n_rows:
+            return self._frame(slice(0, self._n_rows))
+        rows = np.concatenate(
+            [np.arange(start, stop) for start, stop in ranges] or [np.empty(0, int)]
+        )
+        return self._frame(rows)
@@ -0,0 +1,216 @@
+"""Synthetic data roots for benchmarking the analysis pipeline.
+
+Real data can not be shared outside the lab, so benchmarks and load tests
+run against generated data instead. `write_synthetic_data_root` writes a
+data root laid out like the one on Google Drive: cohort folders
+(`I_cohort`, `II_cohort`, ...), date folders, and base data files named
+like `106_3_106_4_2025-01-17_13-44-11.json`. Each file holds a primary and
+a secondary mouse whose rig messages follow the grammar of `Rig.ino`, with
+about as many events per session as a real session (~5,000 per mouse,
+most of them licks).
+"""
+
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+from tfcrig.helpers.tfcrig import ABSOLUTE_TIME_FORMAT
+
+ROMAN_NUMERALS = ["I", "II", "III", "IV", "V", "VI", "VII", "VIII", "IX", "X"]
+
+SESSION_PARAMETERS = {
+    "BAUD_RATE": 9600,
+    "IS_TRAINING": 0,
+    "TRAINING_TRIALS_ARE_REWARDED": 1,
+    "TRIAL_DURATION": 50000,
+    "LICK_TIMEOUT": 100,
+    "LICK_COUNT_TIMEOUT": 1000,
+    "WATER_REWARD_AVAILABLE": 1,
+    "WATER_DISPENSE_TIME": 200,
+    "WATER_TIMEOUT": 500,
+    "USING_AUDITORY_CUES": 1,
+    "AIR_PUFF_START_TIME": 45000,
+    "AIR_PUFF_DURATION": 200,
+    "INTER_PUFF_PAUSE_TIME": 1000,
+    "AIR_PUFF_TOTAL_TIME": 5000,
+    "AUDITORY_START": 15000,
+    "AUDITORY_STOP": 35000,
+    "NEGATIVE_PULSE_DURATION": 1000,
+    "NEGATIVE_CYCLE_DURATION": 2000,
+}
+"""
+Parameters printed by the rig at the start of a session, see `trial.h`
+"""
+
+
+def synthetic_rig_messages(
+    trial_types: str,
+    is_primary: bool,
+    rng: random.Random,
+    lick_bursts_per_trial: int = 8,
+    licks_per_burst: int = 24,
+) -> list[tuple[int, str]]:
+    """
+    The messages one rig prints during a session, as `(session_ms,
+    message)` pairs in order. Trial types `1` and `2` play the positive
+    signal followed by air puffs, `0` and `3` the negative signal
+    """
+    duration = SESSION_PARAMETERS["TRIAL_DURATION"]
+    messages = []
+
+    def add(trial: int, session_ms: int, trial_ms: int, message: str) -> None:
+        messages.append((session_ms, f"{trial}: {session_ms}: {trial_ms}: {message}"))
+
+    t = 5000
+    for _ in range(rng.randrange(10, 30)):
+        add(0, t, 0, "Waiting for session to start...")
+        t += 100
+    add(0, t, 0, f"NUMBER_OF_TRIALS: {len(trial_types)}")
+    add(0, t, 0, f"trialTypesChar: {trial_types}")
+    add(0, t, 0, f"IS_PRIMARY_RIG: {int(is_primary)}")
+    for key, value in SESSION_PARAMETERS.items():
+        t += rng.randrange(25, 50)
+        add(0, t, 0, f"{key}: {value}")
+    t += 40
+    add(0, t, 0, "Session has started")
+
+    for trial, trial_type in enumerate(trial_types):
+        trial_type = int(trial_type)
+        inter_trial_interval = rng.randrange(15000, 25000)
+        start = t + 40
+        events = [
+            (0, "Trial has started"),
+            (30, "Printing trial parameters"),
+            (70, f"randomInterTrialInterval: {inter_trial_interval}"),
+            (110, f"currentTrialType: {trial_type}"),
+        ]
+        if trial_type in (1, 2):
+            events += [(15001, "Positive signal start"), (35001, "Positive signal stop")]
+            for puff in range(45000, 50000, 1000):
+                events += [(puff + 1, "Puff start"), (puff + 201, "Puff stop")]
+        else:
+            for pulse in range(15000, 35000, 2000):
+                events += [
+                    (pulse + 1, "Negative signal start"),
+                    (pulse + 1002, "Negative signal stop"),
+                ]
+        for _ in range(lick_bursts_per_trial):
+            lick = rng.randrange(0, duration - 100 * licks_per_burst - 1000)
+            for _ in range(licks_per_burst):
+                lick += rng.randrange(100, 200)
+                events.append((lick, "Lick"))
+            events.append((lick + 1000, "Resetting lick count"))
+        for water in range(duration - 2500, duration - 100, 500):
+            events += [(water, "Water on"), (water + 201, "Water off")]
+        events.sort(key=lambda event: event[0])
+        events += [(duration + 1, "Trial has ended"), (duration + 1, "Cleaning up last trial")]
+        for trial_ms, message in events:
+            add(trial, start + trial_ms, trial_ms, message)
+
+        t = start + duration + 40
+        for message in [
+            "Water off via trial flush",
+            "Puff stop via trial flush",
+            "Positive signal stop via trial flush",
+            "Negative signal stop via trial flush",
+            f"Waiting the inter-trial interval: {inter_trial_interval}",
+            "Starting the inter-trial interval",
+        ]:
+            add(trial + 1, t, 0, message)
+            t += rng.randrange(25, 60)
+        t += inter_trial_interval
+        add(trial + 1, t, 0, "The inter-trial interval has ended")
+
+    add(len(trial_types), t + 60000, 0, "Session has ended")
+    return messages
+
+
+def synthetic_session(
+    mouse_ids: list[str],
+    start_time: datetime,
+    n_trials: int = 20,
+    seed: int = 0,
+) -> dict:
+    """
+    A base data file for a primary and optional secondary mouse, as
+    written by `py_arduino_serial`
+    """
+    rng = random.Random(seed)
+    trial_types = "13" * (n_trials // 2)
+    ports = [f"COM{3 + i}" for i in range(len(mouse_ids))]
+    header = {
+        "mouse_ids": mouse_ids,
+        "primary_port": ports[0],
+        "secondary_port": ports[1] if len(ports) > 1 else None,
+        "mouse_port_assignment": dict(zip(mouse_ids, ports)),
+        "Start_time": start_time.strftime("%Y-%m-%d_%H-%M-%S"),
+    }
+
+    # The session clock of the rigs starts when the session is started
+    first_message = start_time + timedelta(seconds=15)
+    data = {}
+    for i, (mouse_id, port) in enumerate(zip(mouse_ids, ports)):
+        data[mouse_id] = []
+        # Rigs print each message slightly after one another
+        offset_ms = rng.uniform(0, 50) if i else 0
+        for session_ms, message in synthetic_rig_messages(trial_types, i == 0, rng):
+            absolute_time = first_message + timedelta(
+                milliseconds=session_ms - 5000 + offset_ms + rng.uniform(0, 2)
+            )
+            data[mouse_id].append(
+                {
+                    "message": message,
+                    "mouse_id": mouse_id,
+                    "port": port,
+                    "absolute_time": absolute_time.strftime(ABSOLUTE_TIME_FORMAT),
+                }
+            )
+
+    # The primary rig ends the session, and the end is added for all mice
+    end_message = dict(data[mouse_ids[0]][-1])
+    del end_message["mouse_id"], end_message["port"]
+    for mouse_id in mouse_ids:
+        data[mouse_id].append(end_message)
+    return {"header": header, "data": data}
+
+
+def write_synthetic_data_root(
+    data_root: str,
+    n_cohorts: int = 2,
+    n_pairs: int = 2,
+    n_sessions: int = 1,
+    n_trials: int = 20,
+    seed: int = 0,
+) -> list[str]:
+    """
+    Write `n_cohorts * n_pairs * n_sessions` base data files under
+    `data_root`, one session a day per pair of mice. Returns the paths of
+    the files written
+    """
+    full_files = []
+    first_day = datetime(2025, 1, 6, 9, 0, 0)
+    for cohort in range(n_cohorts):
+        for session in range(n_sessions):
+            day = first_day + timedelta(days=session)
+            day_dir = os.path.join(
+                data_root, f"{ROMAN_NUMERALS[cohort]}_cohort", day.strftime("%Y_%m_%d")
+            )
+            os.makedirs(day_dir, exist_ok=True)
+            for pair in range(n_pairs):
+                experiment_id = 100 + 10 * cohort + pair
+                mouse_ids = [f"{experiment_id}_1", f"{experiment_id}_2"]
+                start_time = day + timedelta(hours=pair, minutes=cohort)
+                file_name = (
+                    "_".join(mouse_ids)
+                    + f"_{start_time.strftime('%Y-%m-%d_%H-%M-%S')}.json"
+                )
+                full_file = os.path.join(day_dir, file_name)
+                session_seed = hash((seed, cohort, session, pair)) & 0xFFFFFFFF
+                with open(full_file, "w", encoding="utf-8") as f:
+                    json.dump(
+                        synthetic_session(mouse_ids, start_time, n_trials, session_seed),
+                        f,
+                    )
+                full_files.append(full_file)
+    return full_files
@@ -0,0 +1,105 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+
+from tfcrig.analysis import Analysis
+
+TEST_DATA_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "test_data"
+)
+
+FILE_NAME = "117_3_117_5_2025-03-23_21-26-51.json"
+
+
+class AnalysisLazyTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Two sessions of two mice, in a cohort directory
+        cls.data_root = tempfile.mkdtemp()
+        session_dir = os.path.join(cls.data_root, "I_cohort", "2025_03_23")
+        os.makedirs(session_dir)
+        for day in ("23", "24"):
+            shutil.copy(
+                os.path.join(TEST_DATA_DIR, FILE_NAME),
+                os.path.join(session_dir, FILE_NAME.replace("-23_", f"-{day}_")),
+            )
+        with contextlib.redirect_stdout(io.StringIO()):
+            cls.eager = Analysis(data_root=cls.data_root)
+            cls.lazy = Analysis(
+                data_root=cls.data_root, lazy=True, lazy_max_sessions=2
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.data_root)
+
+    def test_features_are_loaded(self):
+        """
+        Features do not depend on whether event data is lazy
+        """
+        pd.testing.assert_frame_equal(self.eager.df, self.lazy.df)
+        pd.testing.assert_frame_equal(self.eager.trial_df, self.lazy.trial_df)
+        self.assertIsNone(self.lazy._data)
+
+    def test_session_data(self):
+        """
+        A lazily loaded session matches the same session of all the data
+        """
+        self.assertEqual(len(self.lazy.session_files), 4)
+        for mouse_id, session_id in self.lazy.session_files:
+            pd.testing.assert_frame_equal(
+                self.eager.session_data(mouse_id, session_id),
+                self.lazy.session_data(mouse_id, session_id),
+            )
+        self.assertEqual(len(self.lazy._session_data), 2)
+
+    def test_unknown_session(self):
+        with self.assertRaises(ValueError):
+            self.lazy.session_data("117_3", 20000101000000)
+
+    def test_assign_data(self):
+        """
+        Assigned event data is kept, and used for single sessions
+        """
+        with contextlib.redirect_stdout(io.StringIO()):
+            analysis = Analysis(data_root=self.data_root, lazy=True)
+        data = self.eager.data[self.eager.data["mouse_id"] == "117_3"]
+        analysis.data = data
+        self.assertIs(analysis.data, data)
+        for mouse_id, session_id in analysis.session_files:
+            session_data = analysis.session_data(mouse_id, session_id)
+            self.assertEqual(session_data.empty, mouse_id != "117_3")
+
+    def test_workers_return_features_only(self):
+        """
+        Worker processes of a lazy analysis send back features, but no
+        event data
+        """
+        with contextlib.redirect_stdout(io.StringIO()):
+            analysis = Analysis(data_root=self.data_root, lazy=True, workers=2)
+            outcomes = list(
+                analysis._load_data_files(
+                    sorted(set(analysis.session_files.values())), keep_data=False
+                )
+            )
+        pd.testing.assert_frame_equal(self.lazy.df, analysis.df)
+        pd.testing.assert_frame_equal(self.lazy.trial_df, analysis.trial_df)
+        self.assertEqual(len(outcomes), 2)
+        for _, (features, _, data) in outcomes:
+            self.assertEqual(len(features), 2)
+            self.assertTrue(data.empty)
+            self.assertEqual(list(data.columns), list(self.eager.data.columns))
+
+    def test_widget_options(self):
+        self.assertEqual(
+            self.eager.mouse_id_widget.options, self.lazy.mouse_id_widget.options
+        )
+        self.assertEqual(
+            self.eager.session_id_widget.options, self.lazy.session_id_widget.options
+        )
@@ -0,0 +1,96 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+
+from tfcrig.analysis import Analysis
+
+TEST_DATA_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "test_data"
+)
+
+FILE_NAME = "117_3_117_5_2025-03-23_21-26-51.json"
+
+
+class AnalysisRefreshTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.data_root = tempfile.mkdtemp()
+        self.session_dir = os.path.join(self.data_root, "I_cohort", "2025_03_23")
+        os.makedirs(self.session_dir)
+        for day in ("23", "24"):
+            self.add_session(day)
+        self.analysis = self.load()
+
+    def tearDown(self):
+        shutil.rmtree(self.data_root)
+
+    def session_file(self, day: str) -> str:
+        return os.path.join(self.session_dir, FILE_NAME.replace("-23_", f"-{day}_"))
+
+    def add_session(self, day: str) -> None:
+        shutil.copy(os.path.join(TEST_DATA_DIR, FILE_NAME), self.session_file(day))
+
+    def load(self, **kwargs) -> Analysis:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return Analysis(data_root=self.data_root, **kwargs)
+
+    def refresh(self, analysis: Analysis) -> list[str]:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return analysis.refresh()
+
+    def assertMatchesFreshAnalysis(self, analysis: Analysis) -> None:
+        fresh = self.load()
+        pd.testing.assert_frame_equal(
+            analysis.df.reset_index(drop=True), fresh.df.reset_index(drop=True)
+        )
+        pd.testing.assert_frame_equal(
+            analysis.trial_df.reset_index(drop=True),
+            fresh.trial_df.reset_index(drop=True),
+        )
+        self.assertEqual(analysis.session_files, fresh.session_files)
+        self.assertEqual(analysis.file_signatures, fresh.file_signatures)
+        for mouse_id, session_id in fresh.session_files:
+            pd.testing.assert_frame_equal(
+                analysis.session_data(mouse_id, session_id),
+                fresh.session_data(mouse_id, session_id),
+            )
+        self.assertEqual(len(analysis.data), len(fresh.data))
+        self.assertEqual(analysis.mouse_id_widget.options, fresh.mouse_id_widget.options)
+
+    def test_nothing_changed(self):
+        self.assertEqual(self.refresh(self.analysis), [])
+        self.assertMatchesFreshAnalysis(self.analysis)
+
+    def test_new_session(self):
+        self.add_session("25")
+        self.assertEqual(self.refresh(self.analysis), [self.session_file("25")])
+        self.assertEqual(len(self.analysis.session_files), 6)
+        self.assertMatchesFreshAnalysis(self.analysis)
+
+    def test_changed_session(self):
+        """
+        A rewritten file replaces, rather than duplicates, its sessions
+        """
+        stat = os.stat(self.session_file("24"))
+        os.utime(self.session_file("24"), ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        self.assertEqual(self.refresh(self.analysis), [self.session_file("24")])
+        self.assertEqual(len(self.analysis.session_files), 4)
+        self.assertMatchesFreshAnalysis(self.analysis)
+
+    def test_removed_session(self):
+        os.remove(self.session_file("23"))
+        self.assertEqual(self.refresh(self.analysis), [])
+        self.assertEqual(len(self.analysis.session_files), 2)
+        self.assertMatchesFreshAnalysis(self.analysis)
+
+    def test_lazy(self):
+        analysis = self.load(lazy=True)
+        self.add_session("25")
+        self.refresh(analysis)
+        self.assertIsNone(analysis._data)
+        self.assertMatchesFreshAnalysis(analysis)
@@ -0,0 +1,57 @@
+import json
+import os
+import unittest
+
+import pandas as pd
+
+from tfcrig.analysis import concat_session_data, extract_features_from_session_data
+
+TEST_DATA_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "test_data"
+)
+
+FILE_NAME = "117_3_117_5_2025-03-23_21-26-51.json"
+
+
+class ConcatSessionDataTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open(os.path.join(TEST_DATA_DIR, FILE_NAME), "r") as f:
+            data = json.load(f)["data"]
+        cls.data_frames = [
+            extract_features_from_session_data(
+                raw_data, mouse_id, 0, FILE_NAME, print_bad_data_blobs=False
+            )[1]
+            for mouse_id, raw_data in data.items()
+        ]
+
+    def test_categories_are_kept(self):
+        """
+        Categorical columns stay categorical, with the union of categories
+        """
+        data = concat_session_data(self.data_frames)
+        self.assertEqual(list(data.columns), list(self.data_frames[0].columns))
+        self.assertEqual(
+            list(data["mouse_id"].cat.categories), sorted(["117_3", "117_5"])
+        )
+        for column in ("mouse_id", "message", "day_of_week"):
+            self.assertIsInstance(data[column].dtype, pd.CategoricalDtype)
+
+    as_strings = {"mouse_id": object, "message": object}
+
+    def test_same_values_as_concat(self):
+        """
+        Values are those of a plain concatenation
+        """
+        pd.testing.assert_frame_equal(
+            concat_session_data(self.data_frames).astype(self.as_strings),
+            pd.concat(self.data_frames, ignore_index=True).astype(self.as_strings),
+        )
+
+    def test_empty(self):
+        """
+        Like `pd.concat`, there must be something to concatenate
+        """
+        with self.assertRaises(ValueError):
+            concat_session_data([])
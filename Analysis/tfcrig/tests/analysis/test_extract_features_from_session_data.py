@@ -0,0 +1,439 @@
+import contextlib
+import io
+import json
+import os
+import unittest
+from datetime import datetime
+
+import pandas as pd
+
+from tfcrig.analysis import (
+    SESSION_DATA_DTYPES,
+    extract_features_from_session_data,
+)
+from tfcrig.helpers.python import datetime_to_day_of_week
+from tfcrig.helpers.tfcrig import get_datetime_from_file_path
+
+TEST_DATA_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "test_data"
+)
+
+FILE_NAME = "117_3_117_5_2025-03-23_21-26-51.json"
+
+
+def legacy_extract_features_from_session_data(
+    raw_data: dict,
+    mouse_id: str,
+    session_id: int,
+    file_name: str,
+    print_bad_data_blobs: bool = True,
+) -> tuple[str, pd.DataFrame]:
+    """
+    The per-message loop `extract_features_from_session_data` replaced
+    """
+    parsed_data = []
+    msg_delimiter = ": "
+
+    # Include day of week in data
+    date_time = get_datetime_from_file_path(file_name)
+    day_of_week = datetime_to_day_of_week(date_time)
+
+    # Parsing these variables (this data) assumes the messages are ordered
+    # by time, and checks for certain markers in the data. It uses `{0, 1}`
+    # to represent `False` and `True` respectively
+    is_session = 0
+    is_pre_cs = 0
+    is_tone = 0
+    is_trace = 0
+    is_puff = 0
+    # Valid trial types: `{0, 1}`, type `-1` represents not known or no
+    # current trial yet
+    trial_type = -1
+    negative_signal = 0
+    positive_signal = 0
+    water = 0
+    previous_time = raw_data[0]["absolute_time"]
+
+    # Some trial parameters we will try to extract
+    auditory_start = -1
+    auditory_stop = -1
+    air_puff_start_time = -1
+    air_puff_stop_time = -1
+    air_puff_total_time = -1
+    first_puff_started = 0
+    trial_types = ""
+
+    # Some data integrity checks, we may want to skip data and mark sessions as
+    # invalid if these fails.
+    #
+    # Check for session start and end:
+    data_str = json.dumps(raw_data)
+    session_start_msg = "Session has started"
+    session_end_msg = "Session has ended"
+    if session_start_msg not in data_str or session_end_msg not in data_str:
+        raise ValueError("Session either does not start or does not end!!!")
+
+    # Check trial start and ends (every trial that starts, ends)
+    is_trial = 0
+    trial_start_msg = "Trial has started"
+    trial_end_msg = "Trial has ended"
+    n_trial_starts = data_str.count(trial_start_msg)
+    n_trial_ends = data_str.count(trial_end_msg)
+    if n_trial_starts != n_trial_ends:
+        raise ValueError(f"Trial start, end mismatch!!!")
+
+    check_next_trial_types_message = False
+    for data_blob in raw_data:
+        # Parse the JSON message
+        try:
+            absolute_time = data_blob["absolute_time"]
+            split_data = data_blob["message"].split(msg_delimiter)
+            trial = int(split_data[0])
+            t_sesh = int(split_data[1])
+            t_trial = int(split_data[2])
+            msg = msg_delimiter.join(split_data[3::])
+        except (KeyError, ValueError):
+            if print_bad_data_blobs:
+                print(f"Skipping bad data blob: {data_blob}")
+            continue
+            # raise ValueError(f"Bad data blob found: {data_blob}")
+        # Confirm that absolute time moves forward
+        # TODO: uncomment once we fix syncing second and first mouse data
+        # if absolute_time < previous_time:
+        #     raise ValueError("Time did not move forwards!")
+        # previous_time = absolute_time
+        absolute_datetime = datetime.strptime(
+            absolute_time,
+            "%Y-%m-%d_%H-%M-%S.%f",
+        )
+
+        # Check for session start, end
+        if session_start_msg in msg:
+            is_session = 1
+        if session_end_msg in msg:
+            is_session = 0
+            trial_type = -1
+
+        # Check for trial start, end
+        if trial_start_msg in msg:
+            is_trial = 1
+        if trial_end_msg in msg:
+            is_trial = 0
+
+        # Get trial type
+        if "currentTrialType" in msg:
+            trial_type = int(msg.split(msg_delimiter)[1])
+            if trial_type not in [0, 1, 2, 3, 4]:
+                raise ValueError(f"Invalid trial type in: '{msg}'!!!")
+
+        # Get all trial types, check for balance. Note that if an
+        # imbalance is intentional, this will print false positive
+        # error messages
+        if "trialTypes" in msg or check_next_trial_types_message:
+            if check_next_trial_types_message:
+                trial_types = msg.split(msg_delimiter)[0]
+                check_next_trial_types_message = False
+            else:
+                try:
+                    trial_types = msg.split(msg_delimiter)[1]
+                except IndexError:
+                    # Sometimes we aren't printing `trialTypes` together with
+                    # its value
+                    check_next_trial_types_message = True
+                    continue
+
+            # This ensures a balanced session, no matter which trial types are
+            # included. It assumes we want sessions to be balanced (:
+            trial_type_count = None
+            for each_trial_type in set(trial_types):
+                if not trial_type_count:
+                    trial_type_count = trial_types.count(each_trial_type)
+                    continue
+                if trial_types.count(each_trial_type) != trial_type_count:
+                    raise ValueError(f"Unbalanced trial types in: '{msg}'!!!")
+
+        # Check for some trial parameters
+        if "AIR_PUFF_START_TIME" in msg:
+            air_puff_start_time = int(msg.split(msg_delimiter)[1])
+        if "AIR_PUFF_TOTAL_TIME" in msg:
+            air_puff_total_time = int(msg.split(msg_delimiter)[1])
+            air_puff_stop_time = air_puff_start_time + air_puff_total_time
+        if "AUDITORY_START" in msg:
+            auditory_start = int(msg.split(msg_delimiter)[1])
+        if "AUDITORY_STOP" in msg:
+            auditory_stop = int(msg.split(msg_delimiter)[1])
+
+        if auditory_start:
+            if is_trial and t_trial < auditory_start:
+                is_pre_cs = 1
+            else:
+                is_pre_cs = 0
+
+        # Check if data falls under tone period
+        if auditory_start > 0 and auditory_stop > 0:
+            if t_trial > auditory_start and t_trial < auditory_stop:
+                is_tone = 1
+            else:
+                is_tone = 0
+
+        # Check if data falls under trace period (short duration after auditory cues)
+        if air_puff_start_time > 0 and auditory_stop > 0:
+            if t_trial > auditory_stop and t_trial < air_puff_start_time:
+                is_trace = 1
+            else:
+                is_trace = 0
+
+        # Check for lick
+        lick = 0
+        if msg == "Lick":
+            lick = 1
+
+        # Check for puff start
+        if msg == "Puff start":
+            first_puff_started = 1
+
+        # Check for an "air puff lick"
+        # An "air puff lick" is a lick that occurs when air puffing is
+        # occurring, which is determined based on trial time and air
+        # puff parameters
+        puffed_lick = 0
+        if air_puff_start_time > 0 and air_puff_stop_time > 0:
+            # We are in a part of the trial where these parameters have
+            # been determined, given that we initialize them as `-1`
+            if (
+                lick
+                and first_puff_started
+                and t_trial >= air_puff_start_time
+                and t_trial <= air_puff_stop_time
+            ):
+                puffed_lick = 1
+
+            if t_trial > air_puff_stop_time:
+                first_puff_started = 0
+
+            if t_trial >= air_puff_start_time and t_trial <= air_puff_stop_time:
+                is_puff = 1
+            else:
+                is_puff = 0
+
+        # Negative signal
+        if "Negative signal start" in msg:
+            negative_signal = 1
+        if "Negative signal stop" in msg:
+            negative_signal = 0
+
+        # Positive signal
+        if "Positive signal start" in msg:
+            positive_signal = 1
+        if "Positive signal stop" in msg:
+            positive_signal = 0
+
+        # Water reward
+        if "Water on" in msg:
+            water = 1
+        if "Water off" in msg:
+            water = 0
+
+        # Build the parsed/rich dictionary
+        parsed_data.append(
+            {
+                "mouse_id": mouse_id,
+                "session_id": session_id,
+                "date": date_time,
+                "day_of_week": day_of_week,
+                "absolute_time": absolute_datetime,
+                "trial": trial,
+                "session_time": t_sesh,
+                "trial_time": t_trial,
+                "message": msg,
+                "is_session": is_session,
+                "is_trial": is_trial,
+                "is_pre_cs": is_pre_cs,
+                "is_tone": is_tone,
+                "is_trace": is_trace,
+                "is_puff": is_puff,
+                "trial_type": trial_type,
+                "lick": lick,
+                "puffed_lick": puffed_lick,
+                "negative_signal": negative_signal,
+                "positive_signal": positive_signal,
+                "water": water,
+            }
+        )
+
+    return trial_types, pd.DataFrame(parsed_data)
+
+
+def blobs(*messages: str) -> list[dict]:
+    """
+    Build raw session data from messages, one millisecond apart
+    """
+    return [
+        {
+            "absolute_time": f"2025-03-23_21-26-51.{i:06d}",
+            "message": message,
+        }
+        for i, message in enumerate(messages)
+    ]
+
+
+SESSION = (
+    "0: 0: 0: Session has started",
+    "0: 1: 1: trialTypes",
+    "0: 2: 2: 0011",
+    "0: 3: 3: AUDITORY_START: 0",
+    "1: 4: 0: Trial has started",
+    "1: 5: 1: currentTrialType: 1",
+    "1: 6: 2: Lick",
+    "1: 7: 3: AUDITORY_START: 10",
+    "1: 8: 4: AUDITORY_STOP: 20",
+    "1: 9: 5: AIR_PUFF_START_TIME: 25",
+    "1: 10: 6: AIR_PUFF_TOTAL_TIME: 5",
+    "1: 11: 12: Lick",
+    "1: 12: 22: Lick",
+    "1: 13: 25: Puff start",
+    "1: 14: 26: Lick",
+    "1: 15: 28: Negative signal start",
+    "1: 16: 29: Negative signal stop",
+    "1: 17: 30: Lick",
+    "1: 18: 31: Lick",
+    "1: 19: 32: Water on",
+    "1: 20: 33: Lick",
+    "1: 21: 34: Water off",
+    "1: 22: 35: Trial has ended",
+    "2: 23: 0: Trial has started",
+    "2: 24: 1: currentTrialType: 0",
+    "2: 25: 26: Lick",
+    "2: 26: 27: Positive signal start: extra: parts",
+    "2: 27: 28: Trial has ended",
+    "2: 28: 29: Session has ended",
+)
+
+
+class ExtractFeaturesFromSessionDataTestCase(unittest.TestCase):
+
+    def assert_same_as_legacy(self, raw_data: list, file_name: str = FILE_NAME):
+        """
+        The parsed data, trial types, printed output, and raised errors
+        all match the per-message loop
+        """
+        outcomes = []
+        for extract in (
+            legacy_extract_features_from_session_data,
+            extract_features_from_session_data,
+        ):
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                try:
+                    outcome = extract(raw_data, "117_3", 0, file_name)
+                except Exception as e:
+                    outcome = e
+            outcomes.append((outcome, output.getvalue()))
+
+        (expected, expected_output), (actual, actual_output) = outcomes
+        self.assertEqual(expected_output, actual_output)
+        if isinstance(expected, Exception):
+            self.assertIs(type(actual), type(expected))
+            self.assertEqual(str(actual), str(expected))
+            return
+        self.assertEqual(expected[0], actual[0])
+        if expected[1].empty:
+            pd.testing.assert_frame_equal(expected[1], actual[1])
+            return
+        # The loop built plain columns, now stored in compact types
+        pd.testing.assert_frame_equal(
+            expected[1].astype(SESSION_DATA_DTYPES), actual[1]
+        )
+
+    def test_test_data(self):
+        """
+        Every mouse of every file in the test data
+        """
+        for file_name in sorted(os.listdir(TEST_DATA_DIR)):
+            if not file_name.endswith(".json"):
+                continue
+            with open(os.path.join(TEST_DATA_DIR, file_name), "r") as f:
+                data = json.load(f)["data"]
+            for mouse_data in data.values():
+                with self.subTest(file_name=file_name):
+                    self.assert_same_as_legacy(mouse_data, file_name)
+
+    def test_synthetic_session(self):
+        """
+        Trial parameters, puffs, signals, water, and a `trialTypes`
+        message whose value is printed separately
+        """
+        self.assert_same_as_legacy(blobs(*SESSION))
+
+    def test_bad_data_blobs(self):
+        """
+        Bad data blobs are skipped, including between `trialTypes` and
+        its value
+        """
+        raw_data = blobs(*SESSION)
+        raw_data.insert(2, {"message": "0: 1: 1: missing absolute time"})
+        raw_data.insert(2, {"absolute_time": "2025-03-23_21-26-51.000001"})
+        raw_data.insert(2, {"absolute_time": "x", "message": "no: times"})
+        raw_data.insert(8, {"absolute_time": "x", "message": "1: a: 0: Lick"})
+        self.assert_same_as_legacy(raw_data)
+
+    def test_errors(self):
+        """
+        The first error in message order is raised
+        """
+        for messages in (
+            SESSION[:5] + ("1: 5: 1: currentTrialType: 7",) + SESSION[6:],
+            SESSION[:5] + ("1: 5: 1: currentTrialType",) + SESSION[6:],
+            SESSION[:2] + ("0: 2: 2: 0001",) + SESSION[3:],
+            SESSION[:7] + ("1: 7: 3: AUDITORY_START: ten",) + SESSION[8:],
+            SESSION[:-2] + ("1: 22: 35: Trial has ended",),
+            SESSION[1:],
+        ):
+            with self.subTest(messages=messages):
+                self.assert_same_as_legacy(blobs(*messages))
+
+    def test_short_messages(self):
+        """
+        Messages cut short after their integer parts raise an
+        `IndexError`, once the bad data blobs before them are printed,
+        while other short messages are bad data blobs
+        """
+        for message, error in (
+            ("12", IndexError),
+            ("12: 3400", IndexError),
+            ("12: 3400: ", None),
+            ("12: Lick", None),
+        ):
+            raw_data = blobs(*SESSION)
+            raw_data.insert(2, {"absolute_time": "x", "message": "no: times"})
+            raw_data.insert(4, {"absolute_time": "x", "message": message})
+            raw_data.insert(6, {"absolute_time": "x", "message": "1: a: 0: Lick"})
+            with self.subTest(message=message):
+                self.assert_same_as_legacy(raw_data)
+                if error is None:
+                    continue
+                with contextlib.redirect_stdout(io.StringIO()):
+                    with self.assertRaises(error):
+                        extract_features_from_session_data(
+                            raw_data, "117_3", 0, FILE_NAME
+                        )
+
+    def test_bad_absolute_time(self):
+        """
+        Absolute times are parsed exactly as `datetime.strptime` would
+        """
+        for absolute_time in ("2025-03-23 21:26:51", "2025-03-23_21-26-51.0000001"):
+            raw_data = blobs(*SESSION)
+            raw_data[3]["absolute_time"] = absolute_time
+            with self.subTest(absolute_time=absolute_time):
+                self.assert_same_as_legacy(raw_data)
+
+    def test_all_bad_data_blobs(self):
+        """
+        A session with no good data blobs gives an empty data frame
+        """
+        raw_data = [
+            {"absolute_time": "x", "message": "Session has started"},
+            {"absolute_time": "x", "message": "Session has ended"},
+        ]
+        self.assert_same_as_legacy(raw_data)
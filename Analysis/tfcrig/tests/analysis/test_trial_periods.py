@@ -0,0 +1,89 @@
+import json
+import os
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from tfcrig.analysis import TrialPeriods, extract_features_from_session_data
+
+TEST_DATA_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "test_data"
+)
+
+FILE_NAME = "117_3_117_5_2025-03-23_21-26-51.json"
+
+
+class TrialPeriodsTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open(os.path.join(TEST_DATA_DIR, FILE_NAME), "r") as f:
+            raw_data = json.load(f)["data"]["117_3"]
+        _, cls.df = extract_features_from_session_data(
+            raw_data, "117_3", 0, FILE_NAME, print_bad_data_blobs=False
+        )
+        # Any whole numbers will do as lick frequencies
+        cls.lick_frequency = pd.Series(
+            np.arange(len(cls.df)) % 7, index=cls.df.index, dtype=float
+        ).where(cls.df["is_session"] == 1)
+        cls.periods = TrialPeriods(cls.df, cls.lick_frequency.to_numpy())
+
+    def test_totals_match_filtering(self):
+        """
+        Lick totals over groups match totals over the filtered data
+        """
+        df = self.df
+        periods = self.periods
+        cases = [
+            (periods.mask(), np.ones(len(df), dtype=bool)),
+            (periods.mask(is_trial=1), df["is_trial"] == 1),
+            (
+                periods.mask(trial_types=[1, 2], is_session=1, is_trial=1, is_trace=1),
+                (df["trial_type"].isin([1, 2]))
+                & (df["is_session"] == 1)
+                & (df["is_trial"] == 1)
+                & (df["is_trace"] == 1),
+            ),
+            (
+                periods.mask(water=1, trial_types=[0]),
+                (df["water"] == 1) & (df["trial_type"] == 0),
+            ),
+        ]
+        for mask, expected in cases:
+            for column in ("lick", "puffed_lick"):
+                self.assertEqual(
+                    periods.total(mask, column), df.loc[expected, column].sum()
+                )
+
+    def test_means_match_filtering(self):
+        """
+        Mean lick frequencies over groups match means over the filtered data
+        """
+        df = self.df
+        periods = self.periods
+        expected = df["is_tone"] == 1
+        self.assertEqual(
+            periods.avg_lick_freq(periods.mask(is_session=1, is_tone=1)),
+            self.lick_frequency[expected].mean(),
+        )
+
+        trials = range(df["trial"].min(), df["trial"].max() + 1)
+        expected = df["is_session"] == 1
+        pd.testing.assert_series_equal(
+            periods.avg_lick_freq_per_trial(periods.mask(is_session=1), trials),
+            self.lick_frequency[expected]
+            .groupby(df.loc[expected, "trial"])
+            .mean()
+            .reindex(trials, fill_value=0),
+            check_names=False,
+            check_index_type=False,
+        )
+
+    def test_empty_selection(self):
+        """
+        Nothing selected gives zero licks and no lick frequency
+        """
+        nothing = np.zeros(len(self.periods.groups), dtype=bool)
+        self.assertEqual(self.periods.total(nothing), 0)
+        self.assertTrue(np.isnan(self.periods.avg_lick_freq(nothing)))
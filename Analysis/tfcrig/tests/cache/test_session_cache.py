@@ -0,0 +1,96 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from tfcrig.analysis import load_data_features
+from tfcrig.cache import SessionCache
+
+
+class SessionCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = SessionCache(os.path.join(self.tmp_dir.name, "cache"))
+        self.data_file = os.path.join(
+            self.tmp_dir.name, "106_3_106_4_2025-01-17_13-44-11.json"
+        )
+        with open(self.data_file, "w") as f:
+            f.write('{"header": {}, "data": {}}')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_load_without_entry(self):
+        """
+        A file that was never cached is a miss
+        """
+        self.assertIsNone(self.cache.load(self.data_file))
+
+    def test_save_then_load(self):
+        """
+        Saved features and data come back unchanged
+        """
+        data = pd.DataFrame({"trial": [0, 1], "lick": [1, 0]})
+        self.cache.save(
+            self.data_file,
+            features=[{"total_licks": 1}],
+            trial_features=[{"trial": 0}, {"trial": 1}],
+            data=data,
+        )
+        entry = self.cache.load(self.data_file)
+        self.assertEqual(entry["features"], [{"total_licks": 1}])
+        self.assertEqual(entry["trial_features"], [{"trial": 0}, {"trial": 1}])
+        self.assertIsNone(entry["error"])
+        pd.testing.assert_frame_equal(entry["data"], data)
+
+    def test_save_error(self):
+        """
+        Errors raised while parsing are cached too
+        """
+        self.cache.save(self.data_file, error="Trial start, end mismatch!!!")
+        entry = self.cache.load(self.data_file)
+        self.assertEqual(entry["error"], "Trial start, end mismatch!!!")
+
+    def test_rewritten_file_is_a_miss(self):
+        """
+        Rewriting the data file, as `RigFiles.clean` does, invalidates
+        its cache entry
+        """
+        self.cache.save(self.data_file, features=[])
+        with open(self.data_file, "w") as f:
+            f.write('{"header": {"mouse_ids": []}, "data": {}}')
+        self.assertIsNone(self.cache.load(self.data_file))
+
+    def test_rewritten_while_parsing_is_a_miss(self):
+        """
+        A file rewritten while it is parsed is cached under the signature
+        it had before, so the next load parses it again
+        """
+
+        def parse_then_rewrite(full_file, verbose):
+            with open(full_file, "w") as f:
+                f.write('{"header": {"mouse_ids": []}, "data": {}}')
+            return [], [], pd.DataFrame()
+
+        with mock.patch(
+            "tfcrig.analysis.get_data_features_from_data_file",
+            side_effect=parse_then_rewrite,
+        ) as parse:
+            load_data_features(self.data_file, cache=self.cache)
+            self.assertIsNone(self.cache.load(self.data_file))
+            load_data_features(self.data_file, cache=self.cache)
+        self.assertEqual(parse.call_count, 2)
+
+    def test_invalidate(self):
+        self.cache.save(self.data_file, features=[])
+        self.cache.invalidate(self.data_file)
+        self.assertIsNone(self.cache.load(self.data_file))
+        # Invalidating a missing entry is a no-op
+        self.cache.invalidate(self.data_file)
+
+
+if __name__ == "__main__":
+    unittest.main()
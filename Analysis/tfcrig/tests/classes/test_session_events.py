@@ -0,0 +1,425 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+from datetime import datetime
+from typing import Any, Dict, List
+
+import pandas as pd
+
+from tfcrig.classes import Session
+from tfcrig.synthetic import synthetic_session
+
+TEST_DATA_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "test_data"
+)
+
+FILE_NAME = "117_3_117_5_2025-03-23_21-26-51.json"
+
+
+def legacy_get_session_metadata(session: Session, mouse_id: str) -> Dict[str, Any]:
+    """
+    The message loop `Session.get_session_metadata` replaced
+    """
+    session_events = session.get_mouse_session_data(mouse_id)
+    metadata = {}
+
+    always_string_keys = {
+        "trialTypesChar"
+    }  # this/these will have to stay as string to prevent losing information
+
+    for event in session_events:
+        message = event.get("message", "")
+
+        # If we've reached "Session has started", stop collecting metadata
+        if "Session has started" in message:
+            break
+
+        # Example messages look like: "0: 141840: 0: BAUD_RATE: 9600"
+        # We'll split by ": " and capture the last two parts as key/value.
+        parts = message.split(": ")
+        if len(parts) >= 4:
+            # The second-to-last chunk is the key, and the last chunk is the value
+            key = parts[-2].strip()  # e.g., "BAUD_RATE"
+            value_str = parts[-1].strip()  # e.g., "9600"
+
+            # Try converting the value to int or float if it's numeric
+            value: Any
+            if key in always_string_keys:
+                value = value_str
+            else:
+                try:
+                    value = int(value_str)
+                except ValueError:
+                    try:
+                        value = float(value_str)
+                    except ValueError:
+                        # If it can't be converted to a number, leave as string
+                        value = value_str
+
+            metadata[key] = value
+
+    return metadata
+
+
+def legacy_get_post_start_events(
+    session: Session, mouse_id: str, events_of_interest: List[str] = None
+) -> pd.DataFrame:
+    """
+    The message loop `Session.get_post_start_events` replaced
+    """
+    # Default events if none provided
+    if events_of_interest is None:
+        events_of_interest = [
+            "Lick",
+            "Water on",
+            "Water off",
+            "Negative signal start",
+            "Negative signal stop",
+            "Positive signal start",
+            "Positive signal stop",
+            "Trial has started",
+            "Trial has ended",
+        ]
+
+    session_events = session.get_mouse_session_data(mouse_id)
+
+    # We'll start collecting once we see the "Session has started" message
+    start_collecting = False
+
+    # This will store our rows before we make a DataFrame
+    records = []
+
+    for event in session_events:
+        message = event.get("message", "")
+
+        # Check if we've reached the "Session has started"
+        if "Session has started" in message:
+            # Once this message is encountered, begin collecting subsequent events
+            start_collecting = True
+            continue
+
+        # If we haven't seen "Session has started" yet, skip
+        if not start_collecting:
+            continue
+
+        # Now parse events after "Session has started"
+        # Messages typically look like "0: 145804: 2418: Lick"
+        # The final colon-separated part is usually the event description
+        parts = message.split(": ")
+
+        # We only care about the events from `events_of_interest`
+        if len(parts) >= 4:
+            event_name = parts[-1].strip()
+
+            if event_name in events_of_interest:
+                # Build a record with relevant fields
+                records.append(
+                    {
+                        "mouse_id": event.get("mouse_id"),
+                        "port": event.get("port"),
+                        "absolute_time": event.get("absolute_time"),
+                        "event": event_name,
+                    }
+                )
+
+    # Convert our collected records into a DataFrame for easy manipulation
+    df = pd.DataFrame(
+        records, columns=["mouse_id", "port", "absolute_time", "event"]
+    )
+    return df
+
+
+def legacy_get_trial_events(session: Session, mouse_id: str) -> pd.DataFrame:
+    """
+    The message loop `Session.get_trial_events` replaced
+    """
+    session_events = session.get_mouse_session_data(mouse_id)
+
+    # This will hold our final rows for ALL trials
+    all_records: List[Dict[str, Any]] = []
+
+    # Temporary structure to hold the current trial data
+    # until we see 'Trial has ended'
+    current_trial = (
+        None  # Will be a dict with keys: trial_number, trial_type, events
+    )
+
+    for event in session_events:
+        msg = event.get("message", "")
+        parts = msg.split(": ")
+
+        # We expect something like: "6: 584376: 0: Trial has started"
+        # parts = ["6", "584376", "0", "Trial has started"] (or more if there's a colon in the last chunk)
+        if len(parts) < 4:
+            # Doesn't match the expected "trial_number: session_ms: trial_ms: event"
+            continue
+
+        trial_number_str, session_ms_str, trial_ms_str = (
+            parts[0],
+            parts[1],
+            parts[2],
+        )
+
+        # Join anything beyond the 3rd chunk to form the event string
+        # E.g., "Trial has started" or "currentTrialType: 2"
+        event_text = ": ".join(parts[3:]).strip()
+
+        # Attempt to convert those first three parts to integers
+        try:
+            trial_number = int(trial_number_str)
+            session_ms = int(session_ms_str)
+            trial_ms = int(trial_ms_str)
+        except ValueError:
+            # If they don't parse as integers, skip
+            continue
+
+        # -- Check for "Trial has started" --
+        if event_text == "Trial has started":
+            # If we were already in a trial, we close it out first
+            # (in case the data is malformed; else we can ignore it)
+            if current_trial is not None:
+                # This would be unusual, but you can decide how to handle
+                legacy_finalize_trial(current_trial, all_records, mouse_id)
+
+            # Begin a new trial
+            current_trial = {
+                "trial_number": trial_number,
+                "trial_type": None,  # Will fill in later if we see "currentTrialType"
+                "events": [],
+            }
+
+            # Store the 'Trial has started' event itself
+            current_trial["events"].append(
+                {
+                    "absolute_time": event["absolute_time"],
+                    "trial_time": trial_ms,
+                    "event": "Trial has started",
+                }
+            )
+            continue
+
+        # If we're not currently in a trial, ignore events until next "Trial has started"
+        if current_trial is None:
+            continue
+
+        # -- Check for "currentTrialType: X" --
+        if event_text.startswith("currentTrialType: "):
+            # E.g., "currentTrialType: 2"
+            trial_type_str = event_text.split("currentTrialType: ")[1].strip()
+            try:
+                current_trial["trial_type"] = int(trial_type_str)
+            except ValueError:
+                # If it can't parse to int, store it as string
+                current_trial["trial_type"] = trial_type_str
+
+            # Optionally store the "currentTrialType" as an event row, if desired:
+            current_trial["events"].append(
+                {
+                    "absolute_time": event["absolute_time"],
+                    "trial_time": trial_ms,
+                    "event": f"currentTrialType: {trial_type_str}",
+                }
+            )
+            continue
+
+        # -- Check for "Trial has ended" --
+        if event_text == "Trial has ended":
+            # Record the 'Trial has ended' event
+            current_trial["events"].append(
+                {
+                    "absolute_time": event["absolute_time"],
+                    "trial_time": trial_ms,
+                    "event": "Trial has ended",
+                }
+            )
+            # Finalize this trial: store all events with known trial_number, trial_type, etc.
+            legacy_finalize_trial(current_trial, all_records, mouse_id)
+            current_trial = None  # reset for the next trial
+            continue
+
+        # -- Otherwise, it's a normal event (Lick, Water on, Water off, etc.) --
+        current_trial["events"].append(
+            {
+                "absolute_time": event["absolute_time"],
+                "trial_time": trial_ms,
+                "event": event_text,
+            }
+        )
+
+    # If the file ends but a trial never ended,
+    # you can decide if you want to finalize it anyway:
+    if current_trial is not None:
+        legacy_finalize_trial(current_trial, all_records, mouse_id)
+
+    # Build a DataFrame
+    df = pd.DataFrame(
+        all_records,
+        columns=[
+            "mouse_id",
+            "trial_number",
+            "absolute_time",
+            "trial_time",
+            "event",
+            "trial_type",
+        ],
+    )
+    return df
+
+
+def legacy_finalize_trial(
+    trial_dict: Dict[str, Any],
+    master_list: List[Dict[str, Any]],
+    mouse_id: str,
+) -> None:
+    """
+    Dump the events of a single trial into the master record list
+    """
+    trial_number = trial_dict["trial_number"]
+    trial_type = trial_dict["trial_type"]
+
+    for evt in trial_dict["events"]:
+        master_list.append(
+            {
+                "mouse_id": mouse_id,
+                "trial_number": trial_number,
+                "absolute_time": evt["absolute_time"],
+                "trial_time": evt["trial_time"],
+                "event": evt["event"],
+                "trial_type": trial_type,
+            }
+        )
+
+
+def messages(*messages: str) -> list[dict]:
+    return [
+        {
+            "message": message,
+            "mouse_id": "1_1",
+            "port": "COM3",
+            "absolute_time": f"2025-01-06_09-00-{i:02d}.000000",
+        }
+        for i, message in enumerate(messages)
+    ]
+
+
+class SessionEventsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_session(self, session: dict) -> Session:
+        full_file = os.path.join(self.tmp_dir.name, "1_1_2025-01-06_09-00-00.json")
+        with open(full_file, "w") as f:
+            json.dump(session, f)
+        return Session(full_file)
+
+    def assertMatchesLegacy(self, session: Session) -> None:
+        for mouse_id in session.mouse_ids:
+            self.assertEqual(
+                session.get_session_metadata(mouse_id),
+                legacy_get_session_metadata(session, mouse_id),
+            )
+            pd.testing.assert_frame_equal(
+                session.get_post_start_events(mouse_id),
+                legacy_get_post_start_events(session, mouse_id),
+            )
+            pd.testing.assert_frame_equal(
+                session.get_post_start_events(mouse_id, ["Lick", "1"]),
+                legacy_get_post_start_events(session, mouse_id, ["Lick", "1"]),
+            )
+            pd.testing.assert_frame_equal(
+                session.get_trial_events(mouse_id),
+                legacy_get_trial_events(session, mouse_id),
+            )
+
+    def test_session(self):
+        self.assertMatchesLegacy(Session(os.path.join(TEST_DATA_DIR, FILE_NAME)))
+
+    def test_synthetic_session(self):
+        self.assertMatchesLegacy(
+            self.write_session(
+                synthetic_session(["100_1", "100_2"], datetime(2025, 1, 6, 9), seed=3)
+            )
+        )
+
+    def test_malformed_messages(self):
+        """
+        Messages that are cut short or do not parse, trials that never
+        end, events outside of trials, and odd trial types
+        """
+        session = self.write_session(
+            {
+                "header": {"mouse_ids": ["1_1"]},
+                "data": {
+                    "1_1": messages(
+                        "0: 5000: 0: Waiting for session to start...",
+                        "0: 5040: 0: BAUD_RATE: 9600",
+                        "0: 5080: 0: trialTypesChar: 0013",
+                        "0: 5090: 0: TRIAL_DURATION: 50000.5",
+                        "0: 5100: 0: Session has started",
+                        "0: 5110: 0: Lick",
+                        "0: 5120: 0: Session has started",
+                        "Lick",
+                        "0: 5130: 0: Trial has started",
+                        "0: 5140: 10: currentTrialType: 1",
+                        "0: 5150: 20: Lick ",
+                        "0: x: 30: Lick",
+                        "0: 5160: 40: Trial has ended",
+                        "0: 5170: 50: Lick",
+                        "0: 5180: 60: Trial has ended",
+                        "1: 6000: 0: Trial has started",
+                        "1: 6010: 10: Water on",
+                        "1: 6020: 20: Extra: Lick",
+                        "2: 7000: 0: Trial has started",
+                        "2: 7010: 10: currentTrialType: 3",
+                        "2: 7020: 20: currentTrialType: x",
+                        "2: 7030: 30: Lick",
+                        "2: 7040: 40",
+                        "2: 7050: 50: Lick",
+                    )
+                },
+            }
+        )
+        self.assertMatchesLegacy(session)
+        self.assertEqual(
+            session.get_trial_events("1_1")["trial_type"].tolist(),
+            [1, 1, 1, 1, None, None, None, "x", "x", "x", "x", "x"],
+        )
+
+    def test_without_trials(self):
+        session = self.write_session(
+            {
+                "header": {"mouse_ids": ["1_1", "1_2"]},
+                "data": {
+                    "1_1": messages("0: 5000: 0: BAUD_RATE: 9600", "Session has started"),
+                    "1_2": [],
+                },
+            }
+        )
+        self.assertMatchesLegacy(session)
+
+    def test_messages_are_split_once(self):
+        session = Session(os.path.join(TEST_DATA_DIR, FILE_NAME))
+        with mock.patch.object(
+            Session,
+            "_tokenize_events",
+            autospec=True,
+            side_effect=Session._tokenize_events,
+        ) as tokenize_events, contextlib.redirect_stdout(io.StringIO()):
+            session.compute_lick_metrics_all_mice()
+            session.get_post_start_events(session.mouse_ids[0])
+        self.assertEqual(tokenize_events.call_count, len(session.mouse_ids))
+
+    def test_trial_events_are_copies(self):
+        session = Session(os.path.join(TEST_DATA_DIR, FILE_NAME))
+        mouse_id = session.mouse_ids[0]
+        session.get_trial_events(mouse_id).drop(index=0, inplace=True)
+        session.get_session_metadata(mouse_id).clear()
+        self.assertMatchesLegacy(session)
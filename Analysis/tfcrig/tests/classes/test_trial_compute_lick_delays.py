@@ -0,0 +1,217 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+import pandas as pd
+
+from tfcrig.classes import Session, Trial
+from tfcrig.synthetic import synthetic_session
+
+TEST_DATA_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "test_data"
+)
+
+FILE_NAME = "117_3_117_5_2025-03-23_21-26-51.json"
+
+METADATA = {
+    "AUDITORY_START": 15000,
+    "AUDITORY_STOP": 35000,
+    "AIR_PUFF_START_TIME": 45000,
+    "AIR_PUFF_TOTAL_TIME": 5000,
+    "TRIAL_DURATION": 50000,
+    "WATER_DISPENSE_TIME": 200,
+}
+
+
+def legacy_compute_lick_delays(trial: Trial) -> pd.DataFrame:
+    """
+    The per-trial loop `Trial.compute_lick_delays` replaced
+    """
+    pre_tone_start = 0  # Always starts at 0
+    pre_tone_duration = trial.pre_tone_duration
+    tone_start = pre_tone_duration
+    tone_duration = trial.tone_duration
+    trace_start = tone_start + tone_duration
+    trace_duration = trial.trace_duration
+    post_trace_start = trace_start + trace_duration
+    post_trace_duration = trial.post_trace_duration
+
+    # Store results per trial
+    trial_results = []
+
+    for trial_number, trial_data in trial.trial_df.groupby("trial_number"):
+        # Find first lick time in each period
+        pre_tone_first_lick = trial_data.loc[
+            (trial_data["event"] == "Lick")
+            & (trial_data["trial_time"] < pre_tone_duration),
+            "trial_time",
+        ].min()
+
+        tone_first_lick = trial_data.loc[
+            (trial_data["event"] == "Lick")
+            & (trial_data["trial_time"] >= tone_start)
+            & (trial_data["trial_time"] < tone_start + tone_duration),
+            "trial_time",
+        ].min()
+
+        trace_first_lick = trial_data.loc[
+            (trial_data["event"] == "Lick")
+            & (trial_data["trial_time"] >= trace_start)
+            & (trial_data["trial_time"] < trace_start + trace_duration),
+            "trial_time",
+        ].min()
+
+        post_trace_first_lick = trial_data.loc[
+            (trial_data["event"] == "Lick")
+            & (trial_data["trial_time"] >= post_trace_start),
+            "trial_time",
+        ].min()
+
+        # Compute delay from trial start
+        pre_tone_delay_from_trial_start = (
+            pre_tone_first_lick if pd.notna(pre_tone_first_lick) else None
+        )
+
+        tone_delay_from_trial_start = (
+            tone_first_lick if pd.notna(tone_first_lick) else None
+        )
+
+        trace_delay_from_trial_start = (
+            trace_first_lick if pd.notna(trace_first_lick) else None
+        )
+
+        post_trace_delay_from_trial_start = (
+            post_trace_first_lick if pd.notna(post_trace_first_lick) else None
+        )
+
+        # Compute delay from period start
+        pre_tone_delay_from_period_start = pre_tone_delay_from_trial_start
+
+        tone_delay_from_period_start = (
+            (tone_first_lick - tone_start) if pd.notna(tone_first_lick) else None
+        )
+
+        trace_delay_from_period_start = (
+            (trace_first_lick - trace_start) if pd.notna(trace_first_lick) else None
+        )
+
+        post_trace_delay_from_period_start = (
+            (post_trace_first_lick - post_trace_start)
+            if pd.notna(post_trace_first_lick)
+            else None
+        )
+
+        # Append results
+        trial_results.append(
+            {
+                "trial_number": trial_number,
+                "pre_tone_delay_from_trial_start": pre_tone_delay_from_trial_start,
+                "tone_delay_from_trial_start": tone_delay_from_trial_start,
+                "trace_delay_from_trial_start": trace_delay_from_trial_start,
+                "post_trace_delay_from_trial_start": post_trace_delay_from_trial_start,
+                "pre_tone_delay_from_period_start": pre_tone_delay_from_period_start,
+                "tone_delay_from_period_start": tone_delay_from_period_start,
+                "trace_delay_from_period_start": trace_delay_from_period_start,
+                "post_trace_delay_from_period_start": post_trace_delay_from_period_start,
+            }
+        )
+
+    return pd.DataFrame(trial_results)
+
+
+def trial_events(events: list[tuple[int, int, str]], trial_type: int = 1) -> pd.DataFrame:
+    """
+    Trial events from `(trial_number, trial_time, event)` tuples
+    """
+    return pd.DataFrame(
+        [
+            {
+                "mouse_id": "1_1",
+                "trial_number": trial_number,
+                "absolute_time": "",
+                "trial_time": trial_time,
+                "event": event,
+                "trial_type": trial_type,
+            }
+            for trial_number, trial_time, event in events
+        ]
+    )
+
+
+class TrialComputeLickDelaysTestCase(unittest.TestCase):
+
+    def assertMatchesLegacy(self, trial: Trial) -> pd.DataFrame:
+        expected = legacy_compute_lick_delays(trial)
+        delays = trial.compute_lick_delays()
+        pd.testing.assert_frame_equal(delays, expected)
+        return delays
+
+    def test_session(self):
+        session = Session(os.path.join(TEST_DATA_DIR, FILE_NAME))
+        for mouse_id in session.mouse_ids:
+            trial = Trial(
+                session.get_trial_events(mouse_id),
+                session.get_session_metadata(mouse_id),
+            )
+            self.assertMatchesLegacy(trial)
+
+    def test_synthetic_session(self):
+        with tempfile.TemporaryDirectory() as data_root:
+            full_file = os.path.join(data_root, "100_1_100_2_2025-01-06_09-00-00.json")
+            with open(full_file, "w") as f:
+                json.dump(
+                    synthetic_session(["100_1", "100_2"], datetime(2025, 1, 6, 9), seed=3),
+                    f,
+                )
+            session = Session(full_file)
+            for mouse_id in session.mouse_ids:
+                trial = Trial(
+                    session.get_trial_events(mouse_id),
+                    session.get_session_metadata(mouse_id),
+                )
+                self.assertMatchesLegacy(trial)
+
+    def test_missing_periods(self):
+        """
+        Trials without licks, licks before the trial start, licks on the
+        period boundaries, and a period without licks in any trial
+        """
+        trial = Trial(
+            trial_events(
+                [
+                    (0, 0, "Trial has started"),
+                    (0, -10, "Lick"),
+                    (0, 15000, "Lick"),
+                    (0, 15001, "Lick"),
+                    (0, 45000, "Lick"),
+                    (1, 0, "Trial has started"),
+                    (1, 500, "Water on"),
+                    (1, 14999, "Lick"),
+                    (2, 0, "Trial has started"),
+                    (2, 50000, "Lick"),
+                ]
+            ),
+            METADATA,
+        )
+        delays = self.assertMatchesLegacy(trial)
+        self.assertEqual(delays["tone_delay_from_period_start"].tolist()[0], 0)
+        self.assertTrue(delays["trace_delay_from_trial_start"].isna().all())
+
+    def test_all_periods(self):
+        trial = Trial(
+            trial_events(
+                [
+                    (trial_number, trial_time, "Lick")
+                    for trial_number in range(3)
+                    for trial_time in [100, 20000, 40000, 46000]
+                ]
+            ),
+            METADATA,
+        )
+        self.assertMatchesLegacy(trial)
+
+    def test_empty(self):
+        trial = Trial(trial_events([]).reindex(columns=list(trial_events([(0, 0, "")]))))
+        self.assertMatchesLegacy(trial)
@@ -0,0 +1,276 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+import pandas as pd
+
+from tfcrig.classes import Session, Trial
+from tfcrig.synthetic import synthetic_session
+
+TEST_DATA_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "test_data"
+)
+
+FILE_NAME = "117_3_117_5_2025-03-23_21-26-51.json"
+
+METADATA = {
+    "AUDITORY_START": 15000,
+    "AUDITORY_STOP": 35000,
+    "AIR_PUFF_START_TIME": 45000,
+    "AIR_PUFF_TOTAL_TIME": 5000,
+    "TRIAL_DURATION": 50000,
+    "WATER_DISPENSE_TIME": 200,
+}
+
+
+def legacy_compute_lick_metrics(trial: Trial) -> pd.DataFrame:
+    """
+    The per-trial loop `Trial.compute_lick_metrics` replaced
+    """
+    # Extract timing information
+    pre_tone_duration = trial.pre_tone_duration
+    tone_duration = trial.tone_duration
+    trace_duration = trial.trace_duration
+    post_trace_duration = trial.post_trace_duration
+
+    # get time stamps
+    pre_tone_end = pre_tone_duration
+    tone_end = pre_tone_end + tone_duration
+    trace_end = tone_end + trace_duration
+
+    # Store results for each trial
+    trial_results = []
+
+    # Iterate over trials
+    for trial_number, trial_data in trial.trial_df.groupby("trial_number"):
+
+        trial_data = trial_data.sort_values("trial_time").reset_index(drop=True)
+
+        trial_type = trial_data["trial_type"].iloc[0]
+
+        # Count licks in each period based on `trial_time`
+        pre_tone_licks = (
+            (trial_data["event"] == "Lick")
+            & (trial_data["trial_time"] < pre_tone_end)
+        ).sum()
+
+        tone_licks = (
+            (trial_data["event"] == "Lick")
+            & (trial_data["trial_time"] >= pre_tone_end)
+            & (trial_data["trial_time"] < tone_end)
+        ).sum()
+
+        trace_licks = (
+            (trial_data["event"] == "Lick")
+            & (trial_data["trial_time"] >= tone_end)
+            & (trial_data["trial_time"] < trace_end)
+        ).sum()
+
+        post_trace_licks = (
+            (trial_data["event"] == "Lick")
+            & (trial_data["trial_time"] >= trace_end)
+        ).sum()
+
+        rewards = []
+        current_reward = None
+        trial_duration = trial._session_metadata.get("TRIAL_DURATION", 0)
+        water_dispense_time = trial._session_metadata.get("WATER_DISPENSE_TIME", 0)
+
+        # Find all rewards in the trial
+        for _, row in trial_data.iterrows():
+            if row["event"] == "Water on":
+                current_reward = row["trial_time"]
+            elif row["event"] == "Water off" and current_reward is not None:
+                rewards.append((current_reward, row["trial_time"]))
+                current_reward = None
+
+        if current_reward is not None:
+            expected_off = current_reward + water_dispense_time
+            if expected_off > trial_duration:
+                rewards.append((current_reward, min(expected_off, trial_duration)))
+
+        pre_tone_rewards = sum(1 for start, end in rewards if start < pre_tone_end)
+        tone_rewards = sum(
+            1 for start, end in rewards if pre_tone_end <= start < tone_end
+        )
+        trace_rewards = sum(
+            1 for start, end in rewards if tone_end <= start < trace_end
+        )
+        post_trace_rewards = sum(1 for start, end in rewards if trace_end <= start)
+
+        # Count rewarded licks (licks between Water on and Water off, these are raw counts)
+        pre_tone_rewarded_licks = tone_rewarded_licks = 0
+        trace_rewarded_licks = post_trace_rewarded_licks = 0
+
+        for _, row in trial_data.iterrows():
+            if row["event"] == "Lick":
+                for water_on, water_off in rewards:
+                    if water_on < row["trial_time"] < water_off:
+                        if row["trial_time"] < pre_tone_end:
+                            pre_tone_rewarded_licks += 1
+                        elif row["trial_time"] < tone_end:
+                            tone_rewarded_licks += 1
+                        elif row["trial_time"] < trace_end:
+                            trace_rewarded_licks += 1
+                        else:
+                            post_trace_rewarded_licks += 1
+                        break
+
+        # Normalize licks by pre-tone licks (avoid division by zero)
+        ## Avoid division by zero
+        norm_factor = pre_tone_licks if pre_tone_licks > 0 else 1
+        if pre_tone_licks == 0:
+            print(
+                f"""
+                  Warning: Trial {trial_number} has 0 pre-tone licks! Normalizing with 1 instead.
+                  """
+            )
+        normalized_tone_licks = tone_licks / norm_factor
+        normalized_trace_licks = trace_licks / norm_factor
+        normalized_post_trace_licks = post_trace_licks / norm_factor
+
+        tone = (
+            "cs+"
+            if trial_type in [1, 2]
+            else "cs-" if trial_type in [0, 3] else "no_signal"
+        )
+        puff = "puff" if trial_type in [1, 3] else "no_puff"
+
+        # Append results
+        trial_results.append(
+            {
+                "trial_number": trial_number,
+                "tone": tone,
+                "airpuff": puff,
+                "pre_tone_licks": pre_tone_licks,
+                "tone_licks": tone_licks,
+                "trace_licks": trace_licks,
+                "post_trace_licks": post_trace_licks,
+                "norm_tone_licks": normalized_tone_licks,
+                "norm_trace_licks": normalized_trace_licks,
+                "norm_post_trace_licks": normalized_post_trace_licks,
+                "pre_tone_duration": pre_tone_duration / 1000,
+                "tone_duration": tone_duration / 1000,
+                "trace_duration": trace_duration / 1000,
+                "post_trace_duration": post_trace_duration / 1000,
+                "pre_tone_rewards": pre_tone_rewards,
+                "tone_rewards": tone_rewards,
+                "trace_rewards": trace_rewards,
+                "post_trace_rewards": post_trace_rewards,
+                "pre_tone_rewarded_licks": pre_tone_rewarded_licks,
+                "tone_rewarded_licks": tone_rewarded_licks,
+                "trace_rewarded_licks": trace_rewarded_licks,
+                "post_trace_rewarded_licks": post_trace_rewarded_licks,
+            }
+        )
+
+    # Convert results into a DataFrame
+    return pd.DataFrame(trial_results)
+
+
+def trial_events(events: list[tuple[int, int, str]], trial_type: int = 1) -> pd.DataFrame:
+    """
+    Trial events from `(trial_number, trial_time, event)` tuples
+    """
+    return pd.DataFrame(
+        [
+            {
+                "mouse_id": "1_1",
+                "trial_number": trial_number,
+                "absolute_time": "",
+                "trial_time": trial_time,
+                "event": event,
+                "trial_type": trial_type,
+            }
+            for trial_number, trial_time, event in events
+        ]
+    )
+
+
+class TrialComputeLickMetricsTestCase(unittest.TestCase):
+
+    def assertMatchesLegacy(self, trial: Trial) -> pd.DataFrame:
+        with contextlib.redirect_stdout(io.StringIO()) as legacy_output:
+            expected = legacy_compute_lick_metrics(trial)
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            metrics = trial.compute_lick_metrics()
+        pd.testing.assert_frame_equal(metrics, expected)
+        self.assertEqual(
+            output.getvalue().split(), legacy_output.getvalue().split()
+        )
+        return metrics
+
+    def test_session(self):
+        session = Session(os.path.join(TEST_DATA_DIR, FILE_NAME))
+        for mouse_id in session.mouse_ids:
+            trial = Trial(
+                session.get_trial_events(mouse_id),
+                session.get_session_metadata(mouse_id),
+            )
+            self.assertMatchesLegacy(trial)
+
+    def test_synthetic_session(self):
+        with tempfile.TemporaryDirectory() as data_root:
+            full_file = os.path.join(data_root, "100_1_100_2_2025-01-06_09-00-00.json")
+            with open(full_file, "w") as f:
+                json.dump(
+                    synthetic_session(["100_1", "100_2"], datetime(2025, 1, 6, 9), seed=3),
+                    f,
+                )
+            session = Session(full_file)
+            for mouse_id in session.mouse_ids:
+                trial = Trial(
+                    session.get_trial_events(mouse_id),
+                    session.get_session_metadata(mouse_id),
+                )
+                self.assertMatchesLegacy(trial)
+
+    def test_rewards(self):
+        """
+        Unpaired water events, rewards left open at the end of a trial, and
+        licks on the edges of rewards
+        """
+        trial = Trial(
+            trial_events(
+                [
+                    (0, 0, "Trial has started"),
+                    (0, 1000, "Lick"),
+                    (0, 2000, "Water off"),
+                    (0, 3000, "Water on"),
+                    (0, 3100, "Water on"),
+                    (0, 3100, "Lick"),
+                    (0, 3150, "Lick"),
+                    (0, 3300, "Water off"),
+                    (0, 3300, "Lick"),
+                    (0, 3400, "Water off"),
+                    (0, 16000, "Lick"),
+                    (0, 49900, "Water on"),
+                    (0, 49950, "Lick"),
+                    (1, 0, "Trial has started"),
+                    (1, 20000, "Water on"),
+                    (1, 20100, "Lick"),
+                    (1, 40000, "Water on"),
+                    (1, 40001, "Lick"),
+                ]
+            ),
+            METADATA,
+        )
+        metrics = self.assertMatchesLegacy(trial)
+        self.assertEqual(metrics["pre_tone_rewards"].tolist(), [1, 0])
+        self.assertEqual(metrics["post_trace_rewards"].tolist(), [1, 0])
+        self.assertEqual(metrics["pre_tone_rewarded_licks"].tolist(), [1, 0])
+        self.assertEqual(metrics["post_trace_rewarded_licks"].tolist(), [1, 0])
+
+    def test_without_metadata(self):
+        trial = Trial(
+            trial_events([(0, 0, "Lick"), (0, 10, "Water on"), (0, 20, "Lick")])
+        )
+        self.assertMatchesLegacy(trial)
+
+    def test_empty(self):
+        trial = Trial(trial_events([]).reindex(columns=list(trial_events([(0, 0, "")]))))
+        self.assertMatchesLegacy(trial)
@@ -0,0 +1,59 @@
+import unittest
+
+import numpy as np
+
+from tfcrig.events import (
+    EVENT_CODES,
+    UNKNOWN_EVENT,
+    codes_containing,
+    encode_events,
+    event_code,
+)
+
+
+class EncodeEventsTestCase(unittest.TestCase):
+
+    def test_codes(self):
+        """
+        Codes are small and distinct, leaving room for `UNKNOWN_EVENT`
+        """
+        codes = list(EVENT_CODES.values())
+        self.assertEqual(len(set(codes)), len(codes))
+        self.assertNotIn(UNKNOWN_EVENT, codes)
+        self.assertLessEqual(max(codes), np.iinfo(np.int8).max)
+
+    def test_event_code(self):
+        self.assertEqual(event_code("Lick"), EVENT_CODES["Lick"])
+        self.assertEqual(event_code("AUDITORY_START: 15000"), EVENT_CODES["AUDITORY_START"])
+        self.assertEqual(
+            event_code("DEBUGGING: Waiting for: 5"), EVENT_CODES["DEBUGGING: Waiting for"]
+        )
+        # Cut serial lines, and texts that are not parameters
+        self.assertEqual(event_code("art..."), UNKNOWN_EVENT)
+        self.assertEqual(event_code("Lick: 5"), UNKNOWN_EVENT)
+        self.assertEqual(event_code("AUDITORY_START"), EVENT_CODES["AUDITORY_START"])
+
+    def test_encode_events(self):
+        codes = encode_events(["Lick", None, "Water on", "Lick", "garbage"])
+        self.assertEqual(codes.dtype, np.int8)
+        self.assertEqual(
+            codes.tolist(),
+            [
+                EVENT_CODES["Lick"],
+                UNKNOWN_EVENT,
+                EVENT_CODES["Water on"],
+                EVENT_CODES["Lick"],
+                UNKNOWN_EVENT,
+            ],
+        )
+        self.assertEqual(len(encode_events([])), 0)
+
+    def test_codes_containing(self):
+        self.assertEqual(
+            sorted(codes_containing("Water off")),
+            sorted([EVENT_CODES["Water off"], EVENT_CODES["Water off via trial flush"]]),
+        )
+        self.assertEqual(
+            sorted(codes_containing("trialTypes")),
+            sorted([EVENT_CODES["trialTypes"], EVENT_CODES["trialTypesChar"]]),
+        )
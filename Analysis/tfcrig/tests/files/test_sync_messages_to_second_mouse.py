@@ -0,0 +1,139 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from tfcrig.files import RigFiles
+from tfcrig.helpers.tfcrig import ABSOLUTE_TIME_FORMAT, absolute_times_to_datetime64
+from tfcrig.synthetic import write_synthetic_data_root
+
+MISSING_MESSAGES = [
+    "Puff start",
+    "Puff stop",
+    "Puff stop, catch block",
+    "Negative signal start",
+    "Negative signal stop",
+    "Positive signal start",
+    "Positive signal stop",
+]
+
+
+def legacy_synced_second_mouse_data(data, first_mouse_id, second_mouse_id, sec_port):
+    """
+    The loop over the trials of the first mouse that
+    `_synced_second_mouse_data` replaced
+    """
+    first_mouse_trial_end_times = np.sort(
+        absolute_times_to_datetime64(
+            entry["absolute_time"]
+            for entry in data["data"][first_mouse_id]
+            if entry["message"].strip().endswith("Trial has ended")
+        )
+    )
+    second_mouse_trial_end_times = np.sort(
+        absolute_times_to_datetime64(
+            entry["absolute_time"]
+            for entry in data["data"][second_mouse_id]
+            if entry["message"].strip().endswith("Trial has ended")
+        )
+    )
+    first_mouse_messages = [
+        entry
+        for entry in data["data"][first_mouse_id]
+        if any(entry["message"].strip().endswith(msg) for msg in MISSING_MESSAGES)
+    ]
+    first_mouse_message_times = absolute_times_to_datetime64(
+        entry["absolute_time"] for entry in first_mouse_messages
+    )
+    combined_data = data["data"][second_mouse_id]
+    prev_end_time = None
+    for i, first_end_time in enumerate(first_mouse_trial_end_times):
+        if i < len(second_mouse_trial_end_times):
+            second_end_time = second_mouse_trial_end_times[i]
+            time_diff = first_end_time - second_end_time
+            in_trial = first_mouse_message_times <= first_end_time
+            if prev_end_time is not None:
+                in_trial &= first_mouse_message_times > prev_end_time
+            combined_data.extend(
+                {
+                    "message": first_mouse_messages[j]["message"],
+                    "mouse_id": second_mouse_id,
+                    "port": sec_port,
+                    "absolute_time": (first_mouse_message_times[j] - time_diff)
+                    .item()
+                    .strftime(ABSOLUTE_TIME_FORMAT),
+                }
+                for j in np.flatnonzero(in_trial)
+            )
+            prev_end_time = first_end_time
+    combined_data_times = absolute_times_to_datetime64(
+        entry["absolute_time"] for entry in combined_data
+    )
+    return [combined_data[j] for j in np.argsort(combined_data_times, kind="stable")]
+
+
+class SyncMessagesToSecondMouseTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.files = write_synthetic_data_root(
+            self.tmp_dir.name, n_cohorts=1, n_pairs=3, n_sessions=1, n_trials=6
+        )
+        for i, full_file in enumerate(self.files):
+            with open(full_file, "r") as f:
+                data = json.load(f)
+            first_mouse_id, second_mouse_id = data["header"]["mouse_ids"]
+            second = [
+                entry
+                for entry in data["data"][second_mouse_id]
+                if not entry["message"].strip().endswith(tuple(MISSING_MESSAGES))
+            ]
+            if i == 1:
+                # The second rig stopped early, so its last trials never ended
+                ends = [
+                    j
+                    for j, entry in enumerate(second)
+                    if entry["message"].endswith("Trial has ended")
+                ]
+                second = second[: ends[-3]]
+            if i == 2:
+                # Messages at the same time keep their order
+                first = data["data"][first_mouse_id]
+                for entry in first[1:]:
+                    entry["absolute_time"] = first[0]["absolute_time"]
+                second = [dict(entry, absolute_time=first[0]["absolute_time"]) for entry in second]
+            data["data"][second_mouse_id] = second
+            with open(full_file, "w") as f:
+                json.dump(data, f, indent=4)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_sync(self):
+        expected = {}
+        for full_file in self.files:
+            with open(full_file, "r") as f:
+                data = json.load(f)
+            first_mouse_id, second_mouse_id = data["header"]["mouse_ids"]
+            expected[full_file] = legacy_synced_second_mouse_data(
+                data, first_mouse_id, second_mouse_id, data["header"]["secondary_port"]
+            )
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            RigFiles(data_root=self.tmp_dir.name, dry_run=False)._sync_messages_to_second_mouse()
+
+        for full_file in self.files:
+            with open(full_file, "r") as f:
+                data = json.load(f)
+            second_mouse_id = data["header"]["mouse_ids"][1]
+            self.assertEqual(data["data"][second_mouse_id], expected[full_file])
+            self.assertTrue(
+                any(
+                    entry["message"].endswith("Puff start")
+                    for entry in data["data"][second_mouse_id]
+                )
+            )
@@ -0,0 +1,83 @@
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+from tfcrig.helpers.tfcrig import (
+    ABSOLUTE_TIME_FORMAT,
+    absolute_times_to_datetime64,
+)
+
+
+class AbsoluteTimesToDatetime64TestCase(unittest.TestCase):
+
+    def assert_same_as_strptime(self, absolute_times: list[str]):
+        expected = np.array(
+            [datetime.strptime(t, ABSOLUTE_TIME_FORMAT) for t in absolute_times],
+            dtype="datetime64[us]",
+        )
+        actual = absolute_times_to_datetime64(absolute_times)
+        self.assertEqual(actual.dtype, np.dtype("datetime64[us]"))
+        np.testing.assert_array_equal(actual, expected)
+
+    def test_fixed_width(self):
+        """
+        Fully padded times, including leap days and the end of a year
+        """
+        self.assert_same_as_strptime(
+            [
+                "2025-03-23_21-26-51.201737",
+                "2024-02-29_00-00-00.000000",
+                "1999-12-31_23-59-59.999999",
+                "2100-01-01_12-30-00.000001",
+            ]
+        )
+
+    def test_irregular_width(self):
+        """
+        Times that `datetime.strptime` accepts without padding
+        """
+        self.assert_same_as_strptime(
+            ["2025-3-23_21-26-51.2", "2025-03-23_1-2-3.000004"]
+        )
+
+    def test_empty(self):
+        """
+        No times gives an empty array
+        """
+        self.assertEqual(len(absolute_times_to_datetime64([])), 0)
+
+    def test_invalid_raises(self):
+        """
+        Invalid times raise the same error as `datetime.strptime`
+        """
+        for absolute_time in (
+            "2023-02-29_00-00-00.000000",
+            "2023-13-01_00-00-00.000000",
+            "2023-01-01_24-00-00.000000",
+            "2023-01-01 00-00-00.000000",
+            "2023-01-01_00-00-00.0000001",
+        ):
+            with self.subTest(absolute_time=absolute_time):
+                with self.assertRaises(ValueError) as expected:
+                    datetime.strptime(absolute_time, ABSOLUTE_TIME_FORMAT)
+                with self.assertRaises(ValueError) as actual:
+                    absolute_times_to_datetime64([absolute_time])
+                self.assertEqual(str(actual.exception), str(expected.exception))
+
+    def test_invalid_coerce(self):
+        """
+        Invalid times are `NaT` when coerced
+        """
+        actual = absolute_times_to_datetime64(
+            ["2023-02-29_00-00-00.000000", "2025-03-23_21-26-51.201737", None],
+            errors="coerce",
+        )
+        np.testing.assert_array_equal(np.isnat(actual), [True, False, True])
+
+    def test_unknown_errors(self):
+        """
+        Only `raise` and `coerce` are supported
+        """
+        with self.assertRaises(ValueError):
+            absolute_times_to_datetime64([], errors="ignore")
@@ -0,0 +1,70 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from tfcrig.helpers.numpy import centered_rolling_sum
+
+
+class CenteredRollingSumTestCase(unittest.TestCase):
+
+    def assert_same_as_pandas(
+        self, times_ms: list[int], values: list[int], window: int
+    ):
+        """
+        Compare against a centered, time-based Pandas rolling sum over the
+        same times sorted into a `DatetimeIndex`
+        """
+        times_ms = np.array(times_ms)
+        order = np.argsort(times_ms, kind="stable")
+        series = pd.Series(
+            np.array(values, dtype=float)[order],
+            index=pd.to_datetime(times_ms[order], unit="ms"),
+        )
+        expected = np.empty(len(times_ms))
+        expected[order] = (
+            series.rolling(window=pd.Timedelta(milliseconds=window), center=True)
+            .sum()
+            .to_numpy()
+        )
+        np.testing.assert_array_equal(
+            centered_rolling_sum(times_ms, values, window), expected
+        )
+
+    def test_window_edges(self):
+        """
+        Times exactly half a window before are excluded, after are included
+        """
+        self.assert_same_as_pandas(
+            [0, 500, 1000, 1000, 1000, 1499, 1500, 1501, 2000, 2000, 3000],
+            [1, 0, 1, 1, 0, 1, 1, 0, 1, 1, 1],
+            1000,
+        )
+
+    def test_odd_window(self):
+        self.assert_same_as_pandas([0, 1, 2, 3, 5, 8], [1, 1, 0, 1, 1, 1], 3)
+
+    def test_unsorted(self):
+        """
+        Sums are returned in the original order of unsorted times
+        """
+        rng = np.random.default_rng(0)
+        times_ms = rng.integers(0, 10_000, 500)
+        values = rng.integers(0, 2, 500)
+        for window in (1, 250, 1000, 2001):
+            with self.subTest(window=window):
+                self.assert_same_as_pandas(times_ms, values, window)
+
+    def test_nanoseconds(self):
+        """
+        Epoch times in nanoseconds do not lose precision
+        """
+        times = pd.to_datetime(
+            ["2025-03-23 21:26:51.000001", "2025-03-23 21:26:51.500001"]
+        ).asi8
+        np.testing.assert_array_equal(
+            centered_rolling_sum(times, [1, 1], 1_000_000_000), [2, 1]
+        )
+
+    def test_empty(self):
+        self.assertEqual(len(centered_rolling_sum([], [], 1000)), 0)
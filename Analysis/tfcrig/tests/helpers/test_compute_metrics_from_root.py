@@ -0,0 +1,128 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from tfcrig.helpers.batch import compute_metrics_from_folder, compute_metrics_from_root
+from tfcrig.manifest import DataManifest
+from tfcrig.synthetic import write_synthetic_data_root
+
+TEST_DATA_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "test_data"
+)
+
+
+class ComputeMetricsFromRootTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.files = write_synthetic_data_root(
+            cls.tmp_dir.name, n_cohorts=2, n_pairs=2, n_sessions=2, n_trials=4
+        )
+        day_dir = os.path.dirname(cls.files[0])
+        cls.broken_file = os.path.join(day_dir, "100_1_100_2_2025-01-06_23-00-00.json")
+        with open(cls.broken_file, "w") as f:
+            f.write("{")
+        duplicate_dir = os.path.join(cls.tmp_dir.name, "I_cohort", "duplicate_data")
+        os.makedirs(duplicate_dir)
+        with open(os.path.join(duplicate_dir, os.path.basename(cls.files[0])), "w") as f:
+            f.write("{")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def compute_metrics_from_root(self, *args, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return compute_metrics_from_root(*args, **kwargs)
+
+    def test_metrics(self):
+        """
+        Every session file under the root is processed, in order of its
+        path, with the same metrics as per folder
+        """
+        metrics, _ = self.compute_metrics_from_root(self.tmp_dir.name)
+        self.assertEqual(
+            list(metrics["source_file"].unique()),
+            [os.path.basename(f) for f in sorted(self.files)],
+        )
+
+        folder_metrics = []
+        for day_dir in sorted({os.path.dirname(f) for f in self.files}):
+            with contextlib.redirect_stdout(io.StringIO()):
+                folder_metrics.append(compute_metrics_from_folder(day_dir))
+        pd.testing.assert_frame_equal(
+            metrics, pd.concat(folder_metrics, ignore_index=True)
+        )
+
+    def test_errors(self):
+        """
+        Files that can not be processed are reported rather than printed,
+        and 'duplicate_data' folders are skipped
+        """
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            _, errors = compute_metrics_from_root(self.tmp_dir.name)
+        self.assertNotIn("Skipping", output.getvalue())
+        self.assertEqual(
+            list(errors.columns), ["source_file", "path", "error_type", "error"]
+        )
+        self.assertEqual(errors["path"].tolist(), [self.broken_file])
+        self.assertEqual(errors["error_type"].tolist(), ["JSONDecodeError"])
+
+    def test_root_in_skipped_folder(self):
+        """
+        Only folders below the root are skipped, by name, so a root inside
+        a 'test_data' folder is processed, and folders whose names merely
+        contain 'test_data' are too
+        """
+        metrics, errors = self.compute_metrics_from_root(TEST_DATA_DIR)
+        with contextlib.redirect_stdout(io.StringIO()):
+            folder_metrics = compute_metrics_from_folder(TEST_DATA_DIR)
+        self.assertFalse(metrics.empty)
+        pd.testing.assert_frame_equal(metrics, folder_metrics)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_root = os.path.join(tmp_dir, "test_data", "latest_data_test_data_v2")
+            files = write_synthetic_data_root(data_root, n_cohorts=1, n_trials=4)
+            skipped_dir = os.path.join(data_root, "I_cohort", "test_data")
+            os.makedirs(skipped_dir)
+            with open(os.path.join(skipped_dir, os.path.basename(files[0])), "w") as f:
+                f.write("{")
+            metrics, errors = self.compute_metrics_from_root(data_root)
+        self.assertEqual(
+            list(metrics["source_file"].unique()),
+            [os.path.basename(f) for f in sorted(files)],
+        )
+        self.assertTrue(errors.empty)
+
+    def test_workers(self):
+        """
+        A process pool returns the same metrics and errors, in the same order
+        """
+        metrics, errors = self.compute_metrics_from_root(self.tmp_dir.name)
+        pool_metrics, pool_errors = self.compute_metrics_from_root(
+            self.tmp_dir.name, workers=2, chunksize=3
+        )
+        pd.testing.assert_frame_equal(pool_metrics, metrics)
+        pd.testing.assert_frame_equal(pool_errors, errors)
+
+    def test_manifest(self):
+        manifest = DataManifest(self.tmp_dir.name)
+        metrics, errors = self.compute_metrics_from_root(
+            os.path.join(self.tmp_dir.name, "I_cohort"), manifest=manifest
+        )
+        self.assertEqual(
+            set(metrics["source_file"]),
+            {os.path.basename(f) for f in self.files if "/I_cohort/" in f},
+        )
+        self.assertEqual(errors["path"].tolist(), [self.broken_file])
+
+    def test_empty_root(self):
+        with tempfile.TemporaryDirectory() as data_root:
+            metrics, errors = self.compute_metrics_from_root(data_root, workers=2)
+        self.assertTrue(metrics.empty)
+        self.assertTrue(errors.empty)
@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from tfcrig.manifest import DataManifest
+
+FILE_NAME = "106_3_106_4_2025-01-17_13-44-11.json"
+
+
+class DataManifestTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_root = os.path.join(self.tmp_dir.name, "data")
+        self.manifest_file = os.path.join(self.tmp_dir.name, "manifest.json")
+        for directory in ("2025_01_17", "2025_01_18"):
+            os.makedirs(os.path.join(self.data_root, "I_cohort", directory))
+        self.write(os.path.join("I_cohort", "2025_01_17", FILE_NAME))
+        self.write(os.path.join("I_cohort", "2025_01_17", "notes.txt"))
+        self.settle()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, file: str) -> None:
+        with open(os.path.join(self.data_root, file), "w") as f:
+            f.write('{"header": {}, "data": {}}')
+
+    def settle(self) -> None:
+        """
+        Move every modification time into the past, so that listings
+        are trusted by the next walk
+        """
+        for root, dirs, files in os.walk(self.data_root):
+            for name in [root] + [os.path.join(root, f) for f in files]:
+                os.utime(name, ns=(0, 1_000_000_000))
+
+    def walk_listing(self, manifest: DataManifest) -> list[str]:
+        """
+        Walk with a fresh manifest, returning the directories listed
+        """
+        with mock.patch.object(
+            DataManifest, "_list_dir", wraps=DataManifest._list_dir
+        ) as list_dir:
+            os_walk = manifest.walk()
+        self.assertEqual(
+            [(r, sorted(d), sorted(f)) for r, d, f in os_walk],
+            [(r, sorted(d), sorted(f)) for r, d, f in os.walk(self.data_root)],
+        )
+        return [os.path.relpath(c.args[0], self.data_root) for c in list_dir.call_args_list]
+
+    def test_first_walk_lists_everything(self):
+        listed = self.walk_listing(DataManifest(self.data_root, self.manifest_file))
+        self.assertEqual(len(listed), 4)
+        self.assertTrue(os.path.isfile(self.manifest_file))
+
+    def test_unchanged_directories_are_not_listed(self):
+        DataManifest(self.data_root, self.manifest_file).walk()
+        manifest = DataManifest(self.data_root, self.manifest_file)
+        self.assertEqual(self.walk_listing(manifest), [])
+
+    def test_changed_directory_is_listed(self):
+        DataManifest(self.data_root, self.manifest_file).walk()
+        self.write(os.path.join("I_cohort", "2025_01_18", FILE_NAME))
+        manifest = DataManifest(self.data_root, self.manifest_file)
+        self.assertEqual(
+            self.walk_listing(manifest), [os.path.join("I_cohort", "2025_01_18")]
+        )
+        self.assertEqual(len(manifest.records()), 2)
+
+    def test_removed_directory_is_forgotten(self):
+        manifest = DataManifest(self.data_root, self.manifest_file)
+        manifest.walk()
+        shutil.rmtree(os.path.join(self.data_root, "I_cohort", "2025_01_17"))
+        self.walk_listing(manifest)
+        self.assertEqual(len(manifest.directories), 3)
+        self.assertTrue(manifest.records().empty)
+
+    def test_invalidate(self):
+        """
+        A file rewritten in place is picked up once it is invalidated
+        """
+        manifest = DataManifest(self.data_root, self.manifest_file)
+        manifest.walk()
+        full_file = os.path.join(self.data_root, "I_cohort", "2025_01_17", FILE_NAME)
+        with open(full_file, "a") as f:
+            f.write(" ")
+        manifest.invalidate(full_file)
+        self.assertEqual(
+            self.walk_listing(manifest), [os.path.join("I_cohort", "2025_01_17")]
+        )
+        self.assertEqual(manifest.records()["size"].tolist(), [os.stat(full_file).st_size])
+
+    def test_records(self):
+        records = DataManifest(self.data_root).records()
+        self.assertEqual(len(records), 1)
+        record = records.iloc[0]
+        self.assertEqual(record["cohort"], "I")
+        self.assertEqual(record["mouse_ids"], ["106_3", "106_4"])
+        self.assertEqual(record["session_id"], 20250117134411)
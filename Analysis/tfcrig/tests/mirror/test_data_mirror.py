@@ -0,0 +1,154 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from tfcrig import mirror
+from tfcrig.analysis import Analysis
+from tfcrig.mirror import DataMirror
+from tfcrig.sidecar import load_sidecar, remove_sidecar, sidecar_file, write_sidecar
+
+TEST_DATA_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "test_data"
+)
+
+FILE_NAME = "117_3_117_5_2025-03-23_21-26-51.json"
+
+
+class DataMirrorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_root = os.path.join(self.tmp_dir.name, "data")
+        self.mirror_root = os.path.join(self.tmp_dir.name, "mirror")
+        self.session_dir = os.path.join(self.data_root, "I_cohort", "2025_03_23")
+        os.makedirs(self.session_dir)
+        for day in ("23", "24"):
+            shutil.copy(os.path.join(TEST_DATA_DIR, FILE_NAME), self.session_file(day))
+        with open(os.path.join(self.session_dir, "notes.txt"), "w") as f:
+            f.write("Not a data file")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def session_file(self, day: str) -> str:
+        return os.path.join(self.session_dir, FILE_NAME.replace("-23_", f"-{day}_"))
+
+    def sync(self) -> list[str]:
+        """
+        Sync a new mirror, returning the files that were copied
+        """
+        data_mirror = DataMirror(
+            data_root=self.data_root, mirror_root=self.mirror_root, workers=4
+        )
+        with mock.patch.object(
+            mirror, "_copy_file", wraps=mirror._copy_file
+        ) as copy_file, contextlib.redirect_stdout(io.StringIO()):
+            data_mirror.sync()
+        return sorted(c.args[0] for c in copy_file.call_args_list)
+
+    def mirrored_files(self) -> list[str]:
+        return sorted(
+            os.path.relpath(os.path.join(root, file), self.mirror_root)
+            for root, _, files in os.walk(self.mirror_root)
+            for file in files
+        )
+
+    def test_sync(self):
+        self.assertEqual(self.sync(), [self.session_file("23"), self.session_file("24")])
+        self.assertEqual(
+            self.mirrored_files(),
+            [
+                "I_cohort/2025_03_23/" + os.path.basename(self.session_file("23")),
+                "I_cohort/2025_03_23/" + os.path.basename(self.session_file("24")),
+                "manifest.json",
+            ],
+        )
+        for day in ("23", "24"):
+            mirror_file = self.session_file(day).replace(self.data_root, self.mirror_root)
+            with open(self.session_file(day), "rb") as f, open(mirror_file, "rb") as g:
+                self.assertEqual(f.read(), g.read())
+
+    def test_sync_is_incremental(self):
+        self.sync()
+        self.assertEqual(self.sync(), [])
+
+        # A new file is copied, a removed one is removed from the mirror
+        shutil.copy(self.session_file("24"), self.session_file("25"))
+        os.remove(self.session_file("23"))
+        self.assertEqual(self.sync(), [self.session_file("25")])
+        self.assertEqual(len(self.mirrored_files()), 3)
+
+    def test_sync_file_rewritten_in_place(self):
+        """
+        A file rewritten in place, which leaves the modification time of
+        its directory as it was, is copied again
+        """
+        # A directory that settled long ago is not listed again
+        settled = time.time_ns() - 60_000_000_000
+        os.utime(self.session_dir, ns=(settled, settled))
+        self.sync()
+        with open(self.session_file("23"), "a") as f:
+            f.write("\n")
+        self.assertEqual(os.stat(self.session_dir).st_mtime_ns, settled)
+        self.assertEqual(self.sync(), [self.session_file("23")])
+        mirror_file = self.session_file("23").replace(self.data_root, self.mirror_root)
+        with open(self.session_file("23"), "rb") as f, open(mirror_file, "rb") as g:
+            self.assertEqual(f.read(), g.read())
+
+    def test_sync_sidecars(self):
+        """
+        Sidecars are mirrored along with their base data files, and are
+        valid in the mirror
+        """
+        write_sidecar(self.session_file("23"))
+        self.assertEqual(
+            self.sync(),
+            [
+                self.session_file("23"),
+                sidecar_file(self.session_file("23")),
+                self.session_file("24"),
+            ],
+        )
+        mirror_file = self.session_file("23").replace(self.data_root, self.mirror_root)
+        self.assertIsNotNone(load_sidecar(mirror_file))
+
+        remove_sidecar(self.session_file("23"))
+        self.sync()
+        self.assertFalse(os.path.exists(sidecar_file(mirror_file)))
+
+    def test_analysis_mirror_root(self):
+        """
+        An analysis with a `mirror_root` reads the mirror, and syncs it
+        again when refreshed
+        """
+        with contextlib.redirect_stdout(io.StringIO()):
+            source = Analysis(data_root=self.data_root)
+            mirrored = Analysis(data_root=self.data_root, mirror_root=self.mirror_root)
+        self.assertEqual(mirrored.data_root, self.mirror_root)
+        self.assertEqual(len(self.mirrored_files()), 3)
+        pd.testing.assert_frame_equal(source.df, mirrored.df)
+        pd.testing.assert_frame_equal(source.data, mirrored.data)
+
+        shutil.copy(self.session_file("24"), self.session_file("25"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            refreshed = mirrored.refresh()
+        self.assertEqual(
+            refreshed,
+            [self.session_file("25").replace(self.data_root, self.mirror_root)],
+        )
+
+    def test_analysis_of_mirror(self):
+        self.sync()
+        with contextlib.redirect_stdout(io.StringIO()):
+            source = Analysis(data_root=self.data_root)
+            mirrored = Analysis(data_root=self.mirror_root)
+        pd.testing.assert_frame_equal(source.df, mirrored.df)
+        pd.testing.assert_frame_equal(source.trial_df, mirrored.trial_df)
+        pd.testing.assert_frame_equal(source.data, mirrored.data)
@@ -0,0 +1,145 @@
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from tfcrig.analysis import get_data_features_from_data_file
+from tfcrig.classes import Session
+from tfcrig.sidecar import load_sidecar, remove_sidecar, write_sidecar
+from tfcrig.synthetic import synthetic_session
+
+SERIAL_READ_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..",
+    "..",
+    "..",
+    "..",
+    "Software",
+    "Serial_read",
+)
+sys.path.insert(0, SERIAL_READ_DIR)
+
+from session_writer import SessionWriter  # noqa: E402
+
+
+class AcquisitionSidecarTestCase(unittest.TestCase):
+    """
+    Sidecars are written both by the acquisition scripts, from the
+    journal of a session, and by `tfcrig.sidecar`, from a base data file.
+    Both must give the same sidecar for the same session
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_file = os.path.join(
+            self.tmp_dir.name, "100_1_100_2_2025-01-06_09-00-00.json"
+        )
+        session = synthetic_session(
+            ["100_1", "100_2"], datetime(2025, 1, 6, 9, 0, 0), n_trials=4
+        )
+        # Events a column can not hold are kept as they are
+        events = session["data"]["100_1"]
+        events.insert(
+            3, {"message": "garbage", "absolute_time": events[3]["absolute_time"]}
+        )
+        events[5] = dict(events[5], absolute_time=events[5]["absolute_time"][:-3])
+        events[7] = dict(events[7], message="1: " + "9" * 12 + ": 3: Lick")
+        events[9] = dict(events[9], message="1: 2147483648: 3: Lick")
+        events[11] = dict(events[11], message="01: 100: 3: Lick")
+
+        # The end of the session is written to both mice at once
+        session_end = events.pop()
+        session["data"]["100_2"].pop()
+        with SessionWriter(self.data_file, session["header"]) as writer:
+            for mouse_id, mouse_events in session["data"].items():
+                for event in mouse_events:
+                    writer.write(mouse_id, event)
+            writer.write_all(session_end)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def features(self):
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            features, trial_features, data = get_data_features_from_data_file(
+                self.data_file, verbose=True
+            )
+        return (
+            pd.DataFrame(features),
+            pd.DataFrame(trial_features),
+            data,
+            output.getvalue(),
+        )
+
+    def assert_same_results(self, results, expected_results):
+        for result, expected_result in zip(results, expected_results):
+            if isinstance(result, str):
+                self.assertEqual(result, expected_result)
+            else:
+                pd.testing.assert_frame_equal(result, expected_result)
+
+    def test_same_sidecar(self):
+        """
+        The sidecar written from the journal is read back exactly as the
+        sidecar written from the base data file
+        """
+        acquisition_sidecar = load_sidecar(self.data_file)
+        self.assertIsNotNone(acquisition_sidecar)
+        write_sidecar(self.data_file)
+        sidecar = load_sidecar(self.data_file)
+
+        self.assertEqual(acquisition_sidecar["header"], sidecar["header"])
+        self.assertEqual(
+            list(acquisition_sidecar["messages"]), list(sidecar["messages"])
+        )
+        self.assertEqual(list(acquisition_sidecar["data"]), list(sidecar["data"]))
+        for mouse_id, columns in sidecar["data"].items():
+            acquisition_columns = acquisition_sidecar["data"][mouse_id]
+            self.assertEqual(list(acquisition_columns), list(columns))
+            for key, values in columns.items():
+                with self.subTest(mouse_id=mouse_id, key=key):
+                    if isinstance(values, np.ndarray):
+                        self.assertEqual(acquisition_columns[key].dtype, values.dtype)
+                        np.testing.assert_array_equal(acquisition_columns[key], values)
+                    else:
+                        self.assertEqual(acquisition_columns[key], values)
+        self.assertEqual(sorted(sidecar["data"]["100_1"]["raw"]), [3, 5, 7, 9, 11])
+
+    def test_features(self):
+        """
+        Features and events read with the sidecar written from the journal
+        are the same as those parsed from the base data file
+        """
+        results = self.features()
+        session = Session(self.data_file)
+        self.assertIsNotNone(session._sidecar)
+        events = {
+            mouse_id: session.get_events(mouse_id) for mouse_id in session.mouse_ids
+        }
+
+        remove_sidecar(self.data_file)
+        self.assert_same_results(results, self.features())
+        expected = Session(self.data_file)
+        self.assertIsNone(expected._sidecar)
+        for mouse_id, mouse_events in events.items():
+            pd.testing.assert_frame_equal(mouse_events, expected.get_events(mouse_id))
+
+    def test_session_file(self):
+        """
+        The base data file is the one `json.dump` would write
+        """
+        with open(self.data_file, "r") as f:
+            session = json.load(f)
+        with open(self.data_file, "r") as f:
+            self.assertEqual(f.read(), json.dumps(session, indent=4))
+
+
+if __name__ == "__main__":
+    unittest.main()
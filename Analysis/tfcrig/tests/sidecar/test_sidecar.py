@@ -0,0 +1,128 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+import pandas as pd
+
+from tfcrig.analysis import get_data_features_from_data_file
+from tfcrig.classes import Session
+from tfcrig.sidecar import load_sidecar, remove_sidecar, sidecar_file, write_sidecar
+from tfcrig.synthetic import synthetic_session
+
+
+class SidecarTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_file = os.path.join(
+            self.tmp_dir.name, "100_1_100_2_2025-01-06_09-00-00.json"
+        )
+        session = synthetic_session(
+            ["100_1", "100_2"], datetime(2025, 1, 6, 9, 0, 0), n_trials=4
+        )
+        # Events a column can not hold are kept as they are
+        events = session["data"]["100_1"]
+        events.insert(3, {"message": "garbage", "absolute_time": events[3]["absolute_time"]})
+        events[5] = dict(events[5], absolute_time=events[5]["absolute_time"][:-3])
+        events[7] = dict(events[7], message="1: " + "9" * 12 + ": 3: Lick")
+        with open(self.data_file, "w") as f:
+            json.dump(session, f, indent=4)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def features(self):
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            features, trial_features, data = get_data_features_from_data_file(
+                self.data_file, verbose=True
+            )
+        return pd.DataFrame(features), pd.DataFrame(trial_features), data, output.getvalue()
+
+    def test_write_then_load(self):
+        path = write_sidecar(self.data_file)
+        self.assertEqual(path, sidecar_file(self.data_file))
+        self.assertTrue(path.endswith("100_1_100_2_2025-01-06_09-00-00.npz"))
+
+        sidecar = load_sidecar(self.data_file)
+        self.assertEqual(sidecar["header"]["mouse_ids"], ["100_1", "100_2"])
+        columns = sidecar["data"]["100_1"]
+        self.assertEqual(sorted(columns["raw"]), [3, 5, 7])
+        self.assertEqual(columns["raw"][3]["message"], "garbage")
+        self.assertEqual(columns["port"], "COM3")
+        # The end of the session is written for both mice
+        self.assertTrue(columns["shared"][-1])
+        self.assertEqual(sidecar["messages"][columns["message"][-1]], "Session has ended")
+
+    def test_features(self):
+        """
+        Features are the same with and without a sidecar
+        """
+        expected = self.features()
+        write_sidecar(self.data_file)
+        for result, expected_result in zip(self.features(), expected):
+            if isinstance(result, str):
+                self.assertEqual(result, expected_result)
+            else:
+                pd.testing.assert_frame_equal(result, expected_result)
+
+    def test_session(self):
+        """
+        Events are the same with and without a sidecar, and the JSON data
+        is only loaded when it is asked for
+        """
+        expected = Session(self.data_file)
+        write_sidecar(self.data_file)
+        session = Session(self.data_file)
+        self.assertIsNotNone(session._sidecar)
+        self.assertIsNone(session._data)
+        self.assertEqual(session.mouse_ids, expected.mouse_ids)
+        for mouse_id in expected.mouse_ids:
+            pd.testing.assert_frame_equal(
+                session.get_events(mouse_id), expected.get_events(mouse_id)
+            )
+            self.assertEqual(
+                session.get_session_metadata(mouse_id),
+                expected.get_session_metadata(mouse_id),
+            )
+        self.assertEqual(session.session_data, expected.session_data)
+
+    def test_stale_sidecar(self):
+        """
+        A sidecar is ignored once its file changed size
+        """
+        write_sidecar(self.data_file)
+        with open(self.data_file, "a") as f:
+            f.write("\n")
+        self.assertIsNone(load_sidecar(self.data_file))
+
+    def test_rewritten_same_size(self):
+        """
+        A sidecar is ignored once its file is rewritten, even to the same
+        size, e.g. when syncing rewrites fixed width times
+        """
+        write_sidecar(self.data_file)
+        with open(self.data_file, "r") as f:
+            text = f.read()
+        stat = os.stat(self.data_file)
+        with open(self.data_file, "w") as f:
+            f.write(text.replace("09-00-1", "09-00-2", 1))
+        os.utime(self.data_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        self.assertEqual(os.path.getsize(self.data_file), stat.st_size)
+        self.assertIsNone(load_sidecar(self.data_file))
+        self.assertIsNone(Session(self.data_file)._sidecar)
+
+    def test_corrupt_sidecar(self):
+        with open(sidecar_file(self.data_file), "wb") as f:
+            f.write(b"not a sidecar")
+        self.assertIsNone(load_sidecar(self.data_file))
+
+    def test_remove_sidecar(self):
+        write_sidecar(self.data_file)
+        remove_sidecar(self.data_file)
+        self.assertFalse(os.path.exists(sidecar_file(self.data_file)))
+        # Removing a missing sidecar is a no-op
+        remove_sidecar(self.data_file)
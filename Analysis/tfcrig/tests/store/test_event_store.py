@@ -0,0 +1,136 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from tfcrig.analysis import Analysis
+from tfcrig.store import EventStore
+from tfcrig.synthetic import write_synthetic_data_root
+
+
+class EventStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = EventStore(os.path.join(self.tmp_dir.name, "store"))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def frame(self, mouse_ids, session_id, n, message):
+        return pd.DataFrame(
+            {
+                "mouse_id": pd.Categorical(np.repeat(mouse_ids, n)),
+                "session_id": np.full(n * len(mouse_ids), session_id, dtype=np.int64),
+                "trial": np.arange(n * len(mouse_ids), dtype=np.int16),
+                "message": pd.Categorical([message] * (n * len(mouse_ids))),
+            }
+        )
+
+    def test_append_then_slice(self):
+        first = self.frame(["1_1", "1_2"], 1, 3, "Lick")
+        second = self.frame(["2_1"], 2, 2, "Water on")
+        self.store.append(first, "I", "first.json")
+        self.store.append(second, "II", "second.json")
+        self.store.flush()
+
+        self.assertEqual(
+            self.store.index[["cohort", "mouse_id", "session_id", "start", "stop"]]
+            .values.tolist(),
+            [["I", "1_1", 1, 0, 3], ["I", "1_2", 1, 3, 6], ["II", "2_1", 2, 6, 8]],
+        )
+        session = self.store.session("1_2", 1)
+        self.assertEqual(session["trial"].tolist(), [3, 4, 5])
+        self.assertEqual(list(session["message"].cat.categories), ["Lick", "Water on"])
+        # Numeric columns are views of the memory maps
+        self.assertTrue(
+            np.shares_memory(
+                session["trial"].to_numpy(), self.store._memory_maps()["trial"]
+            )
+        )
+        with self.assertRaises(ValueError):
+            self.store.session("1_2", 2)
+
+        # The index is read back by another store
+        store = EventStore(self.store.store_dir)
+        pd.testing.assert_frame_equal(store.data(), self.store.data())
+        self.assertEqual(len(store.data()), 8)
+
+    def test_replace_session(self):
+        self.store.append(self.frame(["1_1"], 1, 3, "Lick"), "I", "first.json")
+        self.store.append(self.frame(["1_1"], 1, 2, "Lick"), "I", "first.json")
+        self.assertEqual(len(self.store.session("1_1", 1)), 2)
+        self.assertEqual(len(self.store.data()), 2)
+        self.store.remove("1_1", 1)
+        self.assertTrue(self.store.data().empty)
+
+    def test_widen_column(self):
+        """
+        Values that do not fit the type of a column widen it
+        """
+        self.store.append(self.frame(["1_1"], 1, 2, "Lick"), "I", "first.json")
+        wide = self.frame(["1_2"], 1, 2, "Lick")
+        wide["trial"] = np.array([0, 2**20], dtype=np.int64)
+        self.store.append(wide, "I", "second.json")
+        self.assertEqual(self.store.data()["trial"].tolist(), [0, 1, 0, 2**20])
+
+
+class AnalysisEventStoreTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.data_root = os.path.join(cls.tmp_dir, "data")
+        cls.files = write_synthetic_data_root(
+            cls.data_root, n_cohorts=2, n_pairs=1, n_sessions=2, n_trials=4
+        )
+        with contextlib.redirect_stdout(io.StringIO()):
+            cls.eager = Analysis(data_root=cls.data_root)
+            cls.stored = Analysis(
+                data_root=cls.data_root, store_dir=os.path.join(cls.tmp_dir, "store")
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir)
+
+    def test_data(self):
+        """
+        Event data read from the store matches the concatenated data
+        """
+        self.assertIsNone(self.stored._data)
+        pd.testing.assert_frame_equal(self.stored.data, self.eager.data)
+        pd.testing.assert_frame_equal(self.stored.df, self.eager.df)
+
+    def test_session_data(self):
+        self.assertEqual(len(self.stored.session_files), 8)
+        for mouse_id, session_id in self.stored.session_files:
+            pd.testing.assert_frame_equal(
+                self.stored.session_data(mouse_id, session_id),
+                self.eager.session_data(mouse_id, session_id),
+            )
+        index = self.stored.store.index
+        self.assertEqual(sorted(set(index["cohort"])), ["I", "II"])
+        self.assertEqual(set(index["full_file"]), set(self.files))
+
+    def test_refresh(self):
+        data_root = os.path.join(self.tmp_dir, "refresh")
+        shutil.copytree(self.data_root, data_root)
+        with contextlib.redirect_stdout(io.StringIO()):
+            eager = Analysis(data_root=data_root)
+            stored = Analysis(
+                data_root=data_root, store_dir=os.path.join(self.tmp_dir, "refresh_store")
+            )
+            full_files = sorted(stored.file_signatures)
+            os.remove(full_files[0])
+            with open(full_files[1], "a") as f:
+                f.write("\n")
+            eager.refresh()
+            stored.refresh()
+        pd.testing.assert_frame_equal(stored.data, eager.data)
+        self.assertEqual(len(stored.store.index), 6)
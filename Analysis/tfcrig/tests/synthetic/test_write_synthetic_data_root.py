@@ -0,0 +1,52 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from tfcrig.analysis import Analysis
+from tfcrig.helpers.tfcrig import is_base_data_file
+from tfcrig.synthetic import write_synthetic_data_root
+
+
+class WriteSyntheticDataRootTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.files = write_synthetic_data_root(
+            cls.tmp_dir.name, n_cohorts=2, n_pairs=2, n_sessions=2, n_trials=4
+        )
+        with contextlib.redirect_stdout(io.StringIO()):
+            cls.analysis = Analysis(data_root=cls.tmp_dir.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def test_layout(self):
+        self.assertEqual(len(self.files), 8)
+        for full_file in self.files:
+            self.assertTrue(is_base_data_file(os.path.basename(full_file)))
+        self.assertEqual(
+            sorted(os.listdir(self.tmp_dir.name)), ["II_cohort", "I_cohort"]
+        )
+
+    def test_files_are_analyzed(self):
+        """
+        Every session of every mouse parses without errors
+        """
+        self.assertEqual(self.analysis.file_errors, {})
+        self.assertEqual(len(self.analysis.df), 16)
+        self.assertEqual(
+            {str(t) for t in self.analysis.trial_df["trial_type"]}, {"-1", "1", "3"}
+        )
+
+    def test_reproducible(self):
+        with tempfile.TemporaryDirectory() as data_root:
+            files = write_synthetic_data_root(
+                data_root, n_cohorts=2, n_pairs=2, n_sessions=2, n_trials=4
+            )
+            for a, b in zip(self.files, files):
+                with open(a) as f, open(b) as g:
+                    self.assertEqual(f.read(), g.read())
@@ -2,6 +2,12 @@ SKETCH_PATH = "Software/Rig/Rig.ino"
 PARAMS_PATH = "Software/Rig/trial.h"
 START_STRING = "Session has started"
 
+# Messages printed by the rig that the acquisition scripts look for, the
+# full vocabulary is in `Analysis/tfcrig/events.py`
+END_STRING = "Session has ended"
+TRIAL_START_STRING = "Trial has started"
+LICK_STRING = "Lick"
+
 NO_TRAINING_NEGATIVE = 'no_training_CS-'
 TRAINING_POSITIVE = 'training_CS+'
 NO_TRAINING_POSITIVE = 'no_training_CS+'
@@ -4,7 +4,7 @@ from reportlab.lib.styles import getSampleStyleSheet
 import pandas as pd
 import matplotlib.pyplot as plt
 import io
-from .constants import START_STRING
+from .constants import LICK_STRING, START_STRING, TRIAL_START_STRING
 
 def simple_lick_plot(df):
     """
@@ -37,10 +37,10 @@ def count_licks(events):
     trial = 0
     for event in events:
         message = event['message']
-        if "Trial has started" in message:
+        if TRIAL_START_STRING in message:
             trial += 1
             lick_counts[trial] = 0
-        elif "Lick" in message:
+        elif LICK_STRING in message:
             lick_counts[trial] += 1
     return lick_counts
 
@@ -3,8 +3,9 @@ Python script to read data from Arduino serial ports and save it to a JSON file.
 
 This script reads data from Arduino serial ports and saves it to a JSON file.
 It takes command line arguments for mouse IDs and communication ports. The script continuously
-reads data from the serial ports and appends it to a data list. When a specific end session
-message is received, the script stops reading data, saves the data to a JSON file, and exits.
+reads data from the serial ports and streams it to a journal next to the JSON file. When a specific
+end session message is received, the script stops reading data, converts the journal to the JSON
+file, and exits. If the script is interrupted, the journal can be converted with `session_writer.py`.
 
 Usage:
     python py_arduino_serial.py -ids <mouse_ids> -p <primaryport> -s1 <secondaryport1>
@@ -14,13 +15,14 @@ Example:
 """
 
 import argparse
-import json
 import time
 from datetime import datetime
 from os.path import join
 
-import serial
+from constants import END_STRING
+from serial_comm import MultiPortReader, clock_anchor, record_session
 from serial_comm import SerialComm as sc
+from session_writer import SessionWriter
 
 
 def main():
@@ -65,72 +67,35 @@ def main():
     # Global variables
     current_date_time = datetime.now()
     formatted_date_time = current_date_time.strftime("%Y-%m-%d_%H-%M-%S")
-    end_session_message = "Session has ended"
-    session_ended = False  # Flag to indicate the end of the session
+    end_session_message = END_STRING
     file_name = "_".join(mouse_ids) + f"_{formatted_date_time}.json"
 
-    data_list = {mouse_id: [] for mouse_id in mouse_ids}
-
     header = {
         "mouse_ids": mouse_ids,
         "primary_port": args.primaryport,
         "secondary_port": args.secondaryport1,
         "mouse_port_assignment": dict(zip(mouse_ids, ports)),
         "Start_time": formatted_date_time,
+        # Converts the `perf_counter_ns` of each event to an absolute time
+        "clock_anchor": clock_anchor(),
     }
+    # Events are streamed to disk as they arrive
+    writer = SessionWriter(join("data", file_name), header)
+
     # Initialize serial communication
     comms = {mouse_id: sc(port, 9600) for mouse_id, port in zip(mouse_ids, ports)}
     time.sleep(2)
 
-    try:
-        while True:
-            for mouse_id, comm in comms.items():
-                data = comm.read()
-                if data is not None and "error" not in data:
-                    print(f"{mouse_id}: {data}")
-                    data_json = {
-                        "message": data,
-                        "mouse_id": mouse_id,
-                        "port": comm.port,
-                        "absolute_time": datetime.now().strftime(
-                            "%Y-%m-%d_%H-%M-%S.%f"
-                        ),
-                    }
-                    data_list[mouse_id].append(data_json)
-                    if end_session_message in data_json.get("message", ""):
-                        end_message = {
-                            "message": data,
-                            "absolute_time": datetime.now().strftime(
-                                "%Y-%m-%d_%H-%M-%S.%f"
-                            ),
-                        }
-                        # adding the end session message to all the mice
-                        for mouse_data in data_list.values():
-                            mouse_data.append(end_message)
-                        print("Session has ended, closing file and exiting...")
-                        session_ended = True
-                        break
-                elif data is not None and "error" in data:
-                    print(f"Non-JSON data: {data}")
-            if session_ended:
-                for comm in comms.values():
-                    comm.close()
-                break  # Exit the while loop
-
-    except serial.SerialException as e:
-        print(f"Serial port error: {e}")
-    except KeyboardInterrupt:
-        keyboard_interrupt = {
-            "message": "KeyboardInterrupt",
-            "absolute_time": datetime.now().strftime("%Y-%m-%d_%H-%M-%S.%f"),
-        }
-        for mouse_data in data_list.values():
-            mouse_data.append(keyboard_interrupt)
-        print("KeyboardInterrupt detected. Saving data to file...")
-
-    with open(join("data", file_name), "w", encoding="utf-8") as f:
-        json.dump({"header": header, "data": data_list}, f, indent=4)
-        print(f"Data saved to {file_name}")
+    # One reader thread per port, so that `record_session` waits on lines
+    # instead of polling the ports
+    reader = MultiPortReader(comms)
+    reader.start()
+    record_session(reader, comms, writer, end_session_message)
+    for comm in comms.values():
+        comm.close()
+
+    writer.close()
+    print(f"Data saved to {file_name}")
     # Time for cleaning up
     time.sleep(2)
 
@@ -3,8 +3,9 @@ Python script to read data from Arduino serial ports and save it to a JSON file.
 
 This script reads data from Arduino serial ports and saves it to a JSON file.
 It takes command line arguments for mouse IDs and communication ports. The script continuously
-reads data from the serial ports and appends it to a data list. When a specific end session
-message is received, the script stops reading data, saves the data to a JSON file, and exits.
+reads data from the serial ports and streams it to a journal next to the JSON file. When a specific
+end session message is received, the script stops reading data, converts the journal to the JSON
+file, and exits. If the script is interrupted, the journal can be converted with `session_writer.py`.
 
 Usage:
     python -m Software.Serial_read.py_arduino_serial_camera -ids <mouse_ids>
@@ -17,21 +18,22 @@ Example:
 """
 
 import argparse
-import json
 import logging
 import time
 from datetime import datetime
 from os.path import join
 from pathlib import Path
 
-import serial
 import urllib3
 import sys
 
 from ..camera_control import camera_class as cc
+from .serial_comm import MultiPortReader, clock_anchor, record_session
 from .serial_comm import SerialComm as sc
 from .serial_comm import VisualEnhancemnets as ve
+from .session_writer import SessionWriter
 from .generate_pdf import generate_pdf
+from .constants import END_STRING
 
 # (optional) Disable the "insecure requests" warning for https certs
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -96,13 +98,10 @@ def main():
     data_path = script_path / "data"
     current_date_time = datetime.now()
     formatted_date_time = current_date_time.strftime("%Y-%m-%d_%H-%M-%S")
-    end_session_message = "Session has ended"
-    session_ended = False  # Flag to indicate the end of the session
+    end_session_message = END_STRING
     file_name = "_".join(mouse_ids) + f"_{formatted_date_time}.json"
     file_path = data_path / file_name
 
-    data_list = {mouse_id: [] for mouse_id in mouse_ids}
-
     # Camera setup:
     if args.camera1 is not None:
         cam1 = cc.e3VisionCamera(args.camera1)
@@ -139,86 +138,43 @@ def main():
         "secondary_port": args.secondaryport1,
         "mouse_port_assignment": dict(zip(mouse_ids, ports)),
         "Start_time": formatted_date_time,
+        # Converts the `perf_counter_ns` of each event to an absolute time
+        "clock_anchor": clock_anchor(),
     }
     if args.camera1 is not None:
         header["camera1"] = cam1.camera_serial
     if args.camera2 is not None:
         header["camera2"] = cam2.camera_serial
 
+    # Events are streamed to disk as they arrive
+    writer = SessionWriter(file_path, header)
+
     # Initialize serial communication
     comms = {mouse_id: sc(port, 9600) for mouse_id, port in zip(mouse_ids, ports)}
     ve.progress_bar(10)
 
-    try:
-        if args.camera1 is not None:
-            cam1.camera_action("RECORDGROUP", SerialGroup=serial_numbers)
-        while True:
-            for mouse_id, comm in comms.items():
-                data = comm.read()
-                if data is not None and "error" not in data:
-                    print(f"{mouse_id}: {data}")
-                    data_json = {
-                        "message": data,
-                        "mouse_id": mouse_id,
-                        "port": comm.port,
-                        "absolute_time": datetime.now().strftime(
-                            "%Y-%m-%d_%H-%M-%S.%f"
-                        ),
-                    }
-                    data_list[mouse_id].append(data_json)
-                    if end_session_message in data_json.get("message", ""):
-                        end_message = {
-                            "message": data,
-                            "absolute_time": datetime.now().strftime(
-                                "%Y-%m-%d_%H-%M-%S.%f"
-                            ),
-                        }
-                        # adding the end session message to all the mice
-                        for mouse_data in data_list.values():
-                            mouse_data.append(end_message)
-                        print("Session has ended, closing file and exiting...")
-                        session_ended = True
-                        break
-                elif data is not None and "error" in data:
-                    print(f"Non-JSON data: {data}")
-                sys.stdout.flush()
-            if session_ended:
-                for comm in comms.values():
-                    comm.close()
-                if args.camera1 is not None:
-                    cam1.camera_action("STOPRECORDGROUP", SerialGroup=serial_numbers)
-                    cam1.camera_action("DISCONNECT")
-                    if args.camera2 is not None:
-                        cam2.camera_action("DISCONNECT")
-                break  # Exit the while loop
-        time.sleep(2)
-
-    except serial.SerialException as e:
-        print(f"Serial port error: {e}")
-        sys.stdout.flush()
-    except KeyboardInterrupt:
-        keyboard_interrupt = {
-            "message": "KeyboardInterrupt",
-            "absolute_time": datetime.now().strftime("%Y-%m-%d_%H-%M-%S.%f"),
-        }
-        for mouse_data in data_list.values():
-            mouse_data.append(keyboard_interrupt)
-        print("KeyboardInterrupt detected. Saving data to file...")
-        sys.stdout.flush()
-        for comm in comms.values():
-            comm.close()
-        print("Closing serial ports and stopping camera recording...")
-        sys.stdout.flush()
-        if args.camera1 is not None:
-            cam1.camera_action("STOPRECORDGROUP", SerialGroup=serial_numbers)
-            cam1.camera_action("DISCONNECT")
-            if args.camera2 is not None:
-                cam2.camera_action("DISCONNECT")
-
-    generate_pdf(file_path, header, data_list)
-    with file_path.open("w", encoding="utf-8") as f:
-        json.dump({"header": header, "data": data_list}, f, indent=4)
-        print(f"Data saved to {file_path}")
+    # One reader thread per port, so that `record_session` waits on lines
+    # instead of polling the ports
+    reader = MultiPortReader(comms)
+    reader.start()
+
+    if args.camera1 is not None:
+        cam1.camera_action("RECORDGROUP", SerialGroup=serial_numbers)
+    session_ended = record_session(reader, comms, writer, end_session_message)
+    print("Closing serial ports and stopping camera recording...")
+    sys.stdout.flush()
+    for comm in comms.values():
+        comm.close()
+    if session_ended and args.camera1 is not None:
+        cam1.camera_action("STOPRECORDGROUP", SerialGroup=serial_numbers)
+        cam1.camera_action("DISCONNECT")
+        if args.camera2 is not None:
+            cam2.camera_action("DISCONNECT")
+    time.sleep(2)
+
+    generate_pdf(file_path, header, writer.data())
+    writer.close()
+    print(f"Data saved to {file_path}")
     # Time for cleaning up
     time.sleep(2)
 
@@ -0,0 +1,380 @@
+"""
+Virtual Arduino rigs, for exercising the acquisition code without boards.
+
+A `RigSimulator` writes the lines of a session, following the `Rig.ino`
+message grammar `trial: session_ms: trial_ms: message`, to a pseudo-terminal
+(or to any writable serial object, e.g. one opened with
+`serial.serial_for_url("loop://")`), at real time or at an accelerated rate.
+Sessions are either replayed from a recorded session JSON file or synthesised
+with configurable lick bursts.
+
+Run as a script to benchmark acquisition throughput and latency of
+`MultiPortReader` and `SessionWriter` on a machine with no hardware.
+
+Usage:
+    python rig_simulator.py [-m <mice>] [--speed <factor>] [--replay <session file>]
+
+Example:
+    python rig_simulator.py -m 2 --speed 50 --trials 10
+    python rig_simulator.py --replay data/117_3_117_5_2025-03-23_21-26-51.json --speed 100
+
+The pseudo-terminal of each simulated rig can also be passed as a port to
+`py_arduino_serial.py`, see `--serve`.
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+from serial_comm import MultiPortReader, clock_anchor
+from serial_comm import SerialComm as sc
+from session_writer import SessionWriter
+
+MSG_DELIMITER = ": "
+
+POSITIVE_TRIAL_TYPES = [1, 2]
+"""
+Trial types playing the positive signal, see `TRIAL_CLASSES`
+"""
+NEGATIVE_TRIAL_TYPES = [0, 3]
+"""
+Trial types playing the negative signal, see `TRIAL_CLASSES`
+"""
+
+
+def format_line(trial, session_ms, trial_ms, message):
+    """
+    Formats a line as printed by `print` in `Rig.ino`.
+    """
+    return MSG_DELIMITER.join([str(trial), str(session_ms), str(trial_ms), message])
+
+
+def replay_session(file_path, mouse_id=None):
+    """
+    Reads the lines a rig printed during a recorded session.
+
+    Args:
+    file_path (str): A session JSON file.
+    mouse_id (str): The mouse to replay, by default the first in the file.
+
+    Returns:
+    list: `(session_ms, line)` tuples. Lines without a session time, e.g.
+    partial lines at the start of a session, take the time of the line
+    before them.
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        session = json.load(f)
+    if mouse_id is None:
+        mouse_id = session["header"]["mouse_ids"][0]
+
+    lines = []
+    session_ms = 0
+    for event in session["data"][mouse_id]:
+        if "mouse_id" not in event:
+            # Messages added to every mouse by `py_arduino_serial`
+            continue
+        line = event["message"]
+        parts = line.split(MSG_DELIMITER)
+        if len(parts) >= 4 and parts[1].isdigit():
+            session_ms = max(session_ms, int(parts[1]))
+        lines.append((session_ms, line))
+    return lines
+
+
+def synthesize_session(
+    n_trials=20,
+    trial_types=None,
+    trial_duration=50000,
+    inter_trial_interval=(15000, 25000),
+    lick_bursts_per_trial=3,
+    lick_burst_duration=3000,
+    lick_interval=100,
+    seed=None,
+):
+    """
+    Synthesises the lines of a session, with the timing of the default
+    `trial.h` parameters.
+
+    Args:
+    n_trials (int): The number of trials.
+    trial_types (str): One trial type digit per trial, alternating CS+ and
+        CS- by default.
+    trial_duration (int): Milliseconds per trial.
+    inter_trial_interval (tuple): Range of the random inter-trial interval, ms.
+    lick_bursts_per_trial (int): Bursts of licks per trial, at random times.
+    lick_burst_duration (int): Milliseconds per lick burst.
+    lick_interval (int): Milliseconds between licks within a burst.
+    seed (int): Seed for a reproducible session.
+
+    Returns:
+    list: `(session_ms, line)` tuples, in order.
+    """
+    rng = random.Random(seed)
+    if trial_types is None:
+        trial_types = "13" * (n_trials // 2) + "1" * (n_trials % 2)
+    lines = []
+
+    def add(trial, session_ms, trial_ms, message):
+        lines.append((session_ms, format_line(trial, session_ms, trial_ms, message)))
+
+    t = 5000
+    for _ in range(5):
+        add(0, t, 0, "Waiting for session to start...")
+        t += 1000
+    add(0, t, 0, f"NUMBER_OF_TRIALS: {n_trials}")
+    add(0, t, 0, f"trialTypesChar: {trial_types}")
+    add(0, t, 0, f"TRIAL_DURATION: {trial_duration}")
+    add(0, t, 0, "Session has started")
+
+    for trial, trial_type in enumerate(trial_types[:n_trials]):
+        trial_type = int(trial_type)
+        trial_start = t
+        events = [
+            (0, "Trial has started"),
+            (0, "Printing trial parameters"),
+            (0, f"currentTrialType: {trial_type}"),
+        ]
+        if trial_type in POSITIVE_TRIAL_TYPES:
+            events += [(15000, "Positive signal start"), (35000, "Positive signal stop")]
+            for puff in range(5):
+                events += [
+                    (45000 + 1000 * puff, "Puff start"),
+                    (45200 + 1000 * puff, "Puff stop"),
+                ]
+        elif trial_type in NEGATIVE_TRIAL_TYPES:
+            for pulse in range(15000, 35000, 2000):
+                events += [
+                    (pulse, "Negative signal start"),
+                    (pulse + 1000, "Negative signal stop"),
+                ]
+        for _ in range(lick_bursts_per_trial):
+            burst_start = rng.randrange(0, trial_duration - lick_burst_duration)
+            for lick in range(burst_start, burst_start + lick_burst_duration, lick_interval):
+                events.append((lick + rng.randrange(0, lick_interval // 4 + 1), "Lick"))
+        events.append((trial_duration, "Trial has ended"))
+        events.append((trial_duration, "Cleaning up last trial"))
+
+        for trial_ms, message in sorted(events, key=lambda e: e[0]):
+            add(trial, trial_start + trial_ms, trial_ms, message)
+
+        t = trial_start + trial_duration
+        interval = rng.randrange(*inter_trial_interval)
+        add(trial + 1, t, 0, f"Waiting the inter-trial interval: {interval}")
+        add(trial + 1, t, 0, "Starting the inter-trial interval")
+        t += interval
+        add(trial + 1, t, 0, "The inter-trial interval has ended")
+
+    add(n_trials, t, 0, "Session has ended")
+    return lines
+
+
+class RigSimulator:
+    """
+    Writes the lines of a session as a rig would, in a background thread.
+
+    Attributes:
+    lines (list): `(session_ms, line)` tuples, as returned by `replay_session`
+        or `synthesize_session`.
+    speed (float): How many times faster than real time lines are written.
+    sent_ns (list): `time.perf_counter_ns()` when each line was written.
+    """
+
+    def __init__(self, lines, speed=1.0):
+        self.lines = lines
+        self.speed = speed
+        self.sent_ns = []
+        self._thread = None
+        self._master_fd = None
+
+    def open_pty(self):
+        """
+        Opens a pseudo-terminal pair for the rig to write to.
+
+        Returns:
+        str: The port name to read the rig from, e.g. with `SerialComm`.
+        """
+        import pty
+
+        self._master_fd, slave_fd = pty.openpty()
+        port = os.ttyname(slave_fd)
+        # The slave stays open so that the terminal outlives its readers
+        self._slave_fd = slave_fd
+        return port
+
+    def start(self, write=None):
+        """
+        Starts writing lines, to the pseudo-terminal by default.
+
+        Args:
+        write (callable): Writes bytes, e.g. the `write` of a serial object.
+        """
+        if write is None:
+            master_fd = self._master_fd
+            write = lambda data: os.write(master_fd, data)
+        self._thread = threading.Thread(target=self.run, args=(write,), daemon=True)
+        self._thread.start()
+
+    def join(self):
+        self._thread.join()
+
+    def run(self, write):
+        """
+        Writes every line at its session time, scaled by `speed`.
+        """
+        if not self.lines:
+            return
+        start_ns = time.perf_counter_ns()
+        first_ms = self.lines[0][0]
+        for session_ms, line in self.lines:
+            due_ns = start_ns + int((session_ms - first_ms) * 1e6 / self.speed)
+            delay_ns = due_ns - time.perf_counter_ns()
+            if delay_ns > 0:
+                time.sleep(delay_ns / 1e9)
+            self.sent_ns.append(time.perf_counter_ns())
+            write((line + "\r\n").encode("utf-8"))
+
+    def close(self):
+        for fd in (self._master_fd, getattr(self, "_slave_fd", None)):
+            if fd is not None:
+                os.close(fd)
+        self._master_fd = None
+        self._slave_fd = None
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def benchmark(simulators, data_dir):
+    """
+    Reads simulated rigs with `MultiPortReader` and streams them with
+    `SessionWriter`, as `py_arduino_serial` does.
+
+    Returns:
+    dict: Throughput, latency from write to arrival, and CPU time.
+    """
+    mouse_ids = [f"sim_{i}" for i in range(len(simulators))]
+    ports = [simulator.open_pty() for simulator in simulators]
+    comms = {mouse_id: sc(port, 9600) for mouse_id, port in zip(mouse_ids, ports)}
+    for comm in comms.values():
+        comm.ser.timeout = 1
+    header = {
+        "mouse_ids": mouse_ids,
+        "mouse_port_assignment": dict(zip(mouse_ids, ports)),
+        "clock_anchor": clock_anchor(),
+    }
+    writer = SessionWriter(
+        os.path.join(data_dir, "_".join(mouse_ids) + "_simulated.json"), header
+    )
+
+    arrival_ns = {mouse_id: [] for mouse_id in mouse_ids}
+    n_lines = sum(len(simulator.lines) for simulator in simulators)
+    reader = MultiPortReader(comms)
+    reader.start()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for simulator in simulators:
+        simulator.start()
+    n_read = 0
+    while n_read < n_lines:
+        line = reader.read(timeout=5)
+        if line is None:
+            print(f"Timed out after {n_read} of {n_lines} lines")
+            break
+        mouse_id, data, arrival_time, ns = line
+        arrival_ns[mouse_id].append(ns)
+        writer.write(
+            mouse_id,
+            {
+                "message": data,
+                "mouse_id": mouse_id,
+                "port": comms[mouse_id].port,
+                "absolute_time": arrival_time.strftime("%Y-%m-%d_%H-%M-%S.%f"),
+                "perf_counter_ns": ns,
+            },
+        )
+        n_read += 1
+    wall_time = time.perf_counter() - wall_start
+    cpu_time = time.process_time() - cpu_start
+    reader.stop()
+    for comm in comms.values():
+        comm.close()
+    writer.close()
+    for simulator in simulators:
+        simulator.join()
+        simulator.close()
+
+    latencies_ms = [
+        (arrived - sent) / 1e6
+        for mouse_id, simulator in zip(mouse_ids, simulators)
+        for sent, arrived in zip(simulator.sent_ns, arrival_ns[mouse_id])
+    ]
+    return {
+        "lines": n_read,
+        "wall_s": wall_time,
+        "lines_per_s": n_read / wall_time,
+        "cpu_s": cpu_time,
+        "latency_ms_p50": _percentile(latencies_ms, 0.5),
+        "latency_ms_p99": _percentile(latencies_ms, 0.99),
+        "latency_ms_max": max(latencies_ms),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-m", "--mice", type=int, default=2, help="number of simulated rigs")
+    ap.add_argument("--speed", type=float, default=1.0, help="speed-up over real time")
+    ap.add_argument("--replay", help="session JSON file to replay instead of synthesising")
+    ap.add_argument("--trials", type=int, default=20, help="trials per synthesised session")
+    ap.add_argument("--lick-bursts", type=int, default=3, help="lick bursts per trial")
+    ap.add_argument("--lick-interval", type=int, default=100, help="ms between licks in a burst")
+    ap.add_argument(
+        "--serve",
+        action="store_true",
+        help="only print the ports of the rigs and write to them, e.g. for py_arduino_serial.py",
+    )
+    args = ap.parse_args()
+
+    if args.replay:
+        with open(args.replay, "r", encoding="utf-8") as f:
+            mouse_ids = json.load(f)["header"]["mouse_ids"]
+        sessions = [
+            replay_session(args.replay, mouse_ids[i % len(mouse_ids)])
+            for i in range(args.mice)
+        ]
+    else:
+        sessions = [
+            synthesize_session(
+                n_trials=args.trials,
+                lick_bursts_per_trial=args.lick_bursts,
+                lick_interval=args.lick_interval,
+                seed=i,
+            )
+            for i in range(args.mice)
+        ]
+    simulators = [RigSimulator(lines, speed=args.speed) for lines in sessions]
+
+    if args.serve:
+        ports = [simulator.open_pty() for simulator in simulators]
+        print(f"Serving simulated rigs on: {','.join(ports)}")
+        input("Press enter to start the sessions...")
+        for simulator in simulators:
+            simulator.start()
+        for simulator in simulators:
+            simulator.join()
+        input("Sessions have ended, press enter to close the ports...")
+        return
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        results = benchmark(simulators, data_dir)
+    for key, value in results.items():
+        print(f"{key}: {value:.3f}" if isinstance(value, float) else f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
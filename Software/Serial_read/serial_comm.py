@@ -2,18 +2,41 @@
 maintainer: @gergelyturi"""
 import json
 import logging
+import queue
+import threading
 import time
+from datetime import datetime
 
 import serial
 from tqdm import tqdm
 
 
+ABSOLUTE_TIME_FORMAT = "%Y-%m-%d_%H-%M-%S.%f"
+
+
+def clock_anchor():
+    """
+    Pairs the monotonic clock used to timestamp lines with the wall clock,
+    so that `perf_counter_ns` values can be converted to absolute times.
+
+    Returns:
+    dict: A `perf_counter_ns` value and the `absolute_time` it corresponds to.
+    """
+    before_ns = time.perf_counter_ns()
+    now = datetime.now()
+    after_ns = time.perf_counter_ns()
+    return {
+        "perf_counter_ns": (before_ns + after_ns) // 2,
+        "absolute_time": now.strftime(ABSOLUTE_TIME_FORMAT),
+    }
+
+
 class SerialComm:
     """
     A class for serial communication.
 
     Attributes:
-    port (str): The port to connect to.
+    port (str): The port or pySerial URL to connect to.
     baudrate (int): The baudrate to use for the connection.
     ser (serial.Serial): The serial connection object.
     """
@@ -21,8 +44,12 @@ class SerialComm:
     def __init__(self, port, baudrate):
         self.port = port
         self.baudrate = baudrate
-        self.ser = serial.Serial(port, baudrate, timeout=10)
+        # Besides port names, URLs such as "loop://" are accepted, which is
+        # useful for testing without a board
+        self.ser = serial.serial_for_url(port, baudrate, timeout=10)
         self.ser.flush()
+        # `time.perf_counter_ns()` when the last line was read
+        self.last_read_ns = None
 
     def __enter__(self):
         """
@@ -47,7 +74,9 @@ class SerialComm:
         str: The line read from the serial connection.
         """
         if self.ser.in_waiting > 0:
-            line = self.ser.readline().decode("utf-8").rstrip()
+            line = self.ser.readline()
+            self.last_read_ns = time.perf_counter_ns()
+            line = line.decode("utf-8").rstrip()
             # print(line)
             return line
         else:
@@ -121,6 +150,189 @@ class SerialComm:
                     return True
 
 
+class MultiPortReader:
+    """
+    Reads lines from several serial connections, with one thread per port
+    blocking on `readline` and feeding a shared queue. Nothing spins while
+    the ports are idle, and each line is timestamped as soon as it arrives,
+    both with `time.perf_counter_ns()`, which is monotonic and shared by all
+    ports, and with the wall clock.
+
+    Attributes:
+    comms (dict): The `SerialComm` connection of each mouse ID.
+    lines (queue.Queue): `(mouse_id, line, arrival_time, arrival_ns)` tuples, in order of arrival.
+    """
+
+    def __init__(self, comms):
+        self.comms = comms
+        self.lines = queue.Queue()
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(
+                target=self._read_port, args=(mouse_id, comm), daemon=True
+            )
+            for mouse_id, comm in comms.items()
+        ]
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, _exc_type, _exc_value, _traceback):
+        self.stop()
+
+    def start(self):
+        """
+        Starts a reader thread for each port.
+        """
+        for thread in self._threads:
+            thread.start()
+
+    def read(self, timeout=0.5):
+        """
+        Waits for the next line from any port. The wait is bounded so that
+        a KeyboardInterrupt is handled promptly, also on Windows.
+
+        Args:
+        timeout (float): Seconds to wait for a line.
+
+        Returns:
+        tuple: `(mouse_id, line, arrival_time, arrival_ns)`, or None if no line arrived.
+        """
+        try:
+            mouse_id, line, arrival_time, arrival_ns = self.lines.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if isinstance(line, Exception):
+            # Errors of a reader thread are raised in the reading thread
+            raise line
+        return mouse_id, line, arrival_time, arrival_ns
+
+    def stop(self, timeout=1.0):
+        """
+        Stops the reader threads, without closing the serial connections.
+        Blocked reads are cancelled where the port supports it. Otherwise a
+        thread is waited for at most `timeout` seconds, and is left to end
+        once its read times out; a line it reads after that is not drained.
+
+        Args:
+        timeout (float): Seconds to wait for each reader thread.
+        """
+        self._stop.set()
+        for comm in self.comms.values():
+            if hasattr(comm.ser, "cancel_read"):
+                comm.ser.cancel_read()
+        for thread in self._threads:
+            if thread.is_alive():
+                thread.join(timeout=timeout)
+
+    def drain(self):
+        """
+        Takes the lines still in the queue without waiting, e.g. once the
+        reader is stopped. Errors of the reader threads are printed.
+
+        Returns:
+        list: `(mouse_id, line, arrival_time, arrival_ns)` tuples, in order of arrival.
+        """
+        lines = []
+        while True:
+            try:
+                mouse_id, line, arrival_time, arrival_ns = self.lines.get_nowait()
+            except queue.Empty:
+                return lines
+            if isinstance(line, Exception):
+                print(f"Error reading {mouse_id}: {line}")
+                continue
+            lines.append((mouse_id, line, arrival_time, arrival_ns))
+
+    def _read_port(self, mouse_id, comm):
+        while not self._stop.is_set():
+            try:
+                line = comm.ser.readline()
+            except Exception as e:
+                if not self._stop.is_set():
+                    self.lines.put((mouse_id, e, None, None))
+                return
+            if not line:
+                # The read timed out or was cancelled
+                continue
+            arrival_ns = time.perf_counter_ns()
+            arrival_time = datetime.now()
+            line = line.decode("utf-8", errors="replace").rstrip()
+            self.lines.put((mouse_id, line, arrival_time, arrival_ns))
+
+
+def _timestamp():
+    return {
+        "absolute_time": datetime.now().strftime(ABSOLUTE_TIME_FORMAT),
+        "perf_counter_ns": time.perf_counter_ns(),
+    }
+
+
+def _write_line(writer, comms, line):
+    """
+    Writes a line read from a port to the data of its mouse.
+
+    Returns:
+    bool: Whether the line was written.
+    """
+    mouse_id, data, arrival_time, arrival_ns = line
+    if "error" in data:
+        print(f"Non-JSON data: {data}", flush=True)
+        return False
+    print(f"{mouse_id}: {data}", flush=True)
+    writer.write(
+        mouse_id,
+        {
+            "message": data,
+            "mouse_id": mouse_id,
+            "port": comms[mouse_id].port,
+            "absolute_time": arrival_time.strftime(ABSOLUTE_TIME_FORMAT),
+            "perf_counter_ns": arrival_ns,
+        },
+    )
+    return True
+
+
+def record_session(reader, comms, writer, end_session_message):
+    """
+    Writes the lines read from every port until one of them ends the
+    session, the recording is interrupted, or a port fails. The reader is
+    then stopped, and the lines still in its queue are written before the
+    closing event is written to every mouse.
+
+    Args:
+    reader (MultiPortReader): The started reader of the ports.
+    comms (dict): The `SerialComm` connection of each mouse ID.
+    writer (SessionWriter): The writer of the session.
+    end_session_message (str): The message that ends the session.
+
+    Returns:
+    bool: Whether the session ended or was interrupted, rather than a port failing.
+    """
+    end_message = None
+    try:
+        while end_message is None:
+            line = reader.read()
+            if line is not None and _write_line(writer, comms, line):
+                if end_session_message in line[1]:
+                    end_message = {"message": line[1]}
+                    print("Session has ended, closing file and exiting...")
+    except serial.SerialException as e:
+        print(f"Serial port error: {e}", flush=True)
+    except KeyboardInterrupt:
+        end_message = {"message": "KeyboardInterrupt"}
+        print("KeyboardInterrupt detected. Saving data to file...", flush=True)
+
+    reader.stop()
+    for line in reader.drain():
+        _write_line(writer, comms, line)
+    if end_message is not None:
+        # adding the end session message to all the mice
+        writer.write_all({**end_message, **_timestamp()})
+    return end_message is not None
+
+
 class VisualEnhancemnets:
     @staticmethod
     def progress_bar(seconds):
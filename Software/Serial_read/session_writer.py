@@ -0,0 +1,335 @@
+"""Module for writing session data to disk while a session is recorded.
+
+Events are appended to a journal, one JSON line each, as they arrive.
+When the session is closed the journal is converted to the session
+file format used by the analysis,
+`{"header": ..., "data": {mouse_id: [...]}}`, and removed. A compact
+columnar sidecar of the session file is written next to it, see
+`write_sidecar`. If the recording is interrupted the journal is left on
+disk, and can be converted later with:
+
+    python session_writer.py <journal_file>
+
+maintainer: @gergelyturi"""
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+JOURNAL_SUFFIX = "_journal.jsonl"
+
+SIDECAR_VERSION = 2
+"""
+Bump this whenever the layout of sidecars changes, here and in
+`Analysis/tfcrig/sidecar.py`. Both must write the same sidecar, see
+`Analysis/tfcrig/tests/sidecar/test_acquisition_sidecar.py`
+"""
+
+SIDECAR_SUFFIX = ".npz"
+
+ABSOLUTE_TIME_FORMAT = "%Y-%m-%d_%H-%M-%S.%f"
+
+EPOCH = datetime(1970, 1, 1)
+
+INT32 = np.iinfo(np.int32)
+
+
+def journal_path(file_path):
+    """
+    Returns the path of the journal kept while recording `file_path`.
+    The name does not end in `.json`, so that a journal is never
+    mistaken for a session file.
+    """
+    file_path = str(file_path)
+    if file_path.endswith(".json"):
+        file_path = file_path[: -len(".json")]
+    return file_path + JOURNAL_SUFFIX
+
+
+class SessionWriter:
+    """
+    A class for streaming session data to disk.
+
+    Attributes:
+    file_path (str): The session file written when the writer is closed.
+    journal_path (str): The journal events are appended to while recording.
+    fsync_interval (float): Seconds between forcing the journal to disk.
+    """
+
+    def __init__(self, file_path, header, fsync_interval=1.0):
+        self.file_path = str(file_path)
+        self.journal_path = journal_path(file_path)
+        self.fsync_interval = fsync_interval
+        self.journal = open(self.journal_path, "w", encoding="utf-8")
+        self._last_fsync = time.monotonic()
+        self._write_line({"header": header})
+        self._sync()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, _exc_type, _exc_value, _traceback):
+        self.close()
+
+    def write(self, mouse_id, event):
+        """
+        Appends an event to the data of one mouse.
+
+        Args:
+        mouse_id (str): The mouse the event belongs to.
+        event (dict): The event, e.g. a message and its absolute time.
+        """
+        self._write_line({"mouse_id": mouse_id, "event": event})
+
+    def write_all(self, event):
+        """
+        Appends an event to the data of every mouse, e.g. the end of the
+        session.
+
+        Args:
+        event (dict): The event to append.
+        """
+        self._write_line({"mouse_id": None, "event": event})
+
+    def data(self):
+        """
+        Reads back the events written so far.
+
+        Returns:
+        dict: The events of each mouse, as in the session file.
+        """
+        self.journal.flush()
+        _, data = read_journal(self.journal_path)
+        return data
+
+    def close(self):
+        """
+        Converts the journal to the session file and removes it.
+        """
+        if self.journal.closed:
+            return
+        self._sync()
+        self.journal.close()
+        convert_journal(self.journal_path, self.file_path)
+        try:
+            write_sidecar(self.journal_path, self.file_path)
+        except Exception as e:
+            # The session file is complete, the analysis reads it without
+            # a sidecar
+            print(f"Could not write the sidecar of {self.file_path}: {e}")
+        os.remove(self.journal_path)
+
+    def _write_line(self, record):
+        # Each line is handed to the OS as soon as it is written, and
+        # forced to disk at most every `fsync_interval` seconds
+        self.journal.write(json.dumps(record) + "\n")
+        self.journal.flush()
+        if time.monotonic() - self._last_fsync >= self.fsync_interval:
+            self._sync()
+
+    def _sync(self):
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+        self._last_fsync = time.monotonic()
+
+
+def _journal_records(journal_file):
+    """
+    Yields the records of a journal. A line cut short by a power loss
+    can only be the last one, and is skipped.
+    """
+    with open(journal_file, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Skipping incomplete journal line: {line!r}")
+
+
+def _events(journal_file, mouse_id):
+    for record in _journal_records(journal_file):
+        if "event" in record and record["mouse_id"] in (mouse_id, None):
+            yield record["event"]
+
+
+def read_journal(journal_file):
+    """
+    Reads a journal into memory.
+
+    Returns:
+    tuple: The header and the events of each mouse.
+    """
+    header = next(_journal_records(journal_file))["header"]
+    data = {
+        mouse_id: list(_events(journal_file, mouse_id))
+        for mouse_id in header["mouse_ids"]
+    }
+    return header, data
+
+
+def _indented(obj, level):
+    return json.dumps(obj, indent=4).replace("\n", "\n" + " " * level)
+
+
+def convert_journal(journal_file, file_path):
+    """
+    Writes the session file for a journal, one mouse at a time so that
+    the events are never all in memory. The result is the same as
+    `json.dump({"header": header, "data": data}, f, indent=4)`.
+    """
+    header = next(_journal_records(journal_file))["header"]
+    mouse_ids = header["mouse_ids"]
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write('{\n    "header": ' + _indented(header, 4) + ',\n    "data": ')
+        f.write("{" if mouse_ids else "{}")
+        for i, mouse_id in enumerate(mouse_ids):
+            f.write(("\n" if i == 0 else ",\n") + " " * 8 + json.dumps(mouse_id) + ": [")
+            n_events = 0
+            for event in _events(journal_file, mouse_id):
+                f.write(("\n" if n_events == 0 else ",\n") + " " * 12)
+                f.write(_indented(event, 12))
+                n_events += 1
+            f.write("\n" + " " * 8 + "]" if n_events else "]")
+        if mouse_ids:
+            f.write("\n    }")
+        f.write("\n}")
+    os.replace(tmp_path, file_path)
+
+
+def _int32(text):
+    """
+    The integer a string is the canonical form of, if it fits an int32.
+    """
+    try:
+        value = int(text)
+    except ValueError:
+        return None
+    if str(value) != text or not INT32.min <= value <= INT32.max:
+        return None
+    return value
+
+
+def _microseconds(absolute_time):
+    """
+    The microseconds since the epoch of an absolute time, if it is written
+    back exactly as it was read.
+    """
+    try:
+        date_time = datetime.strptime(absolute_time, ABSOLUTE_TIME_FORMAT)
+    except ValueError:
+        return None
+    if date_time.strftime(ABSOLUTE_TIME_FORMAT) != absolute_time:
+        return None
+    return (date_time - EPOCH) // timedelta(microseconds=1)
+
+
+def _sidecar_columns(events, mouse_id, messages):
+    """
+    The columns of the events of one mouse. Events written to every mouse
+    have no `mouse_id` and `port`, and are marked as `shared`. Events that
+    do not fit the columns are kept as their JSON text.
+    """
+    port = next(
+        (
+            event["port"]
+            for event in events
+            if isinstance(event, dict)
+            and event.get("mouse_id") == mouse_id
+            and isinstance(event.get("port"), str)
+        ),
+        None,
+    )
+    columns = {
+        key: []
+        for key in ("trial", "session_ms", "trial_ms", "message", "absolute_time", "shared")
+    }
+    raw_rows, raw = [], []
+    for i, event in enumerate(events):
+        row = None
+        if isinstance(event, dict):
+            message = event.get("message")
+            absolute_time = event.get("absolute_time")
+            is_shared = "mouse_id" not in event and "port" not in event
+            is_own = event.get("mouse_id") == mouse_id and event.get("port") == port
+            if (
+                isinstance(message, str)
+                and isinstance(absolute_time, str)
+                and (is_shared or is_own)
+            ):
+                parts = message.split(": ", 3)
+                values = [_int32(part) for part in parts[:3]]
+                microseconds = _microseconds(absolute_time)
+                if len(parts) == 4 and None not in values and microseconds is not None:
+                    code = messages.setdefault(parts[3], len(messages))
+                    row = (*values, code, microseconds, is_shared)
+        if row is None:
+            row = (0, 0, 0, -1, 0, False)
+            raw_rows.append(i)
+            raw.append(json.dumps(event))
+        for key, value in zip(columns, row):
+            columns[key].append(value)
+
+    arrays = {
+        key: np.array(columns[key], dtype=np.int32)
+        for key in ("trial", "session_ms", "trial_ms", "message")
+    }
+    arrays["absolute_time"] = np.array(columns["absolute_time"], dtype=np.int64)
+    arrays["shared"] = np.array(columns["shared"], dtype=bool)
+    arrays["raw_rows"] = np.array(raw_rows, dtype=np.int32)
+    arrays["raw"] = np.array(raw, dtype=str)
+    return port or "", arrays
+
+
+def write_sidecar(journal_file, file_path):
+    """
+    Writes the sidecar of the session file converted from a journal: the
+    events of each mouse as int32 `trial`, `session_ms`, `trial_ms` and
+    `message` code columns, with one dictionary of message texts, and
+    int64 microseconds since the epoch as `absolute_time`. The analysis
+    reads the sidecar instead of the session file while the session file
+    has the size and modification time it was written for, see
+    `Analysis/tfcrig/sidecar.py`.
+    """
+    header = next(_journal_records(journal_file))["header"]
+    file_stat = os.stat(file_path)
+    messages = {}
+    mouse_ids, ports, arrays = [], [], {}
+    for k, mouse_id in enumerate(header["mouse_ids"]):
+        port, columns = _sidecar_columns(
+            list(_events(journal_file, mouse_id)), mouse_id, messages
+        )
+        mouse_ids.append(mouse_id)
+        ports.append(port)
+        for key, values in columns.items():
+            arrays[f"mouse_{k}_{key}"] = values
+
+    sidecar_path = os.path.splitext(file_path)[0] + SIDECAR_SUFFIX
+    tmp_path = f"{sidecar_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(
+            f,
+            version=SIDECAR_VERSION,
+            json_size=file_stat.st_size,
+            json_mtime_ns=file_stat.st_mtime_ns,
+            header=json.dumps(header),
+            mouse_ids=np.array(mouse_ids, dtype=str),
+            ports=np.array(ports, dtype=str),
+            messages=np.array(list(messages), dtype=str),
+            **arrays,
+        )
+    os.replace(tmp_path, sidecar_path)
+    return sidecar_path
+
+
+if __name__ == "__main__":
+    for journal_file in sys.argv[1:]:
+        if not journal_file.endswith(JOURNAL_SUFFIX):
+            raise ValueError(f"Not a journal file: {journal_file}")
+        file_path = journal_file[: -len(JOURNAL_SUFFIX)] + ".json"
+        convert_journal(journal_file, file_path)
+        write_sidecar(journal_file, file_path)
+        print(f"Data saved to {file_path}")
@@ -0,0 +1,232 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import serial
+
+SERIAL_READ_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERIAL_READ_DIR)
+
+from serial_comm import MultiPortReader, SerialComm, record_session  # noqa: E402
+from session_writer import SessionWriter  # noqa: E402
+
+
+class MultiPortReaderTestCase(unittest.TestCase):
+    """
+    Each port is a `loop://` connection, so that lines written to it are
+    read back by the reader
+    """
+
+    def setUp(self):
+        self.comms = {
+            "117_3": SerialComm("loop://", 115200),
+            "117_5": SerialComm("loop://", 115200),
+        }
+        self.reader = MultiPortReader(self.comms)
+
+    def tearDown(self):
+        self.reader.stop()
+        for comm in self.comms.values():
+            comm.close()
+
+    def read_lines(self, n_lines):
+        lines = []
+        for _ in range(n_lines):
+            line = self.reader.read(timeout=5)
+            self.assertIsNotNone(line)
+            lines.append(line)
+        return lines
+
+    def test_read(self):
+        """
+        Lines of every port arrive with their mouse ID, in order per port,
+        timestamped with the wall clock and the monotonic clock on arrival
+        """
+        self.reader.start()
+        before_ns = time.perf_counter_ns()
+        for i in range(3):
+            self.comms["117_3"].write(f"1: {i}: {i}: Lick\n")
+            self.comms["117_5"].write(f"1: {i}: {i}: Lick\r\n")
+        lines = self.read_lines(6)
+
+        for mouse_id in self.comms:
+            self.assertEqual(
+                [line for m, line, _, _ in lines if m == mouse_id],
+                [f"1: {i}: {i}: Lick" for i in range(3)],
+            )
+        for _, _, arrival_time, arrival_ns in lines:
+            self.assertIsInstance(arrival_time, datetime)
+            self.assertGreaterEqual(arrival_ns, before_ns)
+
+    def test_read_timeout(self):
+        """
+        Without lines, reading returns None once the timeout passes
+        """
+        self.reader.start()
+        self.assertIsNone(self.reader.read(timeout=0.05))
+
+    def test_stop(self):
+        """
+        Stopping cancels the blocked reads promptly, and leaves the serial
+        connections open
+        """
+        with self.reader:
+            self.comms["117_3"].write("0: 0: 0: Session has started\n")
+            self.read_lines(1)
+            started = time.monotonic()
+        self.assertLess(time.monotonic() - started, 5)
+        for thread in self.reader._threads:
+            self.assertFalse(thread.is_alive())
+        for comm in self.comms.values():
+            self.assertTrue(comm.is_connected())
+
+        # Lines written after stopping are not read
+        self.comms["117_5"].write("0: 0: 0: Session has started\n")
+        self.assertIsNone(self.reader.read(timeout=0.05))
+
+    def test_stop_without_cancel_read(self):
+        """
+        A read that can not be cancelled is waited for at most `timeout`
+        """
+        release = threading.Event()
+        ser = mock.Mock(spec=["readline"])
+        ser.readline.side_effect = lambda: release.wait(5) and b""
+        reader = MultiPortReader({"117_3": mock.Mock(ser=ser)})
+        reader.start()
+        started = time.monotonic()
+        reader.stop(timeout=0.05)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertTrue(reader._threads[0].is_alive())
+        release.set()
+        reader._threads[0].join()
+
+    def test_drain(self):
+        """
+        Lines still queued are taken without waiting, and errors are
+        printed rather than raised
+        """
+        self.reader.start()
+        self.comms["117_3"].write("1: 0: 0: Lick\n1: 1: 1: Lick\n")
+        self.assertIsNotNone(self.reader.read(timeout=5))
+        deadline = time.monotonic() + 5
+        while self.reader.lines.qsize() < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.reader.stop()
+        self.reader.lines.put(("117_5", OSError("gone"), None, None))
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            lines = self.reader.drain()
+        self.assertEqual([line[:2] for line in lines], [("117_3", "1: 1: 1: Lick")])
+        self.assertIn("gone", output.getvalue())
+        self.assertEqual(self.reader.drain(), [])
+
+    def test_read_error(self):
+        """
+        An error of a reader thread is raised by `read`
+        """
+        with mock.patch.object(
+            self.comms["117_5"].ser,
+            "readline",
+            side_effect=serial.SerialException("device disconnected"),
+        ):
+            self.reader.start()
+            with self.assertRaisesRegex(serial.SerialException, "disconnected"):
+                self.reader.read(timeout=5)
+
+
+class RecordSessionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.comms = {
+            "117_3": SerialComm("loop://", 115200),
+            "117_5": SerialComm("loop://", 115200),
+        }
+        self.reader = MultiPortReader(self.comms)
+        self.writer = SessionWriter(
+            os.path.join(self.tmp_dir.name, "117_3_117_5_2025-03-23_21-26-51.json"),
+            {"mouse_ids": list(self.comms)},
+        )
+
+    def tearDown(self):
+        self.reader.stop()
+        for comm in self.comms.values():
+            comm.close()
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.writer.close()
+        self.tmp_dir.cleanup()
+
+    def queue(self, mouse_id, line):
+        self.reader.lines.put((mouse_id, line, datetime.now(), time.perf_counter_ns()))
+
+    def messages(self):
+        return {
+            mouse_id: [event["message"] for event in events]
+            for mouse_id, events in self.writer.data().items()
+        }
+
+    def test_lines_after_session_end(self):
+        """
+        Lines queued after the end of the session are written, before the
+        end of the session is written to every mouse
+        """
+        self.queue("117_3", "1: 10: 0: Lick")
+        self.queue("117_3", "2: 30: 0: Session has ended")
+        self.queue("117_5", "1: 31: 1: Lick")
+        self.queue("117_5", "2: 32: 2: Session has ended")
+        with contextlib.redirect_stdout(io.StringIO()):
+            ended = record_session(
+                self.reader, self.comms, self.writer, "Session has ended"
+            )
+        self.assertTrue(ended)
+        self.assertEqual(
+            self.messages(),
+            {
+                "117_3": [
+                    "1: 10: 0: Lick",
+                    "2: 30: 0: Session has ended",
+                    "2: 30: 0: Session has ended",
+                ],
+                "117_5": [
+                    "1: 31: 1: Lick",
+                    "2: 32: 2: Session has ended",
+                    "2: 30: 0: Session has ended",
+                ],
+            },
+        )
+        # Only the end of the session written to every mouse has no port
+        shared = self.writer.data()["117_5"][-1]
+        self.assertNotIn("port", shared)
+        self.assertIn("perf_counter_ns", shared)
+
+    def test_read_from_ports(self):
+        """
+        Lines read from the ports are written with their mouse and port
+        """
+        self.reader.start()
+        self.comms["117_5"].write("1: 5: 5: Lick\n")
+        time.sleep(0.1)
+        self.comms["117_3"].write("2: 30: 0: Session has ended\n")
+        with contextlib.redirect_stdout(io.StringIO()):
+            record_session(self.reader, self.comms, self.writer, "Session has ended")
+        data = self.writer.data()
+        self.assertEqual(
+            data["117_5"][0],
+            dict(
+                data["117_5"][0],
+                message="1: 5: 5: Lick",
+                mouse_id="117_5",
+                port="loop://",
+            ),
+        )
+        self.assertEqual(data["117_3"][-1]["message"], "2: 30: 0: Session has ended")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,241 @@
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+SERIAL_READ_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERIAL_READ_DIR)
+
+from session_writer import (  # noqa: E402
+    SIDECAR_VERSION,
+    SessionWriter,
+    convert_journal,
+    journal_path,
+    read_journal,
+    write_sidecar,
+)
+
+HEADER = {
+    "mouse_ids": ["117_3", "117_5"],
+    "ports": ["COM3", "COM4"],
+    "notes": "Two mice, one rig each",
+}
+
+
+def event(mouse_id, port, message, absolute_time="2025-03-23_21-26-51.000001"):
+    return {
+        "message": message,
+        "mouse_id": mouse_id,
+        "port": port,
+        "absolute_time": absolute_time,
+    }
+
+
+FIRST_EVENTS = [
+    event("117_3", "COM3", "0: 0: 0: Session has started"),
+    event("117_3", "COM3", "1: 10: 0: Trial has started"),
+    event("117_3", "COM3", "1: 20: 10: Lick", "2025-03-23_21-26-51.500000"),
+]
+
+SECOND_EVENTS = [
+    event("117_5", "COM4", "0: 0: 0: Session has started"),
+    event("117_5", "COM4", "1: 12: 0: Trial has started"),
+]
+
+SHARED_EVENT = {
+    "message": "1: 30: 20: Session has ended",
+    "absolute_time": "2025-03-23_21-26-52.000000",
+}
+
+
+class SessionWriterTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(
+            self.tmp_dir.name, "117_3_117_5_2025-03-23_21-26-51.json"
+        )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_session(self, close=True):
+        """
+        Writes the events of both mice, interleaved, and an event shared
+        by both. Returns the writer
+        """
+        writer = SessionWriter(self.file_path, HEADER, fsync_interval=0)
+        for first, second in zip(FIRST_EVENTS, SECOND_EVENTS):
+            writer.write("117_3", first)
+            writer.write("117_5", second)
+        writer.write("117_3", FIRST_EVENTS[-1])
+        writer.write_all(SHARED_EVENT)
+        if close:
+            with contextlib.redirect_stdout(io.StringIO()):
+                writer.close()
+        return writer
+
+    def expected_json(self, data=None):
+        if data is None:
+            data = {
+                "117_3": FIRST_EVENTS + [SHARED_EVENT],
+                "117_5": SECOND_EVENTS + [SHARED_EVENT],
+            }
+        return json.dumps({"header": HEADER, "data": data}, indent=4)
+
+    def read_file(self):
+        with open(self.file_path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def test_session_file(self):
+        """
+        The session file is byte for byte what `json.dump` would write,
+        and the journal is removed
+        """
+        self.write_session()
+        self.assertEqual(self.read_file(), self.expected_json())
+        self.assertFalse(os.path.exists(journal_path(self.file_path)))
+
+    def test_empty_session(self):
+        """
+        Mice without events, and sessions without mice, are written as
+        `json.dump` would write them
+        """
+        for mouse_ids in (["117_3"], []):
+            header = dict(HEADER, mouse_ids=mouse_ids)
+            with SessionWriter(self.file_path, header):
+                pass
+            with self.subTest(mouse_ids=mouse_ids):
+                self.assertEqual(
+                    self.read_file(),
+                    json.dumps(
+                        {"header": header, "data": {m: [] for m in mouse_ids}},
+                        indent=4,
+                    ),
+                )
+
+    def test_write_all(self):
+        """
+        Events written to every mouse are in the data of every mouse,
+        in the order they were written
+        """
+        writer = self.write_session(close=False)
+        data = writer.data()
+        with contextlib.redirect_stdout(io.StringIO()):
+            writer.close()
+        self.assertEqual(data["117_3"], FIRST_EVENTS + [SHARED_EVENT])
+        self.assertEqual(data["117_5"], SECOND_EVENTS + [SHARED_EVENT])
+
+    def test_truncated_journal(self):
+        """
+        A last journal line cut short is skipped, the events before it
+        are converted
+        """
+        writer = self.write_session(close=False)
+        writer.journal.close()
+        with open(writer.journal_path, "a", encoding="utf-8") as f:
+            f.write('{"mouse_id": "117_3", "event": {"message": "1: 40')
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            header, _ = read_journal(writer.journal_path)
+            convert_journal(writer.journal_path, self.file_path)
+        self.assertEqual(header, HEADER)
+        self.assertEqual(self.read_file(), self.expected_json())
+        self.assertIn("Skipping incomplete journal line", output.getvalue())
+
+    def test_sidecar(self):
+        """
+        The sidecar holds the columns of each mouse, and the size and
+        modification time of the session file it was written for
+        """
+        writer = self.write_session(close=False)
+        writer.journal.close()
+        convert_journal(writer.journal_path, self.file_path)
+        sidecar_path = write_sidecar(writer.journal_path, self.file_path)
+
+        self.assertEqual(sidecar_path, self.file_path[: -len(".json")] + ".npz")
+        stat = os.stat(self.file_path)
+        with np.load(sidecar_path) as sidecar:
+            self.assertEqual(int(sidecar["version"]), SIDECAR_VERSION)
+            self.assertEqual(int(sidecar["json_size"]), stat.st_size)
+            self.assertEqual(int(sidecar["json_mtime_ns"]), stat.st_mtime_ns)
+            self.assertEqual(json.loads(str(sidecar["header"])), HEADER)
+            self.assertEqual(list(sidecar["mouse_ids"]), HEADER["mouse_ids"])
+            self.assertEqual(list(sidecar["ports"]), HEADER["ports"])
+
+            messages = list(sidecar["messages"])
+            self.assertEqual(
+                [messages[code] for code in sidecar["mouse_0_message"]],
+                [
+                    "Session has started",
+                    "Trial has started",
+                    "Lick",
+                    "Session has ended",
+                ],
+            )
+            self.assertEqual(list(sidecar["mouse_0_trial"]), [0, 1, 1, 1])
+            self.assertEqual(list(sidecar["mouse_0_session_ms"]), [0, 10, 20, 30])
+            self.assertEqual(list(sidecar["mouse_0_trial_ms"]), [0, 0, 10, 20])
+            self.assertEqual(
+                list(sidecar["mouse_0_shared"]), [False, False, False, True]
+            )
+            self.assertEqual(
+                int(sidecar["mouse_0_absolute_time"][2]),
+                1742765211500000,
+            )
+            self.assertEqual(list(sidecar["mouse_1_session_ms"]), [0, 12, 30])
+            self.assertEqual(len(sidecar["mouse_0_raw_rows"]), 0)
+
+    def test_sidecar_raw_events(self):
+        """
+        Events that do not fit the columns are kept as their JSON text
+        """
+        with SessionWriter(self.file_path, HEADER) as writer:
+            writer.write("117_3", FIRST_EVENTS[0])
+            writer.write("117_3", event("117_3", "COM3", "Lick"))
+            writer.write("117_3", event("117_3", "COM3", "1: 2: 3: Lick", "now"))
+        sidecar_path = self.file_path[: -len(".json")] + ".npz"
+        with np.load(sidecar_path) as sidecar:
+            self.assertEqual(list(sidecar["mouse_0_raw_rows"]), [1, 2])
+            self.assertEqual(
+                json.loads(str(sidecar["mouse_0_raw"][0])),
+                event("117_3", "COM3", "Lick"),
+            )
+            self.assertEqual(list(sidecar["mouse_0_message"]), [0, -1, -1])
+
+    def test_recover_journal(self):
+        """
+        The command line converts a journal left behind by an interrupted
+        recording, and refuses other files
+        """
+        writer = self.write_session(close=False)
+        writer.journal.close()
+        script = os.path.join(SERIAL_READ_DIR, "session_writer.py")
+        result = subprocess.run(
+            [sys.executable, script, writer.journal_path],
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn(f"Data saved to {self.file_path}", result.stdout)
+        self.assertEqual(self.read_file(), self.expected_json())
+        self.assertTrue(os.path.isfile(self.file_path[: -len(".json")] + ".npz"))
+
+        result = subprocess.run(
+            [sys.executable, script, self.file_path],
+            capture_output=True,
+            text=True,
+        )
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn("Not a journal file", result.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,7 +7,7 @@ from matplotlib.figure import Figure
 import pandas as pd
 from datetime import datetime
 import os, signal, subprocess
-from .constants import START_STRING
+from .constants import LICK_STRING, START_STRING
 
 class ProcessThread(QThread):
     """
@@ -139,7 +139,7 @@ class OutputDialogPlot(QDialog):
                 if self.started and self.started_secondary:
                     self.start_time = datetime.now()
 
-            if "Lick" in output: 
+            if LICK_STRING in output: 
                 if self.primary_mouse_id in output:
                     self.update_licks(primary=True)
                 else: